@@ -0,0 +1,193 @@
+import asyncio
+import contextlib
+import heapq
+import itertools
+import math
+import os
+import time
+
+from observability import agent_admission
+
+# Admission control in front of the model. Calls wait for a slot under a
+# global and a per-user limit, interactive chat is served before plan
+# generation, and a full queue is rejected so clients back off instead of
+# piling more load onto a throttled model. All state lives on the event loop.
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class AgentBusy(Exception):
+    """The wait queue is full; retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Agent is busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AgentScheduler:
+    def __init__(self, max_concurrent=4, max_per_user=1, max_queue=32):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self._running = 0
+        self._per_user = {}  # user_id -> running calls
+        self._waiters = []  # heap of (priority, seq, user_id, future)
+        self._seq = itertools.count()
+        self._inflight = {}  # coalescing key -> task
+        self._avg_seconds = 5.0  # smoothed slot hold time, for Retry-After
+        self.admitted = 0
+        self.waited = 0
+        self.rejected = 0
+        self.coalesced = 0
+
+    def _can_start(self, user_id):
+        return self._running < self.max_concurrent and self._per_user.get(user_id, 0) < self.max_per_user
+
+    def _start(self, user_id):
+        self._running += 1
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        self.admitted += 1
+        agent_admission.inc(outcome='admitted')
+
+    def retry_after(self):
+        """Seconds until the queue has likely drained enough to admit a new call"""
+        waves = (len(self._waiters) + 1) / self.max_concurrent
+        return max(1, min(120, math.ceil(self._avg_seconds * waves)))
+
+    def ensure_capacity(self, user_id):
+        """Raise AgentBusy now if a call for this user would be rejected
+
+        Lets streaming endpoints answer 429 before the response starts.
+        """
+        if not self._can_start(user_id) and len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            agent_admission.inc(outcome='rejected')
+            raise AgentBusy(self.retry_after())
+
+    async def acquire(self, user_id, priority=INTERACTIVE):
+        """Wait for a slot; the caller must release() it"""
+        # After every dispatch no waiter can start, so a free slot is ours
+        if self._can_start(user_id):
+            self._start(user_id)
+            return
+        self.ensure_capacity(user_id)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._seq), user_id, future)
+        heapq.heappush(self._waiters, entry)
+        self.waited += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the caller went away
+                self.release(user_id)
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+
+    def release(self, user_id):
+        self._running -= 1
+        remaining = self._per_user.get(user_id, 1) - 1
+        if remaining:
+            self._per_user[user_id] = remaining
+        else:
+            self._per_user.pop(user_id, None)
+        self._dispatch()
+
+    def _dispatch(self):
+        """Start waiters in priority order, skipping users already at their limit"""
+        blocked = []
+        while self._waiters and self._running < self.max_concurrent:
+            entry = heapq.heappop(self._waiters)
+            user_id, future = entry[2], entry[3]
+            if future.done():
+                continue
+            if self._per_user.get(user_id, 0) >= self.max_per_user:
+                blocked.append(entry)
+                continue
+            self._start(user_id)
+            future.set_result(None)
+        for entry in blocked:
+            heapq.heappush(self._waiters, entry)
+
+    async def claim(self, user_id, priority=INTERACTIVE):
+        """Wait for a slot and return a callable that frees it (once)
+
+        For work that can outlive the coroutine that started it, such as a
+        model thread still running after its stream's client disconnected.
+        Call the returned function on the event loop.
+        """
+        await self.acquire(user_id, priority)
+        started = time.perf_counter()
+        released = False
+
+        def release():
+            nonlocal released
+            if released:
+                return
+            released = True
+            held = time.perf_counter() - started
+            self._avg_seconds += 0.2 * (held - self._avg_seconds)
+            self.release(user_id)
+        return release
+
+    @contextlib.asynccontextmanager
+    async def slot(self, user_id, priority=INTERACTIVE):
+        """Hold a slot for the duration of the block"""
+        release = await self.claim(user_id, priority)
+        try:
+            yield
+        finally:
+            release()
+
+    async def run(self, user_id, priority, call, key=None):
+        """Await `call()` in a slot; concurrent callers with the same key share one call"""
+        if key is None:
+            async with self.slot(user_id, priority):
+                return await call()
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            agent_admission.inc(outcome='coalesced')
+        else:
+            task = asyncio.ensure_future(self._run_shared(key, user_id, priority, call))
+            self._inflight[key] = task
+        # Shielded so one caller disconnecting doesn't cancel the others' result
+        return await asyncio.shield(task)
+
+    async def _run_shared(self, key, user_id, priority, call):
+        try:
+            async with self.slot(user_id, priority):
+                return await call()
+        finally:
+            self._inflight.pop(key, None)
+
+    def queue_depth(self):
+        return len(self._waiters)
+
+    def stats(self):
+        return {
+            'running': self._running,
+            'queued': len(self._waiters),
+            'max_concurrent': self.max_concurrent,
+            'max_per_user': self.max_per_user,
+            'max_queue': self.max_queue,
+            'admitted': self.admitted,
+            'waited': self.waited,
+            'rejected': self.rejected,
+            'coalesced': self.coalesced,
+            'avg_call_seconds': round(self._avg_seconds, 2),
+        }
+
+
+def create_agent_scheduler():
+    """Build the scheduler from AGENT_* environment settings"""
+    return AgentScheduler(
+        max_concurrent=int(os.getenv("AGENT_MAX_CONCURRENT", os.getenv("AGENT_EXECUTOR_WORKERS", "4"))),
+        max_per_user=int(os.getenv("AGENT_MAX_PER_USER", "1")),
+        max_queue=int(os.getenv("AGENT_QUEUE_SIZE", "32")),
+    )
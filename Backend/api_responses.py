@@ -0,0 +1,102 @@
+import gzip
+import json
+import os
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder is used without it
+    orjson = None
+
+# JSON responses for the API: a faster encoder when orjson is installed, gzip
+# for bodies big enough to benefit, and conditional GETs against the per-user
+# revisions in revisions.py. Revalidation is cheap, so clients are told to
+# always ask (no-cache) and get a bodiless 304 when nothing changed.
+
+GZIP_MIN_BYTES = int(os.getenv("API_GZIP_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+PRIVATE_REVALIDATE = 'private, no-cache'
+
+
+def dumps(content):
+    """Encode a response body to UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS, default=str)
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with dumps()"""
+
+    def render(self, content):
+        return dumps(content)
+
+
+def accepted_encodings(header):
+    """Content codings an Accept-Encoding header allows"""
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.partition(';')
+        quality = params.strip().removeprefix('q=')
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            pass
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def weak_etag(*parts):
+    # Weak: the same revision may be encoded differently (gzip or not, key order)
+    return 'W/"' + '-'.join(str(part) for part in parts) + '"'
+
+
+def http_date(timestamp):
+    return formatdate(timestamp, usegmt=True)
+
+
+def not_modified(request, etag, last_modified=None):
+    """Whether the request's validators still match; If-None-Match wins over If-Modified-Since"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*':
+            return True
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        return etag.removeprefix('W/') in tags
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    return False
+
+
+def validator_headers(etag, last_modified=None):
+    headers = {
+        'ETag': etag,
+        'Cache-Control': PRIVATE_REVALIDATE,
+        # Bodies differ per user and per encoding
+        'Vary': 'Authorization, Accept-Encoding',
+    }
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
+
+
+def not_modified_response(etag, last_modified=None):
+    return Response(status_code=304, headers=validator_headers(etag, last_modified))
+
+
+def json_response(request, content, etag=None, last_modified=None, status_code=200):
+    """Serialize `content`, gzipping it when it's large and the client accepts gzip"""
+    body = dumps(content)
+    headers = validator_headers(etag, last_modified) if etag else {'Vary': 'Accept-Encoding'}
+    if len(body) >= GZIP_MIN_BYTES and 'gzip' in accepted_encodings(request.headers.get('accept-encoding', '')):
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(content=body, status_code=status_code, media_type='application/json', headers=headers)
@@ -0,0 +1,44 @@
+import argparse
+import subprocess
+import sys
+
+# Where the server's import time goes, from `python -X importtime`:
+#
+#   cd Backend
+#   python -m benchmarks.import_profile --top 15
+
+
+def profile(module):
+    """(cumulative_us, self_us, name) for every module imported by `import module`"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix('import time:').split('|', 2)
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the slowest imports behind a module")
+    parser.add_argument('--module', default='simple_ai_server')
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    rows = profile(args.module)
+    total = next((cumulative for cumulative, _, name in rows if name.strip() == args.module), None)
+    if total is not None:
+        print(f"import {args.module}: {total / 1000:.1f} ms")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+
+if __name__ == '__main__':
+    main()
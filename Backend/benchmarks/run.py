@@ -0,0 +1,205 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+# Load generator for the API. By default it drives simple_ai_server.app in
+# process with the stub agent against a seeded benchmark database; --url
+# points it at a running server instead (see benchmarks/serve.py).
+#
+#   cd Backend
+#   python -m benchmarks.run --users 20 --workouts 300 --concurrency 16 --duration 30
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(samples, elapsed):
+    """Per-endpoint count, errors, throughput and latency percentiles"""
+    by_label = {}
+    for label, latency_ms, status in samples:
+        by_label.setdefault(label, []).append((latency_ms, status))
+
+    endpoints = {}
+    for label, rows in sorted(by_label.items()):
+        latencies = sorted(latency for latency, _ in rows)
+        errors = sum(1 for _, status in rows if not 200 <= status < 400)
+        endpoints[label] = {
+            'count': len(rows),
+            'errors': errors,
+            'throughput_rps': round(len(rows) / elapsed, 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 2),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'max_ms': round(latencies[-1], 2),
+        }
+    # "(first token)" rows are extra measurements of a request already counted
+    requests = [row for row in samples if not row[0].endswith('(first token)')]
+    return {
+        'requests': len(requests),
+        'errors': sum(1 for _, _, status in requests if not 200 <= status < 400),
+        'throughput_rps': round(len(requests) / elapsed, 2),
+    }, endpoints
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def virtual_user(client, user, mix, recorder, deadline, budget):
+    from benchmarks import scenarios
+
+    await scenarios.login(client, user, recorder)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.perf_counter() < deadline and budget[0] > 0:
+        budget[0] -= 1
+        name = user.rng.choices(names, weights)[0]
+        await scenarios.SCENARIOS[name](client, user, recorder)
+
+
+async def run_load(client, args, mix):
+    from benchmarks.scenarios import BenchUser, Recorder
+
+    recorder = Recorder()
+    budget = [args.requests or float('inf')]
+    started = time.perf_counter()
+    deadline = started + args.duration
+    users = [BenchUser(i % args.users, args.seed + i // args.users) for i in range(args.concurrency)]
+    await asyncio.gather(*(virtual_user(client, user, mix, recorder, deadline, budget) for user in users))
+    return recorder.samples, time.perf_counter() - started
+
+
+def in_process_client(args):
+    """httpx client wired straight to the ASGI app, with the stub agent and a seeded database"""
+    import httpx
+
+    os.environ["FITNESS_DB_PATH"] = args.db
+    from database import db
+    from benchmarks import seed_data, stub_agent
+
+    if not args.no_seed:
+        seeded_at = time.perf_counter()
+        seed_data.seed(db, args.users, args.workouts, args.seed)
+        print(f"Seeded {args.users} users x {args.workouts} workouts in {time.perf_counter() - seeded_at:.1f}s")
+
+    import simple_ai_server
+    stub_agent.install(simple_ai_server.agent_sessions, args.agent_latency, args.token_delay)
+    transport = httpx.ASGITransport(app=simple_ai_server.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout)
+
+
+def print_report(report, baseline=None):
+    print(f"\n{'endpoint':<38} {'count':>6} {'err':>4} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+          + ('  p95 vs baseline' if baseline else ''))
+    for label, row in report['endpoints'].items():
+        line = (f"{label:<38} {row['count']:>6} {row['errors']:>4} {row['throughput_rps']:>8.1f} "
+                f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+        previous = (baseline or {}).get('endpoints', {}).get(label)
+        if previous and previous['p95_ms']:
+            change = (row['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] * 100
+            line += f"  {change:+.1f}%"
+        print(line)
+    totals = report['totals']
+    print(f"\n{totals['requests']} requests, {totals['errors']} errors, "
+          f"{totals['throughput_rps']} req/s over {report['duration_s']}s")
+
+
+async def main_async(args):
+    from benchmarks.scenarios import parse_mix
+
+    mix = parse_mix(args.mix)
+    if args.url:
+        import httpx
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        client = in_process_client(args)
+
+    async with client:
+        samples, elapsed = await run_load(client, args, mix)
+
+    totals, endpoints = summarize(samples, elapsed)
+    return {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'target': args.url or 'in-process',
+        'duration_s': round(elapsed, 2),
+        'config': {
+            'mix': mix,
+            'users': args.users,
+            'workouts_per_user': args.workouts,
+            'concurrency': args.concurrency,
+            'agent_latency_s': args.agent_latency,
+            'token_delay_s': args.token_delay,
+            'seed': args.seed,
+        },
+        'totals': totals,
+        'endpoints': endpoints,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Agent Sportacus API with a stub agent")
+    parser.add_argument('--url', help="Benchmark a running server instead of the in-process app")
+    parser.add_argument('--db', default=os.path.join(RESULTS_DIR, "bench.db"),
+                        help="Database for in-process runs (seeded unless --no-seed)")
+    parser.add_argument('--no-seed', action='store_true', help="Use the database as-is")
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--workouts', type=int, default=200, help="Journal entries per seeded user")
+    parser.add_argument('--concurrency', type=int, default=10, help="Virtual users running at once")
+    parser.add_argument('--duration', type=float, default=20.0, help="Seconds to run")
+    parser.add_argument('--requests', type=int, default=0, help="Stop after this many requests (0 = no limit)")
+    parser.add_argument('--mix', default='default',
+                        help="default, journal, chat, or weights like 'journal_list=3,chat=1'")
+    parser.add_argument('--agent-latency', type=float, default=0.5, help="Stub agent delay before the first token")
+    parser.add_argument('--token-delay', type=float, default=0.01, help="Stub agent delay per streamed chunk")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--output', help="Report path (default: benchmarks/results/bench-<time>.json)")
+    parser.add_argument('--baseline', help="Earlier report to compare p95 latencies against")
+    parser.add_argument('--list', action='store_true', help="List scenarios and mixes, then exit")
+    args = parser.parse_args()
+
+    if args.list:
+        from benchmarks.scenarios import describe
+        print(describe())
+        return
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    report = asyncio.run(main_async(args))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {output}")
+
+    if report['totals']['errors']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import json
+import random
+import time
+from datetime import date
+
+from benchmarks.seed_data import BENCH_PASSWORD, bench_username, make_entry, make_profile
+
+# Scripted user actions. Each scenario makes one or more requests through a
+# Recorder, which times them under an endpoint label.
+
+CHAT_MESSAGES = [
+    "How many sets should I do for hypertrophy?",
+    "My knees hurt after squats, what should I change?",
+    "When did I last do romanian deadlifts and how heavy?",
+    "What should I eat after a workout?",
+    "How do I break through a bench press plateau?",
+]
+SEARCH_TERMS = ["deadlift", "bench", "felt strong", "squat", "plank", "new pr"]
+
+
+class Recorder:
+    """Collects (label, latency_ms, status) samples"""
+
+    def __init__(self):
+        self.samples = []
+
+    def add(self, label, latency_ms, status):
+        self.samples.append((label, latency_ms, status))
+
+    async def request(self, client, label, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except Exception:
+            response, status = None, 0
+        self.add(label, (time.perf_counter() - started) * 1000, status)
+        return response
+
+
+class BenchUser:
+    """Per virtual-user state carried between scenario steps"""
+
+    def __init__(self, index, seed):
+        self.index = index
+        self.username = bench_username(index)
+        self.rng = random.Random(seed * 1000 + index)
+        self.token = None
+        self.next_cursor = None
+
+    @property
+    def headers(self):
+        return {'Authorization': f'Bearer {self.token}'}
+
+
+async def login(client, user, recorder):
+    response = await recorder.request(client, 'POST /auth/login', 'POST', '/auth/login',
+                                      json={'username': user.username, 'password': BENCH_PASSWORD})
+    if response is not None and response.status_code == 200:
+        user.token = response.json()['access_token']
+
+
+async def profile_get(client, user, recorder):
+    await recorder.request(client, 'GET /profile/get', 'GET', '/profile/get', headers=user.headers)
+
+
+async def profile_save(client, user, recorder):
+    await recorder.request(client, 'POST /profile/save', 'POST', '/profile/save',
+                           headers=user.headers, json=make_profile(user.rng))
+
+
+async def journal_list(client, user, recorder):
+    """First page, or the next one when the previous listing had more"""
+    params = {'limit': 20}
+    label = 'GET /journal/entries'
+    if user.next_cursor:
+        params['cursor'] = user.next_cursor
+        label = 'GET /journal/entries (next page)'
+    response = await recorder.request(client, label, 'GET', '/journal/entries',
+                                      headers=user.headers, params=params)
+    if response is not None and response.status_code == 200:
+        user.next_cursor = response.json().get('next_cursor')
+
+
+async def journal_save(client, user, recorder):
+    await recorder.request(client, 'POST /journal/save', 'POST', '/journal/save',
+                           headers=user.headers, json=make_entry(user.rng, date.today()))
+
+
+async def journal_search(client, user, recorder):
+    await recorder.request(client, 'GET /journal/search', 'GET', '/journal/search',
+                           headers=user.headers, params={'q': user.rng.choice(SEARCH_TERMS)})
+
+
+async def progress_summary(client, user, recorder):
+    await recorder.request(client, 'GET /progress/summary', 'GET', '/progress/summary', headers=user.headers)
+
+
+async def chat(client, user, recorder):
+    await recorder.request(client, 'POST /agent/chat', 'POST', '/agent/chat', headers=user.headers,
+                           json={'type': 'chat', 'message': user.rng.choice(CHAT_MESSAGES)})
+
+
+async def workout_plan(client, user, recorder):
+    await recorder.request(client, 'POST /agent/chat (workout_plan)', 'POST', '/agent/chat',
+                           headers=user.headers, json={'type': 'workout_plan'})
+
+
+async def chat_stream(client, user, recorder):
+    """Streams a chat reply, recording total time and time to first token
+
+    Time to first token comes from the server's done event, since in-process
+    runs go through httpx's ASGI transport, which buffers the whole body.
+    """
+    label = 'POST /agent/chat/stream'
+    started = time.perf_counter()
+    first_token_ms = None
+    status = 0
+    try:
+        async with client.stream('POST', '/agent/chat/stream', headers=user.headers,
+                                 json={'type': 'chat', 'message': user.rng.choice(CHAT_MESSAGES)}) as response:
+            status = response.status_code
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith('event: '):
+                    event = line[len('event: '):]
+                elif line.startswith('data: ') and event == 'done':
+                    first_token_ms = json.loads(line[len('data: '):]).get('time_to_first_token_ms')
+    except Exception:
+        status = 0
+    recorder.add(label, (time.perf_counter() - started) * 1000, status)
+    if first_token_ms is not None:
+        recorder.add(f'{label} (first token)', first_token_ms, status)
+
+
+SCENARIOS = {
+    'login': login,
+    'profile_get': profile_get,
+    'profile_save': profile_save,
+    'journal_list': journal_list,
+    'journal_save': journal_save,
+    'journal_search': journal_search,
+    'progress_summary': progress_summary,
+    'chat': chat,
+    'chat_stream': chat_stream,
+    'workout_plan': workout_plan,
+}
+
+# Relative weights for a typical session; "journal" and "chat" isolate one side
+MIXES = {
+    'default': {
+        'profile_get': 10, 'journal_list': 25, 'journal_save': 5, 'journal_search': 10,
+        'progress_summary': 10, 'profile_save': 2, 'chat': 8, 'chat_stream': 8, 'workout_plan': 4,
+    },
+    'journal': {'journal_list': 50, 'journal_save': 15, 'journal_search': 20, 'progress_summary': 15},
+    'chat': {'chat': 45, 'chat_stream': 45, 'workout_plan': 10},
+}
+
+
+def parse_mix(spec):
+    """A named mix, or 'scenario=weight,...'"""
+    if spec in MIXES:
+        return MIXES[spec]
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def describe():
+    return json.dumps({'scenarios': sorted(SCENARIOS), 'mixes': MIXES}, indent=2)
@@ -0,0 +1,109 @@
+import argparse
+import random
+from datetime import date, timedelta
+
+# Synthetic users, profiles and workout history for benchmarking. Output is
+# deterministic for a given seed so runs are comparable.
+
+BENCH_PASSWORD = "bench-password"
+
+EXERCISES = [
+    ("Bench Press", 135), ("Squat", 185), ("Deadlift", 225), ("Romanian Deadlift", 155),
+    ("Overhead Press", 95), ("Barbell Row", 135), ("Pull-ups", None), ("Dips", None),
+    ("Lunges", 40), ("Leg Press", 270), ("Bicep Curl", 30), ("Tricep Pushdown", 50),
+    ("Plank", None), ("Hip Thrust", 185), ("Lat Pulldown", 120),
+]
+TITLES = ["Push Day", "Pull Day", "Leg Day", "Upper Body", "Lower Body", "Full Body", "Conditioning"]
+NOTES = [
+    "", "", "Felt strong today", "Low energy, kept it light", "New PR!", "Knees a bit sore",
+    "Short on time", "Focused on form and tempo", "Great pump",
+]
+LEVELS = ["beginner", "intermediate", "advanced"]
+GOALS = ["weight_loss", "muscle_gain", "general_fitness", "endurance"]
+
+
+def bench_username(index):
+    return f"bench_user_{index}"
+
+
+def make_profile(rng):
+    return {
+        'fitness_level': rng.choice(LEVELS),
+        'primary_goal': rng.choice(GOALS),
+        'weight': round(rng.uniform(120, 260), 1),
+        'height': round(rng.uniform(60, 78), 1),
+        'age': rng.randint(18, 65),
+        'activity_level': rng.choice(["sedentary", "lightly_active", "moderately_active", "very_active"]),
+        'workout_frequency': str(rng.randint(2, 6)),
+        'workout_duration': rng.choice(["30", "45", "60", "90"]),
+        'target_weight': round(rng.uniform(120, 240), 1),
+        'timeline': rng.choice(["1_month", "3_months", "6_months", "1_year"]),
+        'motivation': "Feel better and get stronger",
+        'preferred_time': rng.choice(["morning", "afternoon", "evening"]),
+        'workout_location': rng.choice(["gym", "home", "outdoors"]),
+        'sleep_hours': rng.choice(["6", "7", "8"]),
+        'stress_level': rng.choice(["low", "moderate", "high"]),
+        'dietary_restrictions': rng.choice(["", "", "vegetarian", "lactose intolerant"]),
+        'medical_conditions': "",
+        'preferences': {},
+    }
+
+
+def make_entry(rng, day):
+    exercises = []
+    for name, base_weight in rng.sample(EXERCISES, rng.randint(3, 7)):
+        exercises.append({
+            'name': name,
+            'sets': rng.randint(2, 5),
+            'reps': rng.choice([5, 6, 8, 10, 12, 15]),
+            'weight': round(base_weight * rng.uniform(0.7, 1.3) / 5) * 5 if base_weight else None,
+            'duration': rng.randint(1, 3) if name == "Plank" else None,
+            'notes': rng.choice(NOTES),
+            'completed': rng.random() < 0.8,
+        })
+    return {
+        'date': day.isoformat(),
+        'title': rng.choice(TITLES),
+        'notes': rng.choice(NOTES),
+        'exercises': exercises,
+    }
+
+
+def seed(fitness_db, users=50, workouts=200, seed_value=42, batch_size=500):
+    """Create `users` bench users with `workouts` journal entries each, returning their ids"""
+    rng = random.Random(seed_value)
+    user_ids = []
+    for index in range(users):
+        username = bench_username(index)
+        user_id = fitness_db.create_user(username, BENCH_PASSWORD)
+        if user_id is None:
+            # Already seeded by an earlier run
+            user_ids.append(fitness_db.authenticate_user(username, BENCH_PASSWORD))
+            continue
+        fitness_db.save_user_profile(user_id, make_profile(rng))
+
+        start = date.today() - timedelta(days=workouts * 2)
+        entries = [make_entry(rng, start + timedelta(days=i * 2)) for i in range(workouts)]
+        for i in range(0, len(entries), batch_size):
+            fitness_db.import_workout_entries(user_id, entries[i:i + batch_size])
+        user_ids.append(user_id)
+    return user_ids
+
+
+def main():
+    """Fill a database with synthetic data: python -m benchmarks.seed_data --users 50 --workouts 200"""
+    parser = argparse.ArgumentParser(description="Generate synthetic users and workouts")
+    parser.add_argument('--db', default="fitness_app.db", help="Path to the SQLite database")
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--workouts', type=int, default=200, help="Journal entries per user")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from database import FitnessDB
+    fitness_db = FitnessDB(args.db)
+    user_ids = seed(fitness_db, args.users, args.workouts, args.seed)
+    print(f"Seeded {len(user_ids)} users with {args.workouts} workouts each into {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import os
+
+# Runs the real server with the stub agent so benchmarks/run.py --url can
+# exercise the full HTTP stack, including multiple uvicorn workers:
+#
+#   cd Backend
+#   python -m benchmarks.serve --workers 4 --db benchmarks/results/bench.db
+#   python -m benchmarks.run --url http://127.0.0.1:8001 --no-seed
+
+# uvicorn workers import this module by name, so the settings travel in the environment
+os.environ.setdefault("FITNESS_DB_PATH", os.path.join(os.path.dirname(__file__), "results", "bench.db"))
+
+from benchmarks import stub_agent
+from simple_ai_server import app, agent_sessions
+
+stub_agent.install(
+    agent_sessions,
+    first_token_latency=float(os.getenv("BENCH_AGENT_LATENCY", "0.5")),
+    token_delay=float(os.getenv("BENCH_TOKEN_DELAY", "0.01")),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API with the stub agent")
+    parser.add_argument('--db', help="Database to serve (default: benchmarks/results/bench.db)")
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--agent-latency', type=float, default=0.5)
+    parser.add_argument('--token-delay', type=float, default=0.01)
+    args = parser.parse_args()
+
+    if args.db:
+        os.environ["FITNESS_DB_PATH"] = args.db
+    os.environ["BENCH_AGENT_LATENCY"] = str(args.agent_latency)
+    os.environ["BENCH_TOKEN_DELAY"] = str(args.token_delay)
+
+    import uvicorn
+    uvicorn.run("benchmarks.serve:app", host="127.0.0.1", port=args.port, workers=args.workers, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
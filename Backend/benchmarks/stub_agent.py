@@ -0,0 +1,81 @@
+import asyncio
+import hashlib
+import json
+import time
+
+# Deterministic stand-in for the Bedrock-backed FitBot agent. It answers
+# from canned text chosen by a hash of the prompt, so the same prompt always
+# gets the same reply, and simulates model latency with a fixed delay before
+# the first token plus a per-token delay.
+
+RESPONSES = [
+    "Great question! Focus on progressive overload: add a little weight or a rep each week. "
+    "Keep rest periods around 90 seconds for hypertrophy and make sure you sleep 7-9 hours.",
+    "Here's a simple plan: Day 1 push (bench 3x8, overhead press 3x10), Day 2 pull (rows 3x10, "
+    "pull-ups 3x6), Day 3 legs (squats 3x8, Romanian deadlifts 3x10). Warm up for 5-10 minutes first.",
+    "For nutrition, aim for roughly 0.8-1g of protein per pound of body weight, plenty of vegetables "
+    "and whole grains, and stay hydrated. Adjust calories by 200-300 per day based on weekly weigh-ins.",
+    "Consistency beats intensity. Three solid sessions a week for three months will do more than "
+    "two weeks of daily workouts followed by burnout. Track your lifts so you can see the progress.",
+]
+
+
+class StubResult:
+    """Mimics the AgentResult the server turns into a string"""
+
+    def __init__(self, text):
+        self.text = text
+
+    def __str__(self):
+        return self.text
+
+
+class StubAgent:
+    """Drop-in for a strands Agent with configurable latency and streaming"""
+
+    def __init__(self, first_token_latency=0.5, token_delay=0.01, words_per_chunk=3):
+        self.first_token_latency = first_token_latency
+        self.token_delay = token_delay
+        self.words_per_chunk = words_per_chunk
+        self.calls = 0
+
+    def respond(self, prompt):
+        """Canned reply for a prompt, with a WORKOUT_ENTRY block when one was asked for"""
+        digest = int(hashlib.sha256(prompt.encode()).hexdigest(), 16)
+        text = RESPONSES[digest % len(RESPONSES)]
+        if "WORKOUT_ENTRY" in prompt:
+            entry = {
+                "date": "2024-01-15",
+                "title": "Logged from chat",
+                "exercises": [
+                    {"name": "Squat", "sets": 3, "reps": 8, "weight": 135},
+                    {"name": "Plank", "sets": 3, "duration": 1},
+                ],
+            }
+            text = f"WORKOUT_ENTRY {json.dumps(entry)}\nNice work, I've logged that session for you!"
+        return text
+
+    def _chunks(self, text):
+        words = text.split(' ')
+        for i in range(0, len(words), self.words_per_chunk):
+            chunk = ' '.join(words[i:i + self.words_per_chunk])
+            yield chunk if i + self.words_per_chunk >= len(words) else chunk + ' '
+
+    def __call__(self, prompt):
+        self.calls += 1
+        text = self.respond(prompt)
+        chunks = list(self._chunks(text))
+        time.sleep(self.first_token_latency + self.token_delay * len(chunks))
+        return StubResult(text)
+
+    async def stream_async(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.first_token_latency)
+        for chunk in self._chunks(self.respond(prompt)):
+            yield {"data": chunk}
+            await asyncio.sleep(self.token_delay)
+
+
+def install(agent_sessions, first_token_latency=0.5, token_delay=0.01):
+    """Make an AgentSessionPool hand out stub agents instead of Bedrock ones"""
+    agent_sessions.agent_factory = lambda: StubAgent(first_token_latency, token_delay)
@@ -0,0 +1,180 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from queue import Queue, Empty, Full
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up in time"""
+
+
+class ConnectionPool:
+    """Bounded pool of WAL-mode SQLite connections shared across threads"""
+
+    def __init__(self, db_path, max_size=8, busy_timeout_ms=5000,
+                 synchronous="NORMAL", statement_cache_size=256, checkout_timeout=10.0):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self.statement_cache_size = statement_cache_size
+        self.checkout_timeout = checkout_timeout
+
+        self._idle = Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _connect(self):
+        """Open a connection with our pragmas applied"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,  # transactions are managed explicitly
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def acquire(self):
+        """Check out a connection, opening a new one while under max_size"""
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get_nowait()
+        except Empty:
+            conn = None
+            with self._lock:
+                if self._created < self.max_size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.checkout_timeout)
+                except Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection available after {self.checkout_timeout}s"
+                    )
+                with self._lock:
+                    self._waits += 1
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool"""
+        with self._lock:
+            self._in_use -= 1
+        if conn.in_transaction:
+            # Never hand out a connection with a dangling transaction
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except Full:
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for autocommit reads"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def transaction(self, immediate=True):
+        """Borrow a connection wrapped in BEGIN ... COMMIT/ROLLBACK"""
+        conn = self.acquire()
+        try:
+            # IMMEDIATE takes the write lock up front so we wait on busy_timeout
+            # instead of failing with "database is locked" on lock upgrade
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+        finally:
+            self.release(conn)
+
+    def prefill(self, count=None):
+        """Open idle connections ahead of demand, up to `count` (default max_size)"""
+        target = min(count or self.max_size, self.max_size)
+        opened = 0
+        while True:
+            with self._lock:
+                if self._created >= target:
+                    break
+                self._created += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            try:
+                self._idle.put_nowait(conn)
+            except Full:
+                conn.close()
+                with self._lock:
+                    self._created -= 1
+                break
+            opened += 1
+        return opened
+
+    def close(self):
+        """Close all idle connections"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self):
+        """Pool sizing and checkout latency counters"""
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'open_connections': self._created,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+                'checkouts': self._checkouts,
+                'waited_checkouts': self._waits,
+                'checkout_timeouts': self._timeouts,
+                'avg_checkout_ms': round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                'max_checkout_ms': round(self._wait_max * 1000, 3),
+            }
@@ -0,0 +1,30 @@
+from strands.agent.conversation_manager import SlidingWindowConversationManager
+import json
+import os
+from observability import estimate_tokens
+
+# History limits for each conversation; prompts re-send the profile every turn,
+# so older turns add cost without adding much context
+HISTORY_WINDOW_MESSAGES = int(os.getenv("AGENT_HISTORY_MESSAGES", "20"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("AGENT_HISTORY_TOKENS", "6000"))
+
+def estimate_message_tokens(messages):
+    """Rough token count for a message list"""
+    return estimate_tokens(json.dumps(messages, default=str))
+
+class TokenBudgetConversationManager(SlidingWindowConversationManager):
+    """Sliding window that also trims the oldest turns to stay under a token budget"""
+    
+    def __init__(self, window_size=HISTORY_WINDOW_MESSAGES, max_tokens=HISTORY_TOKEN_BUDGET):
+        super().__init__(window_size=window_size)
+        self.max_tokens = max_tokens
+    
+    def apply_management(self, agent, **kwargs):
+        super().apply_management(agent, **kwargs)
+        messages = agent.messages
+        while len(messages) > 2 and estimate_message_tokens(messages) > self.max_tokens:
+            before = len(messages)
+            self.reduce_context(agent)
+            if len(messages) == before:
+                # No valid trim point left (e.g. an unfinished tool call)
+                break
@@ -1,112 +1,117 @@
 import sqlite3
+import base64
+import contextlib
 import hashlib
 import json
+import os
+import threading
 from datetime import datetime
+from connection_pool import ConnectionPool
+import migrations
+import observability
+import journal_search
+import profile_cache
+import progress
+import retrieval
+import revisions
+import write_queue
 
+INSERT_EXERCISE_SQL = (
+    "INSERT INTO workout_exercises (entry_id, exercise_name, sets, reps, weight, duration_minutes, notes, completed, exercise_key) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+UPDATE_EXERCISE_SQL = (
+    "UPDATE workout_exercises SET exercise_name = ?, sets = ?, reps = ?, weight = ?, duration_minutes = ?, "
+    "notes = ?, completed = ?, exercise_key = ? WHERE id = ?"
+)
+
+# Exercise columns returned by the API (exercise_key is internal)
+EXERCISE_COLUMNS = "id, entry_id, exercise_name, sets, reps, weight, duration_minutes, notes, completed"
+
+# Exercise columns PATCH /journal/exercises may change
+EXERCISE_UPDATE_FIELDS = ('completed', 'sets', 'reps', 'weight')
+
+class EntryVersionConflict(Exception):
+    """Raised when an entry was edited since the version the client loaded"""
+    
+    def __init__(self, current_version):
+        super().__init__(f"Entry is at version {current_version}")
+        self.current_version = current_version
+
+def _exercise_changed(old, row):
+    """Whether INSERT_EXERCISE_SQL parameters differ from a stored exercise row"""
+    _, name, sets, reps, weight, duration, notes, completed, _ = row
+    return (
+        (old['exercise_name'], old['sets'], old['reps'], old['weight'], old['duration_minutes'], old['notes'] or '', bool(old['completed']))
+        != (name, sets, reps, weight, duration, notes or '', bool(completed))
+    )
+
+# Every public call is timed into db_operation_duration_seconds
+@observability.timed_db_methods
 class FitnessDB:
-    def __init__(self, db_path="fitness_app.db"):
+    def __init__(self, db_path="fitness_app.db", pool_size=None):
         self.db_path = db_path
-        self.init_db()
+        self.pool = ConnectionPool(
+            db_path,
+            max_size=pool_size or int(os.getenv("DB_POOL_SIZE", "8")),
+            busy_timeout_ms=int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000")),
+            synchronous=os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+        )
+        self.profiles = profile_cache.create_profile_cache()
+        self.writer = write_queue.create_write_queue(self.pool)
+        # The schema is checked on first use rather than at import, so importing
+        # the server (or a CLI that never queries) doesn't touch the file
+        self._initialized = False
+        self._init_lock = threading.Lock()
+    
+    def _ensure_initialized(self):
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self.init_db()
+    
+    @contextlib.contextmanager
+    def transaction(self):
+        """Context-managed write transaction on a pooled connection"""
+        self._ensure_initialized()
+        with self.pool.transaction() as conn:
+            yield conn
+    
+    @contextlib.contextmanager
+    def connection(self):
+        """Context-managed pooled connection for reads"""
+        self._ensure_initialized()
+        if self.writer.durability == write_queue.QUEUED:
+            # Callers didn't wait for their writes, so reads wait for them instead
+            self.writer.barrier()
+        with self.pool.connection() as conn:
+            yield conn
+    
+    def queue_write(self, fn, *args):
+        """Hand `fn(conn, *args)` to the writer thread, returning a Future for its result"""
+        self._ensure_initialized()
+        return self.writer.submit(fn, *args)
+    
+    def writer_stats(self):
+        """Write queue depth and batch sizes"""
+        return self.writer.stats()
+    
+    def pool_stats(self):
+        """Connection pool size and checkout latency stats"""
+        return self.pool.stats()
+    
+    def prefill_pool(self, count=None):
+        """Open pooled connections ahead of the first requests"""
+        self._ensure_initialized()
+        return self.pool.prefill(count)
     
     def init_db(self):
-        """Initialize database tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # User profiles table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_profiles (
-                user_id INTEGER PRIMARY KEY,
-                fitness_level TEXT,
-                primary_goal TEXT,
-                weight REAL,
-                height REAL,
-                age INTEGER,
-                activity_level TEXT,
-                workout_frequency TEXT,
-                workout_duration TEXT,
-                target_weight REAL,
-                timeline TEXT,
-                motivation TEXT,
-                preferred_time TEXT,
-                workout_location TEXT,
-                sleep_hours TEXT,
-                stress_level TEXT,
-                dietary_restrictions TEXT,
-                medical_conditions TEXT,
-                preferences TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # User knowledge base for RAG
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_knowledge (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                category TEXT,
-                content TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Workout journal entries
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS workout_entries (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                date TEXT,
-                title TEXT,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Individual exercises within workout entries
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS workout_exercises (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                entry_id INTEGER,
-                exercise_name TEXT,
-                sets INTEGER,
-                reps INTEGER,
-                weight REAL,
-                duration_minutes INTEGER,
-                notes TEXT,
-                completed BOOLEAN DEFAULT 0,
-                FOREIGN KEY (entry_id) REFERENCES workout_entries (id)
-            )
-        ''')
-        
-        # Migrate existing profiles to new schema
-        try:
-            cursor.execute("ALTER TABLE user_profiles ADD COLUMN workout_frequency TEXT")
-            cursor.execute("ALTER TABLE user_profiles ADD COLUMN workout_duration TEXT")
-            cursor.execute("ALTER TABLE user_profiles ADD COLUMN target_weight REAL")
-            cursor.execute("ALTER TABLE user_profiles ADD COLUMN timeline TEXT")
-            cursor.execute("ALTER TABLE user_profiles ADD COLUMN motivation TEXT")
-            cursor.execute("ALTER TABLE user_profiles ADD COLUMN preferred_time TEXT")
-            cursor.execute("ALTER TABLE user_profiles ADD COLUMN workout_location TEXT")
-            cursor.execute("ALTER TABLE user_profiles ADD COLUMN sleep_hours TEXT")
-            cursor.execute("ALTER TABLE user_profiles ADD COLUMN stress_level TEXT")
-        except sqlite3.OperationalError:
-            # Columns already exist
-            pass
-        
-        conn.commit()
-        conn.close()
+        """Bring the schema up to date, skipping all DDL when already current"""
+        # Straight on the pool: connection()/transaction() would re-enter here
+        applied = migrations.migrate(self.pool)
+        self._initialized = True
+        return applied
     
     def _safe_json_loads(self, json_str):
         """Safely load JSON with fallback to empty dict"""
@@ -123,84 +128,78 @@ class FitnessDB:
     
     def create_user(self, username, password):
         """Create new user"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        password_hash = self.hash_password(password)
         try:
-            password_hash = self.hash_password(password)
-            cursor.execute(
-                "INSERT INTO users (username, password_hash) VALUES (?, ?)",
-                (username, password_hash)
-            )
-            user_id = cursor.lastrowid
-            conn.commit()
-            return user_id
+            with self.transaction() as conn:
+                cursor = conn.execute(
+                    "INSERT INTO users (username, password_hash) VALUES (?, ?)",
+                    (username, password_hash)
+                )
+                return cursor.lastrowid
         except sqlite3.IntegrityError:
             return None
-        finally:
-            conn.close()
     
     def authenticate_user(self, username, password):
         """Authenticate user login"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         password_hash = self.hash_password(password)
-        cursor.execute(
-            "SELECT id FROM users WHERE username = ? AND password_hash = ?",
-            (username, password_hash)
-        )
-        
-        result = cursor.fetchone()
-        conn.close()
+        with self.connection() as conn:
+            result = conn.execute(
+                "SELECT id FROM users WHERE username = ? AND password_hash = ?",
+                (username, password_hash)
+            ).fetchone()
         return result[0] if result else None
     
     def save_user_profile(self, user_id, profile_data):
         """Save user profile data"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO user_profiles 
-            (user_id, fitness_level, primary_goal, weight, height, age, 
-             activity_level, workout_frequency, workout_duration, target_weight,
-             timeline, motivation, preferred_time, workout_location, sleep_hours,
-             stress_level, dietary_restrictions, medical_conditions, preferences)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            user_id,
-            profile_data.get('fitness_level'),
-            profile_data.get('primary_goal'),
-            profile_data.get('weight'),
-            profile_data.get('height'),
-            profile_data.get('age'),
-            profile_data.get('activity_level'),
-            profile_data.get('workout_frequency'),
-            profile_data.get('workout_duration'),
-            profile_data.get('target_weight'),
-            profile_data.get('timeline'),
-            profile_data.get('motivation'),
-            profile_data.get('preferred_time'),
-            profile_data.get('workout_location'),
-            profile_data.get('sleep_hours'),
-            profile_data.get('stress_level'),
-            profile_data.get('dietary_restrictions'),
-            profile_data.get('medical_conditions'),
-            json.dumps(profile_data.get('preferences', {}))
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO user_profiles 
+                (user_id, fitness_level, primary_goal, weight, height, age, 
+                 activity_level, workout_frequency, workout_duration, target_weight,
+                 timeline, motivation, preferred_time, workout_location, sleep_hours,
+                 stress_level, dietary_restrictions, medical_conditions, preferences)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                user_id,
+                profile_data.get('fitness_level'),
+                profile_data.get('primary_goal'),
+                profile_data.get('weight'),
+                profile_data.get('height'),
+                profile_data.get('age'),
+                profile_data.get('activity_level'),
+                profile_data.get('workout_frequency'),
+                profile_data.get('workout_duration'),
+                profile_data.get('target_weight'),
+                profile_data.get('timeline'),
+                profile_data.get('motivation'),
+                profile_data.get('preferred_time'),
+                profile_data.get('workout_location'),
+                profile_data.get('sleep_hours'),
+                profile_data.get('stress_level'),
+                profile_data.get('dietary_restrictions'),
+                profile_data.get('medical_conditions'),
+                json.dumps(profile_data.get('preferences', {}))
+            ))
+            profile_cache.bump_generation(conn, user_id)
+        self.profiles.invalidate(user_id)
     
     def get_user_profile(self, user_id):
         """Get user profile data"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Enable column access by name
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM user_profiles WHERE user_id = ?", (user_id,))
-        result = cursor.fetchone()
-        conn.close()
+        profile, _ = self.get_profile_context(user_id)
+        return dict(profile) if profile else None
+    
+    def get_profile_context(self, user_id):
+        """Cached (profile, rendered prompt context) for a user"""
+        with self.connection() as conn:
+            return self.profiles.get(conn, user_id, self._load_user_profile)
+    
+    def _load_user_profile(self, conn, user_id):
+        """Read a profile row and its generation in one statement"""
+        result = conn.execute('''
+            SELECT p.*, COALESCE(g.generation, 0) AS generation
+            FROM user_profiles p LEFT JOIN profile_generations g ON g.user_id = p.user_id
+            WHERE p.user_id = ?
+        ''', (user_id,)).fetchone()
         
         if result:
             profile = {
@@ -223,40 +222,76 @@ class FitnessDB:
                 'medical_conditions': result['medical_conditions'],
                 'preferences': self._safe_json_loads(result['preferences'])
             }
-            return profile
-        return None
+            return result['generation'], profile
+        return profile_cache.current_generation(conn, user_id), None
+    
+    def prime_profile_cache(self, limit=100):
+        """Load the profiles of the most recently active users into the cache"""
+        with self.connection() as conn:
+            user_ids = [row[0] for row in conn.execute('''
+                SELECT user_id FROM workout_entries
+                GROUP BY user_id ORDER BY MAX(created_at) DESC LIMIT ?
+            ''', (limit,))]
+            for user_id in user_ids:
+                self.profiles.get(conn, user_id, self._load_user_profile)
+        return len(user_ids)
+    
+    def profile_cache_stats(self):
+        """Profile cache size and hit rate"""
+        return self.profiles.stats()
     
     def add_user_knowledge(self, user_id, category, content):
         """Add knowledge entry for RAG"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
+        return self.queue_user_knowledge(user_id, category, content).result()
+    
+    def queue_user_knowledge(self, user_id, category, content):
+        """Queue a knowledge entry, returning a Future for its id"""
+        return self.queue_write(self._write_user_knowledge, user_id, category, content)
+    
+    def _write_user_knowledge(self, conn, user_id, category, content):
+        return conn.execute(
             "INSERT INTO user_knowledge (user_id, category, content) VALUES (?, ?, ?)",
             (user_id, category, content)
-        )
-        
-        conn.commit()
-        conn.close()
+        ).lastrowid
     
     def get_user_knowledge(self, user_id, limit=10):
         """Get user knowledge for RAG context"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT category, content, timestamp FROM user_knowledge WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?",
-            (user_id, limit)
-        )
-        
-        results = cursor.fetchall()
-        conn.close()
+        with self.connection() as conn:
+            results = conn.execute(
+                "SELECT category, content, timestamp FROM user_knowledge WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?",
+                (user_id, limit)
+            ).fetchall()
         
         return [{'category': r[0], 'content': r[1], 'timestamp': r[2]} for r in results]
     
+    def search_user_context(self, user_id, message, k=None, token_budget=None):
+        """Knowledge and workout-note passages relevant to a chat message"""
+        with self.connection() as conn:
+            return retrieval.retrieve(
+                conn, user_id, message,
+                k=k or retrieval.RETRIEVAL_TOP_K,
+                token_budget=token_budget or retrieval.RETRIEVAL_TOKEN_BUDGET,
+            )
+    
+    def _exercise_row(self, entry_id, exercise):
+        """Parameters for INSERT_EXERCISE_SQL"""
+        return (entry_id, exercise['name'], exercise.get('sets'), exercise.get('reps'), 
+                exercise.get('weight'), exercise.get('duration'), exercise.get('notes', ''), exercise.get('completed', False),
+                progress.exercise_key(exercise['name']))
+    
+    def _insert_exercises(self, cursor, entry_id, exercises):
+        """Insert exercise rows for an entry"""
+        cursor.executemany(INSERT_EXERCISE_SQL, [self._exercise_row(entry_id, exercise) for exercise in exercises])
+    
     def save_workout_entry(self, user_id, entry_data):
         """Save workout journal entry with exercises"""
-        conn = sqlite3.connect(self.db_path)
+        return self.queue_workout_entry(user_id, entry_data).result()
+    
+    def queue_workout_entry(self, user_id, entry_data):
+        """Queue a journal entry, returning a Future for its id"""
+        return self.queue_write(self._write_workout_entry, user_id, entry_data)
+    
+    def _write_workout_entry(self, conn, user_id, entry_data):
         cursor = conn.cursor()
         
         # Save main entry
@@ -267,120 +302,281 @@ class FitnessDB:
         entry_id = cursor.lastrowid
         
         # Save exercises
-        for exercise in entry_data.get('exercises', []):
-            cursor.execute(
-                "INSERT INTO workout_exercises (entry_id, exercise_name, sets, reps, weight, duration_minutes, notes, completed) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                (entry_id, exercise['name'], exercise.get('sets'), exercise.get('reps'), 
-                 exercise.get('weight'), exercise.get('duration'), exercise.get('notes', ''), exercise.get('completed', False))
-            )
-        
-        conn.commit()
-        conn.close()
+        self._insert_exercises(cursor, entry_id, entry_data.get('exercises', []))
+        progress.add_entry(conn, user_id, entry_data['date'], entry_data.get('exercises', []))
+        revisions.bump_journal(conn, user_id)
         return entry_id
     
-    def get_workout_entries(self, user_id, limit=20):
-        """Get workout journal entries for user"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT * FROM workout_entries WHERE user_id = ? ORDER BY date DESC, created_at DESC LIMIT ?",
-            (user_id, limit)
-        )
-        entries = cursor.fetchall()
-        
-        result = []
-        for entry in entries:
-            # Get exercises for this entry
-            cursor.execute(
-                "SELECT * FROM workout_exercises WHERE entry_id = ? ORDER BY id",
-                (entry['id'],)
-            )
-            exercises = cursor.fetchall()
+    def import_workout_entries(self, user_id, entries):
+        """Save a batch of journal entries in one transaction, returning their ids"""
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            entry_ids = []
+            exercise_rows = []
+            for entry_data in entries:
+                cursor.execute(
+                    "INSERT INTO workout_entries (user_id, date, title, notes) VALUES (?, ?, ?, ?)",
+                    (user_id, entry_data['date'], entry_data['title'], entry_data.get('notes', ''))
+                )
+                entry_ids.append(cursor.lastrowid)
+                exercise_rows.extend(
+                    self._exercise_row(cursor.lastrowid, exercise) for exercise in entry_data.get('exercises', [])
+                )
+                progress.add_entry(conn, user_id, entry_data['date'], entry_data.get('exercises', []), refresh=False)
             
-            result.append({
-                'id': entry['id'],
-                'date': entry['date'],
-                'title': entry['title'],
-                'notes': entry['notes'],
-                'created_at': entry['created_at'],
-                'exercises': [dict(ex) for ex in exercises]
-            })
-        
-        conn.close()
-        return result
+            # One executemany for every exercise in the batch
+            cursor.executemany(INSERT_EXERCISE_SQL, exercise_rows)
+            progress.refresh_summary(conn, user_id)
+            revisions.bump_journal(conn, user_id)
+        return entry_ids
     
-    def update_exercise_completion(self, exercise_id, completed):
-        """Update exercise completion status"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "UPDATE workout_exercises SET completed = ? WHERE id = ?",
-            (completed, exercise_id)
-        )
-        
-        conn.commit()
-        conn.close()
+    def _entries_with_exercises(self, conn, entries):
+        """Attach exercises to entry rows with one IN-batched query"""
+        if not entries:
+            return []
+        
+        entry_ids = [entry['id'] for entry in entries]
+        placeholders = ','.join('?' * len(entry_ids))
+        exercises_by_entry = {entry_id: [] for entry_id in entry_ids}
+        for ex in conn.execute(
+            f"SELECT {EXERCISE_COLUMNS} FROM workout_exercises WHERE entry_id IN ({placeholders}) ORDER BY entry_id, id",
+            entry_ids
+        ):
+            exercises_by_entry[ex['entry_id']].append(dict(ex))
+        
+        return [{
+            'id': entry['id'],
+            'date': entry['date'],
+            'title': entry['title'],
+            'notes': entry['notes'],
+            'created_at': entry['created_at'],
+            'version': entry['version'],
+            'exercises': exercises_by_entry[entry['id']]
+        } for entry in entries]
     
-    def update_workout_entry(self, entry_id, user_id, entry_data):
-        """Update existing workout entry"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def get_journal_revision(self, user_id):
+        """(revision, updated_at) of a user's journal, bumped by every journal write"""
+        with self.connection() as conn:
+            return revisions.journal_revision(conn, user_id)
+    
+    def get_profile_revision(self, user_id):
+        """(generation, updated_at) of a user's profile, bumped by every save"""
+        with self.connection() as conn:
+            return revisions.profile_revision(conn, user_id)
+    
+    def get_workout_entries(self, user_id, limit=20, before=None):
+        """Get a page of workout journal entries for user, newest first
+        
+        `before` is the (date, created_at, id) key of the last entry on the
+        previous page; seeking past it keeps every page an index range scan.
+        """
+        with self.connection() as conn:
+            if before is None:
+                entries = conn.execute(
+                    "SELECT * FROM workout_entries WHERE user_id = ? ORDER BY date DESC, created_at DESC, id DESC LIMIT ?",
+                    (user_id, limit)
+                ).fetchall()
+            else:
+                entries = conn.execute(
+                    "SELECT * FROM workout_entries WHERE user_id = ? AND (date, created_at, id) < (?, ?, ?) "
+                    "ORDER BY date DESC, created_at DESC, id DESC LIMIT ?",
+                    (user_id, *before, limit)
+                ).fetchall()
+            return self._entries_with_exercises(conn, entries)
+    
+    def update_exercise_completion(self, exercise_id, completed, user_id):
+        """Update exercise completion status, returning False if the user doesn't own it"""
+        return self.update_exercises(user_id, [{'id': exercise_id, 'completed': completed}]) is not None
+    
+    def update_exercises(self, user_id, updates):
+        """Apply completion/sets/reps/weight changes to many exercises in one transaction
+        
+        Each update is a dict with an 'id' plus any of EXERCISE_UPDATE_FIELDS.
+        Returns the number of exercises updated, or None (changing nothing) if
+        any id doesn't belong to the user.
+        """
+        return self.queue_exercise_updates(user_id, updates).result()
+    
+    def queue_exercise_updates(self, user_id, updates):
+        """Queue update_exercises(), returning a Future for its result"""
+        return self.queue_write(self._write_exercise_updates, user_id, updates)
+    
+    def _write_exercise_updates(self, conn, user_id, updates):
+        changes = {}
+        for update in updates:
+            changes.setdefault(update['id'], {}).update(
+                {field: update[field] for field in EXERCISE_UPDATE_FIELDS if field in update}
+            )
+        if not changes:
+            return 0
+        
+        ids = list(changes)
+        placeholders = ','.join('?' * len(ids))
+        rows = conn.execute(f'''
+            SELECT ex.*, e.date FROM workout_exercises ex
+            JOIN workout_entries e ON e.id = ex.entry_id
+            WHERE ex.id IN ({placeholders}) AND e.user_id = ?
+        ''', ids + [user_id]).fetchall()
+        if len(rows) != len(ids):
+            return None
         
-        # Update main entry
-        cursor.execute(
-            "UPDATE workout_entries SET date = ?, title = ?, notes = ? WHERE id = ? AND user_id = ?",
-            (entry_data['date'], entry_data['title'], entry_data.get('notes', ''), entry_id, user_id)
+        params = []
+        recompute = set()
+        newly_completed = []
+        for row in rows:
+            new = {**dict(row), **changes[row['id']]}
+            new['completed'] = bool(new['completed'])
+            params.append((new['completed'], new['sets'], new['reps'], new['weight'], row['id']))
+            
+            # Completed rows feed the progress aggregates; maxima can't be
+            # decremented, so any change to a counted row recomputes its exercise
+            stats_changed = any(new[field] != row[field] for field in ('sets', 'reps', 'weight'))
+            if row['completed'] and (not new['completed'] or stats_changed):
+                recompute.add(row['exercise_key'])
+            elif new['completed'] and not row['completed']:
+                newly_completed.append((row['date'], new))
+        
+        conn.executemany(
+            "UPDATE workout_exercises SET completed = ?, sets = ?, reps = ?, weight = ? WHERE id = ?",
+            params
         )
-        
-        # Delete existing exercises
-        cursor.execute("DELETE FROM workout_exercises WHERE entry_id = ?", (entry_id,))
-        
-        # Add updated exercises
-        for exercise in entry_data.get('exercises', []):
+        # Edits are changes too: an edit form loaded before this must not overwrite it
+        entry_ids = {row['entry_id'] for row in rows}
+        conn.executemany(
+            "UPDATE workout_entries SET version = version + 1 WHERE id = ?",
+            [(entry_id,) for entry_id in entry_ids]
+        )
+        revisions.bump_journal(conn, user_id)
+        progress.recompute_exercises(conn, user_id, recompute)
+        for entry_date, exercise in newly_completed:
+            # recompute_exercises already counted rows for those exercises
+            if exercise['exercise_key'] not in recompute:
+                progress.add_exercise(conn, user_id, entry_date, exercise)
+        return len(rows)
+    
+    def update_workout_entry(self, entry_id, user_id, entry_data, expected_version=None):
+        """Update a workout entry in place, returning its new version or False if the user doesn't own it
+        
+        Incoming exercises with an 'id' update that row only when a column
+        changed, exercises without one are inserted and missing rows are
+        deleted. When expected_version is given and the entry has moved on,
+        EntryVersionConflict is raised and nothing is written.
+        """
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            
+            old_entry = cursor.execute(
+                "SELECT date, title, notes, version FROM workout_entries WHERE id = ? AND user_id = ?",
+                (entry_id, user_id)
+            ).fetchone()
+            if not old_entry:
+                return False
+            if expected_version is not None and expected_version != old_entry['version']:
+                raise EntryVersionConflict(old_entry['version'])
+            old_rows = {row['id']: row for row in cursor.execute(
+                "SELECT * FROM workout_exercises WHERE entry_id = ?", (entry_id,)
+            )}
+            
+            date_changed = entry_data['date'] != old_entry['date']
+            entry_changed = date_changed or (entry_data['title'], entry_data.get('notes', '')) != (old_entry['title'], old_entry['notes'])
+            
+            inserts, updates, kept = [], [], set()
+            removed, added = [], []  # progress contributions that go away / appear
+            for exercise in entry_data.get('exercises', []):
+                row = self._exercise_row(entry_id, exercise)
+                old = old_rows.get(exercise.get('id'))
+                if old is None or old['id'] in kept:
+                    inserts.append(row)
+                    added.append(exercise)
+                    continue
+                kept.add(old['id'])
+                if _exercise_changed(old, row):
+                    updates.append(row[1:] + (old['id'],))
+                    removed.append(old)
+                    added.append(exercise)
+                elif date_changed:
+                    removed.append(old)
+                    added.append(exercise)
+            deleted = [old for exercise_id, old in old_rows.items() if exercise_id not in kept]
+            removed.extend(deleted)
+            
+            if not (entry_changed or inserts or updates or deleted):
+                return old_entry['version']
+            
             cursor.execute(
-                "INSERT INTO workout_exercises (entry_id, exercise_name, sets, reps, weight, duration_minutes, notes, completed) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                (entry_id, exercise['name'], exercise.get('sets'), exercise.get('reps'), 
-                 exercise.get('weight'), exercise.get('duration'), exercise.get('notes', ''), exercise.get('completed', False))
+                "UPDATE workout_entries SET date = ?, title = ?, notes = ?, version = version + 1 WHERE id = ? AND user_id = ?",
+                (entry_data['date'], entry_data['title'], entry_data.get('notes', ''), entry_id, user_id)
             )
-        
-        conn.commit()
-        conn.close()
+            if deleted:
+                cursor.executemany("DELETE FROM workout_exercises WHERE id = ?", [(old['id'],) for old in deleted])
+            if updates:
+                cursor.executemany(UPDATE_EXERCISE_SQL, updates)
+            if inserts:
+                cursor.executemany(INSERT_EXERCISE_SQL, inserts)
+            
+            # Removed contributions force a recompute of their exercise (maxima
+            # can't be decremented); new ones are added as deltas unless that
+            # recompute already counted them
+            if date_changed:
+                progress.remove_entry(conn, user_id, old_entry['date'], [], refresh=False)
+                progress.add_entry(conn, user_id, entry_data['date'], [], refresh=False)
+            recompute = {old['exercise_key'] for old in removed if old['completed']}
+            progress.recompute_exercises(conn, user_id, recompute)
+            for exercise in added:
+                if exercise.get('completed') and progress.exercise_key(exercise['name']) not in recompute:
+                    progress.add_exercise(conn, user_id, entry_data['date'], exercise)
+            progress.refresh_summary(conn, user_id)
+            revisions.bump_journal(conn, user_id)
+            return old_entry['version'] + 1
     
     def get_workout_entry(self, entry_id, user_id):
         """Get single workout entry"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT * FROM workout_entries WHERE id = ? AND user_id = ?",
-            (entry_id, user_id)
-        )
-        entry = cursor.fetchone()
-        
-        if entry:
-            cursor.execute(
-                "SELECT * FROM workout_exercises WHERE entry_id = ? ORDER BY id",
-                (entry['id'],)
-            )
-            exercises = cursor.fetchall()
-            
-            result = {
-                'id': entry['id'],
-                'date': entry['date'],
-                'title': entry['title'],
-                'notes': entry['notes'],
-                'created_at': entry['created_at'],
-                'exercises': [dict(ex) for ex in exercises]
-            }
+        with self.connection() as conn:
+            entry = conn.execute(
+                "SELECT * FROM workout_entries WHERE id = ? AND user_id = ?",
+                (entry_id, user_id)
+            ).fetchone()
             
-            conn.close()
-            return result
-        
-        conn.close()
-        return None
+            if not entry:
+                return None
+            return self._entries_with_exercises(conn, [entry])[0]
+
+    def search_journal(self, user_id, text, start_date=None, end_date=None, limit=20, sort='rank'):
+        """Full-text search over entry titles/notes and exercise names/notes"""
+        with self.connection() as conn:
+            return journal_search.search(conn, user_id, text, start_date, end_date, limit, sort)
+
+    def get_progress_summary(self, user_id):
+        """Workout totals and streaks from the progress aggregates"""
+        with self.connection() as conn:
+            return progress.get_summary(conn, user_id)
+    
+    def get_exercise_progress(self, user_id, name=None):
+        """Per-exercise volume, bests and estimated 1RM"""
+        with self.connection() as conn:
+            return progress.get_exercises(conn, user_id, name)
+    
+    def get_weekly_activity(self, user_id, weeks=12):
+        """Workouts per week for recent weeks"""
+        with self.connection() as conn:
+            return progress.get_weekly(conn, user_id, weeks)
+    
+    def rebuild_progress(self, user_id):
+        """Recompute a user's progress aggregates from the journal"""
+        with self.transaction() as conn:
+            return progress.rebuild(conn, user_id)
+
+def encode_entry_cursor(entry):
+    """Opaque pagination cursor for the position after `entry`"""
+    key = json.dumps([entry['date'], entry['created_at'], entry['id']])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+def decode_entry_cursor(cursor):
+    """Inverse of encode_entry_cursor, raises ValueError on a bad cursor"""
+    try:
+        date, created_at, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (date, created_at, int(entry_id))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
 
-db = FitnessDB()
+db = FitnessDB(os.getenv("FITNESS_DB_PATH", "fitness_app.db"))
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from observability import record_agent_call
+
+# Separate pools so slow model calls can never starve journal/auth DB work
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "8"))
+AGENT_EXECUTOR_WORKERS = int(os.getenv("AGENT_EXECUTOR_WORKERS", "4"))
+
+POOL_SIZES = {'db': DB_EXECUTOR_WORKERS, 'agent': AGENT_EXECUTOR_WORKERS}
+
+# Created on first use, and again after shutdown_executors, so the app's
+# lifespan can run more than once in a process (test clients, reloads)
+_pools = {name: None for name in POOL_SIZES}
+_pools_guard = threading.Lock()
+
+# A Strands Agent rejects concurrent invocations, so calls on the same
+# instance are serialized while calls on different instances run in parallel
+_agent_locks = weakref.WeakKeyDictionary()
+_agent_locks_guard = threading.Lock()
+
+
+def _pool(name):
+    with _pools_guard:
+        pool = _pools[name]
+        if pool is None:
+            pool = _pools[name] = ThreadPoolExecutor(max_workers=POOL_SIZES[name], thread_name_prefix=name)
+        return pool
+
+
+def _lock_for(agent):
+    with _agent_locks_guard:
+        lock = _agent_locks.get(agent)
+        if lock is None:
+            lock = _agent_locks[agent] = threading.Lock()
+        return lock
+
+
+def _call_agent(agent, prompt):
+    with _lock_for(agent):
+        started = time.perf_counter()
+        try:
+            result = agent(prompt)
+        except Exception:
+            record_agent_call('invoke', prompt, None, time.perf_counter() - started, outcome='error')
+            raise
+        record_agent_call('invoke', prompt, result, time.perf_counter() - started)
+        return result
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run a blocking database call on the DB thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool('db'), partial(fn, *args, **kwargs))
+
+
+async def run_agent(agent, prompt):
+    """Run a blocking agent call on the agent thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool('agent'), _call_agent, agent, prompt)
+
+
+async def run_agent_setup(fn, *args, **kwargs):
+    """Run blocking agent construction (SDK import, client setup) on the agent thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool('agent'), partial(fn, *args, **kwargs))
+
+
+async def stream_agent(agent, prompt, on_done=None):
+    """Yield text chunks from an agent call running on the agent thread pool
+
+    If the caller stops iterating, the model call is abandoned at its next
+    event. `on_done` runs on the event loop once the worker thread has
+    actually finished, which can be after the caller has gone away.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    finished = object()
+    stop = threading.Event()
+
+    call = {'started': None, 'first_token': None, 'result': None, 'text': []}
+
+    async def consume():
+        async for event in agent.stream_async(prompt):
+            if stop.is_set():
+                # asyncio.run closes the stream, ending the model call
+                break
+            if not isinstance(event, dict):
+                continue
+            if "result" in event:
+                call['result'] = event["result"]
+            text = event.get("data")
+            if text:
+                if call['first_token'] is None:
+                    call['first_token'] = time.perf_counter() - call['started']
+                call['text'].append(text)
+                loop.call_soon_threadsafe(queue.put_nowait, text)
+
+    def produce():
+        outcome = 'error'
+        try:
+            with _lock_for(agent):
+                call['started'] = time.perf_counter()
+                asyncio.run(consume())
+                outcome = 'cancelled' if stop.is_set() else 'ok'
+        except BaseException as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            if call['started'] is not None:
+                record_agent_call(
+                    'stream', prompt, call['result'] or ''.join(call['text']),
+                    time.perf_counter() - call['started'], outcome, call['first_token'],
+                )
+            loop.call_soon_threadsafe(queue.put_nowait, finished)
+            if on_done is not None:
+                loop.call_soon_threadsafe(on_done)
+
+    try:
+        future = loop.run_in_executor(_pool('agent'), produce)
+    except BaseException:
+        if on_done is not None:
+            on_done()
+        raise
+    try:
+        while True:
+            item = await queue.get()
+            if item is finished:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+        await future
+    finally:
+        stop.set()
+
+
+def shutdown_executors(wait=True):
+    """Stop both pools, used on application shutdown; later calls get fresh pools"""
+    with _pools_guard:
+        pools = [pool for pool in _pools.values() if pool is not None]
+        for name in _pools:
+            _pools[name] = None
+    for pool in pools:
+        pool.shutdown(wait=wait)
@@ -0,0 +1,368 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from strands.tools.tools import PythonAgentTool
+from strands_tools import http_request as http_request_tool
+
+from observability import agent_http_tool_calls, agent_http_tool_duration, get_logger, log_fields
+
+# Disk cache in front of the agent's http_request tool. Plain GETs (no auth,
+# cookies, body or streaming) are answered from a store under HTTP_CACHE_DIR:
+# bodies are files named by their SHA-256, so the same page reached through
+# different URLs is kept once, and a small SQLite index maps each request to
+# its body plus the validators and freshness from Cache-Control / Expires.
+# Fresh entries skip the network, stale ones are revalidated with
+# If-None-Match / If-Modified-Since, and least recently used entries are
+# evicted past HTTP_CACHE_MAX_MB. Every other request goes to the original tool.
+#
+# HTTP_CACHE_MODE=replay never touches the network: cached pages are served
+# whatever their age and anything else is an error, for repeatable tests and
+# benchmarks. HTTP_CACHE_MODE=off bypasses the cache.
+
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "http_cache")
+HTTP_CACHE_MAX_BYTES = int(float(os.getenv("HTTP_CACHE_MAX_MB", "256")) * 1024 * 1024)
+HTTP_CACHE_MODE = os.getenv("HTTP_CACHE_MODE", "normal").lower()
+
+CACHEABLE_STATUSES = (200, 203)
+PERMANENT_REDIRECTS = (301, 308)  # a chain of these may be cached with its final response
+HEURISTIC_FRACTION = 0.1  # of the time since Last-Modified, when no lifetime is given
+HEURISTIC_MAX_SECONDS = 24 * 3600
+RESULT_HEADERS = ('content-type', 'content-length', 'date', 'server', 'payment-required')
+UNCACHEABLE_INPUTS = ('auth_type', 'auth_token', 'auth_env_var', 'cookie', 'cookie_jar', 'body', 'streaming')
+
+logger = get_logger("http_tool")
+
+
+def _cache_control(headers):
+    directives = {}
+    for part in headers.get('cache-control', '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"')
+    return directives
+
+
+def _http_time(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers, now):
+    """Seconds a response stays fresh, or None when it must not be stored"""
+    directives = _cache_control(headers)
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0
+    age = int(headers['age']) if headers.get('age', '').isdigit() else 0
+    if directives.get('max-age', '').isdigit():
+        return max(int(directives['max-age']) - age, 0)
+    date = _http_time(headers.get('date')) or now
+    expires = _http_time(headers.get('expires'))
+    if expires is not None:
+        return max(expires - date, 0)
+    last_modified = _http_time(headers.get('last-modified'))
+    if last_modified is not None:
+        return min(max(date - last_modified, 0) * HEURISTIC_FRACTION, HEURISTIC_MAX_SECONDS)
+    return 0
+
+
+class HttpCache:
+    """Content-addressed response bodies with an LRU index in SQLite"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.objects = os.path.join(directory, 'objects')
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(self.objects, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.directory, 'index.db'), timeout=5, check_same_thread=False,
+                                   isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    url TEXT,
+                    status INTEGER,
+                    headers TEXT,
+                    body_hash TEXT,
+                    size INTEGER,
+                    fresh_until REAL,
+                    last_used REAL,
+                    redirects TEXT
+                )
+            ''')
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(entries)")}
+            if 'redirects' not in columns:
+                conn.execute("ALTER TABLE entries ADD COLUMN redirects TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used)")
+            self._conn = conn
+        return self._conn
+
+    def _path(self, body_hash):
+        return os.path.join(self.objects, body_hash[:2], body_hash)
+
+    def lookup(self, key):
+        """(entry, body) for a request key, or None"""
+        with self._lock:
+            row = self._db().execute("SELECT * FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            try:
+                with open(self._path(row['body_hash']), 'rb') as f:
+                    body = f.read()
+            except FileNotFoundError:
+                self._db().execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            self._db().execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        entry = dict(row)
+        entry['headers'] = json.loads(entry['headers'])
+        return entry, body
+
+    def store(self, key, url, status, headers, body, fresh_until, redirects=None):
+        body_hash = hashlib.sha256(body).hexdigest()
+        path = self._path(body_hash)
+        with self._lock:
+            conn = self._db()
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(temp, 'wb') as f:
+                    f.write(body)
+                os.replace(temp, path)
+            conn.execute('''
+                INSERT OR REPLACE INTO entries
+                    (key, url, status, headers, body_hash, size, fresh_until, last_used, redirects)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (key, url, status, json.dumps(headers), body_hash, len(body), fresh_until, time.time(), redirects))
+            self._evict(conn)
+
+    def refresh(self, key, headers, fresh_until):
+        """Record a 304: merge the new headers and extend freshness"""
+        with self._lock:
+            conn = self._db()
+            row = conn.execute("SELECT headers FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                merged = {**json.loads(row['headers']), **headers}
+                conn.execute("UPDATE entries SET headers = ?, fresh_until = ? WHERE key = ?",
+                             (json.dumps(merged), fresh_until, key))
+
+    def _total_bytes(self, conn):
+        return conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT body_hash, size FROM entries)"
+        ).fetchone()[0]
+
+    def _evict(self, conn):
+        total = self._total_bytes(conn)
+        while total > self.max_bytes:
+            row = conn.execute("SELECT key, body_hash, size FROM entries ORDER BY last_used LIMIT 1").fetchone()
+            if row is None:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (row['key'],))
+            shared = conn.execute("SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (row['body_hash'],)).fetchone()
+            if shared is None:
+                try:
+                    os.remove(self._path(row['body_hash']))
+                except FileNotFoundError:
+                    pass
+                total -= row['size']
+
+    def stats(self):
+        with self._lock:
+            conn = self._db()
+            return {
+                'entries': conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0],
+                'bytes': self._total_bytes(conn),
+                'max_bytes': self.max_bytes,
+                'mode': HTTP_CACHE_MODE,
+            }
+
+
+cache = HttpCache(HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES)
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _get_session(max_redirects):
+    """A shared session per redirect limit, so no call changes another's"""
+    with _sessions_lock:
+        session = _sessions.get(max_redirects)
+        if session is None:
+            session = http_request_tool.create_session({})
+            if max_redirects is not None:
+                session.max_redirects = max_redirects
+            _sessions[max_redirects] = session
+        return session
+
+
+def _cacheable(tool_input):
+    # A call without a URL goes to the original tool, which reports the error
+    if not tool_input.get('url') or str(tool_input.get('method', '')).upper() != 'GET':
+        return False
+    if any(tool_input.get(name) for name in UNCACHEABLE_INPUTS) or tool_input.get('verify_ssl') is False:
+        return False
+    headers = {name.lower() for name in tool_input.get('headers') or {}}
+    return not headers & {'authorization', 'cookie', 'proxy-authorization'}
+
+
+def _redirect_options(tool_input):
+    return bool(tool_input.get('allow_redirects', True)), tool_input.get('max_redirects')
+
+
+def _request_key(tool_input):
+    headers = sorted((name.lower(), str(value)) for name, value in (tool_input.get('headers') or {}).items())
+    allow_redirects, max_redirects = _redirect_options(tool_input)
+    request = ['GET', tool_input.get('url'), headers, allow_redirects, max_redirects]
+    return hashlib.sha256(json.dumps(request).encode('utf-8')).hexdigest()
+
+
+def _text(headers, body):
+    charset = 'utf-8'
+    for part in headers.get('content-type', '').split(';')[1:]:
+        name, _, value = part.strip().partition('=')
+        if name.lower() == 'charset' and value:
+            charset = value.strip('"')
+    try:
+        return body.decode(charset, errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+
+def _redirect_chain(response):
+    if not response.history:
+        return None
+    statuses = [str(r.status_code) for r in response.history] + [str(response.status_code)]
+    return f"{len(response.history)} redirects followed ({' -> '.join(statuses)})"
+
+
+def _result(tool_use_id, tool_input, status, headers, body, outcome, elapsed, redirects=None):
+    """A ToolResult shaped like the original tool's"""
+    content = _text(headers, body)
+    if tool_input.get('convert_to_markdown') and (
+            'text/html' in headers.get('content-type', '').lower() or '<html' in content[:100].lower()):
+        content = http_request_tool.extract_content_from_html(content)
+    shown = {name.title(): headers[name] for name in RESULT_HEADERS if name in headers}
+    lines = [f"Status Code: {status}"]
+    if redirects:
+        lines.append(f"Redirects: {redirects}")
+    lines += [f"Headers: {shown}", f"Body: {content}"]
+    if tool_input.get('metrics'):
+        lines.append(f"Metrics: {{'duration': {round(elapsed, 3)}, 'cache': '{outcome}'}}")
+    return {"toolUseId": tool_use_id, "status": "success", "content": [{"text": line} for line in lines]}
+
+
+def _error(tool_use_id, message):
+    return {"toolUseId": tool_use_id, "status": "error", "content": [{"text": f"Error: {message}"}]}
+
+
+def _may_serve_stale(headers):
+    """Whether a stored response may stand in when the origin can't be reached"""
+    directives = _cache_control(headers)
+    return not {'must-revalidate', 'proxy-revalidate', 'no-cache'} & directives.keys()
+
+
+def _fetch(tool_use_id, tool_input, key, cached, started):
+    """Fetch or revalidate over the network, returning (result, outcome)"""
+    request_headers = dict(tool_input.get('headers') or {})
+    if cached is not None:
+        entry = cached[0]
+        if entry['headers'].get('etag'):
+            request_headers['If-None-Match'] = entry['headers']['etag']
+        if entry['headers'].get('last-modified'):
+            request_headers['If-Modified-Since'] = entry['headers']['last-modified']
+    try:
+        allow_redirects, max_redirects = _redirect_options(tool_input)
+        response = _get_session(max_redirects).get(tool_input['url'], headers=request_headers,
+                                                   allow_redirects=allow_redirects,
+                                                   timeout=tool_input.get('timeout', 30))
+    except Exception as e:
+        if cached is not None and _may_serve_stale(cached[0]['headers']):
+            # Better an old copy than nothing
+            entry, body = cached
+            return _result(tool_use_id, tool_input, entry['status'], entry['headers'], body, 'stale',
+                           time.perf_counter() - started, entry['redirects']), 'stale'
+        return _error(tool_use_id, e), 'error'
+
+    now = time.time()
+    headers = {name.lower(): value for name, value in response.headers.items()}
+    lifetime = freshness_lifetime(headers, now)
+    if response.status_code == 304 and cached is not None:
+        entry, body = cached
+        cache.refresh(key, headers, now + (lifetime or 0))
+        merged = {**entry['headers'], **headers}
+        return _result(tool_use_id, tool_input, entry['status'], merged, body, 'revalidated',
+                       time.perf_counter() - started, entry['redirects']), 'revalidated'
+
+    body = response.content
+    # The body is stored decoded, so the stored headers mustn't claim otherwise
+    headers.pop('content-encoding', None)
+    headers.pop('transfer-encoding', None)
+    redirects = _redirect_chain(response)
+    # Only permanent redirects may be replayed without asking the origin again
+    permanent = all(r.status_code in PERMANENT_REDIRECTS for r in response.history)
+    if response.status_code in CACHEABLE_STATUSES and lifetime is not None and headers.get('vary') != '*' \
+            and permanent:
+        try:
+            cache.store(key, tool_input['url'], response.status_code, headers, body, now + lifetime, redirects)
+        except (OSError, sqlite3.Error):
+            logger.warning("http cache store failed", exc_info=True)
+    return _result(tool_use_id, tool_input, response.status_code, headers, body, 'miss',
+                   time.perf_counter() - started, redirects), 'miss'
+
+
+def cached_http_request(tool, **kwargs):
+    """http_request with the disk cache in front of plain GETs"""
+    tool_input = tool.get('input', {})
+    tool_use_id = tool.get('toolUseId', 'default_id')
+    started = time.perf_counter()
+
+    if HTTP_CACHE_MODE == 'off' or not _cacheable(tool_input):
+        outcome = 'bypass'
+        result = http_request_tool.http_request(tool, **kwargs)
+    else:
+        key = _request_key(tool_input)
+        try:
+            cached = cache.lookup(key)
+        except (OSError, sqlite3.Error):
+            logger.warning("http cache lookup failed", exc_info=True)
+            cached = None
+        if HTTP_CACHE_MODE == 'replay':
+            if cached is None:
+                outcome = 'replay_miss'
+                result = _error(tool_use_id, f"{tool_input['url']} is not in the HTTP cache (HTTP_CACHE_MODE=replay)")
+            else:
+                outcome = 'hit'
+                entry, body = cached
+                result = _result(tool_use_id, tool_input, entry['status'], entry['headers'], body, outcome,
+                                 time.perf_counter() - started, entry['redirects'])
+        elif cached is not None and cached[0]['fresh_until'] > time.time():
+            outcome = 'hit'
+            entry, body = cached
+            result = _result(tool_use_id, tool_input, entry['status'], entry['headers'], body, outcome,
+                             time.perf_counter() - started, entry['redirects'])
+        else:
+            result, outcome = _fetch(tool_use_id, tool_input, key, cached, started)
+
+    elapsed = time.perf_counter() - started
+    agent_http_tool_calls.inc(outcome=outcome)
+    agent_http_tool_duration.observe(elapsed, outcome=outcome)
+    logger.debug("http_request tool call", extra=log_fields(
+        url=tool_input.get('url'), outcome=outcome, duration_ms=round(elapsed * 1000, 1)))
+    return result
+
+
+def create_http_request_tool():
+    """The agent's http_request tool, cached"""
+    return PythonAgentTool('http_request', http_request_tool.TOOL_SPEC, cached_http_request)
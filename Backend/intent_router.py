@@ -0,0 +1,113 @@
+import os
+import re
+
+# Rule-based stage ahead of the agent for chat questions the profile alone
+# answers. A message is routed locally only when every word in it belongs to
+# one intent's vocabulary; anything else (a second question, a food, "burn",
+# "for hypertrophy") goes to the agent. The numbers mirror SYSTEM_PROMPT in
+# strands_fitness_agent.py so local answers match what the agent would say.
+
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "1").lower() in ("1", "true", "yes")
+
+CALORIE_FACTORS = {
+    'weight_loss': (22, "a moderate deficit for weight loss"),
+    'muscle_gain': (35, "a surplus to support muscle gain"),
+    'general_fitness': (28, "maintenance for general fitness"),
+}
+REP_SCHEMES = {
+    'beginner': ("Basic exercises, lower reps", [("Push-ups", "3x8"), ("Squats", "3x10"), ("Plank", "3x30s")]),
+    'intermediate': ("More variety, moderate intensity",
+                     [("Push-ups", "3x15"), ("Squats", "3x20"), ("Lunges", "3x12")]),
+    'advanced': ("Complex movements, high intensity",
+                 [("Burpees", "4x10"), ("Jump squats", "4x15"), ("Mountain climbers", "4x20")]),
+}
+
+# Words that carry no intent of their own
+COMMON_WORDS = {
+    'a', 'about', 'am', 'approximately', 'are', 'based', 'be', 'can', 'could', 'current', 'currently',
+    'do', 'does', 'doing', 'get', 'give', 'good', 'have', 'hey', 'hi', 'how', 'i', 'ideal', 'is', 'it',
+    'know', 'level', 'many', 'me', 'much', 'my', 'need', 'on', 'please', 'profile', 'recommend',
+    'recommended', 'right', 'roughly', 'should', 'suggest', 'tell', 'the', 'to', 'what', 'whats',
+    'would', 'you', 'your',
+}
+
+INTENTS = {
+    'calorie_target': {
+        'trigger': re.compile(r"\b(?:calories|calorie|kcal|cals)\b"),
+        'vocabulary': {
+            'calories', 'calorie', 'kcal', 'cals', 'eat', 'consume', 'intake', 'target', 'goal', 'budget',
+            'daily', 'day', 'per', 'each', 'every', 'number', 'of', 'for', 'total', 'aim',
+        },
+    },
+    'rep_scheme': {
+        'trigger': re.compile(r"\b(?:sets?|reps?|repetitions|rep scheme)\b"),
+        'vocabulary': {
+            'sets', 'set', 'reps', 'rep', 'repetitions', 'scheme', 'range', 'and', 'of', 'for', 'per',
+            'exercise', 'exercises', 'workout', 'workouts', 'each', 'at', 'as', 'use', 'follow', 'aim',
+        },
+    },
+}
+
+
+def _words(message):
+    return re.findall(r"[a-z]+", message.lower().replace("'", ''))
+
+
+def classify(message):
+    """(intent, reason): the one intent a message fully matches, else None and why"""
+    text = message.lower()
+    matched = [name for name, intent in INTENTS.items() if intent['trigger'].search(text)]
+    if not matched:
+        return None, 'no_intent'
+    if len(matched) > 1 or text.count('?') > 1:
+        return None, 'ambiguous'
+    name = matched[0]
+    allowed = COMMON_WORDS | INTENTS[name]['vocabulary']
+    if any(word not in allowed for word in _words(message)):
+        return None, 'ambiguous'
+    return name, 'matched'
+
+
+def _calorie_reply(profile):
+    factor, explanation = CALORIE_FACTORS.get(profile.get('primary_goal'), (None, None))
+    weight = profile.get('weight')
+    if factor is None or not weight:
+        return None
+    calories = round(weight * factor / 10) * 10
+    goal = profile['primary_goal'].replace('_', ' ')
+    return (f"Based on your profile ({weight:g} lbs, goal: {goal}), aim for about **{calories:,} calories per day**. "
+            f"That's your weight × {factor}, {explanation}.\n\n"
+            f"If your weight trend over 2-3 weeks doesn't match your goal, adjust by 100-200 calories.")
+
+
+def _rep_reply(profile):
+    level = profile.get('fitness_level') or 'beginner'
+    if level not in REP_SCHEMES:
+        return None
+    summary, exercises = REP_SCHEMES[level]
+    lines = '\n'.join(f"- {name}: {scheme}" for name, scheme in exercises)
+    return (f"For your **{level}** level: {summary.lower()}.\n\n{lines}\n\n"
+            f"Rest 60-90 seconds between sets and add reps once every set feels controlled.")
+
+
+REPLIES = {
+    'calorie_target': _calorie_reply,
+    'rep_scheme': _rep_reply,
+}
+
+
+def route(message, profile):
+    """Decide how to answer a chat message
+
+    Returns (reply or None, decision); a None reply means the agent answers.
+    """
+    if not INTENT_ROUTER_ENABLED:
+        return None, {'path': 'agent', 'intent': None, 'reason': 'disabled'}
+    intent, reason = classify(message)
+    if intent is None:
+        return None, {'path': 'agent', 'intent': None, 'reason': reason}
+    reply = REPLIES[intent](profile) if profile else None
+    if reply is None:
+        # e.g. a goal with no formula, or no weight on file
+        return None, {'path': 'agent', 'intent': intent, 'reason': 'profile_incomplete'}
+    return reply, {'path': 'local', 'intent': intent, 'reason': reason}
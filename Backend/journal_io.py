@@ -0,0 +1,218 @@
+import csv
+import io
+import json
+
+# Bulk journal import/export. Both directions stream: imports parse the
+# request body line by line and write in batches, exports page through the
+# journal with the same keyset cursor as /journal/entries.
+
+CSV_COLUMNS = [
+    'entry_id', 'date', 'title', 'entry_notes',
+    'exercise_name', 'sets', 'reps', 'weight', 'duration', 'exercise_notes', 'completed',
+]
+
+IMPORT_BATCH_SIZE = 500
+EXPORT_PAGE_SIZE = 200
+MAX_REPORTED_ERRORS = 100
+
+
+async def iter_lines(chunks):
+    """Split an async stream of byte chunks into decoded lines"""
+    buffer = b''
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8-sig').rstrip('\r')
+    if buffer:
+        yield buffer.decode('utf-8-sig').rstrip('\r')
+
+
+async def iter_ndjson_records(lines):
+    """Yield (line_number, entry dict or exception) for each NDJSON line"""
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("Expected a JSON object")
+            yield line_number, record
+        except ValueError as e:
+            yield line_number, e
+
+
+async def _iter_csv_rows(lines):
+    """Yield (line_number, row dict), joining quoted fields that span lines"""
+    header = None
+    pending = ''
+    start_line = line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not pending:
+            start_line = line_number
+        pending = f"{pending}\n{line}" if pending else line
+        if pending.count('"') % 2:
+            continue  # still inside a quoted field
+        row = next(csv.reader([pending]), [])
+        pending = ''
+        if header is None:
+            header = [column.strip() for column in row]
+            continue
+        if not any(cell.strip() for cell in row):
+            continue
+        yield start_line, dict(zip(header, row))
+
+
+def _csv_exercise(row):
+    def number(column, cast):
+        value = (row.get(column) or '').strip()
+        return cast(value) if value else None
+
+    return {
+        'name': (row.get('exercise_name') or '').strip(),
+        'sets': number('sets', int),
+        'reps': number('reps', int),
+        'weight': number('weight', float),
+        'duration': number('duration', int),
+        'notes': row.get('exercise_notes') or '',
+        'completed': (row.get('completed') or '').strip().lower() in ('1', 'true', 'yes'),
+    }
+
+
+async def iter_csv_records(lines):
+    """Yield (line_number, entry dict or exception), one entry per group of rows
+
+    Rows belong to the same entry while their entry_id (or, without that
+    column, their date and title) stays the same.
+    """
+    current = None
+    current_key = None
+    current_line = None
+    async for line_number, row in _iter_csv_rows(lines):
+        key = row.get('entry_id') or (row.get('date'), row.get('title'))
+        if current is not None and key != current_key:
+            yield current_line, current
+            current = None
+        try:
+            exercise = _csv_exercise(row) if (row.get('exercise_name') or '').strip() else None
+        except ValueError as e:
+            yield line_number, e
+            continue
+        if current is None:
+            current = {
+                'date': row.get('date'),
+                'title': row.get('title'),
+                'notes': row.get('entry_notes') or '',
+                'exercises': [],
+            }
+            current_key = key
+            current_line = line_number
+        if exercise:
+            current['exercises'].append(exercise)
+    if current is not None:
+        yield current_line, current
+
+
+async def import_entries(records, validate, save_batch, batch_size=IMPORT_BATCH_SIZE):
+    """Validate streamed records and save them in batches
+
+    `validate` turns a raw dict into an entry dict or raises; `save_batch` is
+    an async callable that writes a list of entries in one transaction.
+    """
+    batch = []
+    imported = failed = 0
+    errors = []
+
+    def record_error(line_number, error):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'line': line_number, 'error': str(error)})
+
+    async for line_number, record in records:
+        if isinstance(record, Exception):
+            record_error(line_number, record)
+            continue
+        try:
+            batch.append(validate(record))
+        except Exception as e:
+            record_error(line_number, e)
+            continue
+        if len(batch) >= batch_size:
+            imported += len(await save_batch(batch))
+            batch = []
+
+    if batch:
+        imported += len(await save_batch(batch))
+
+    return {
+        'imported': imported,
+        'failed': failed,
+        'errors': errors,
+        'errors_truncated': failed > len(errors),
+    }
+
+
+def _export_entry(entry):
+    """Journal entry in the same shape /journal/save and import accept"""
+    return {
+        'date': entry['date'],
+        'title': entry['title'],
+        'notes': entry['notes'] or '',
+        'exercises': [{
+            'name': ex['exercise_name'],
+            'sets': ex['sets'],
+            'reps': ex['reps'],
+            'weight': ex['weight'],
+            'duration': ex['duration_minutes'],
+            'notes': ex['notes'] or '',
+            'completed': bool(ex['completed']),
+        } for ex in entry['exercises']],
+    }
+
+
+async def iter_entry_pages(fetch_page, page_size=EXPORT_PAGE_SIZE):
+    """Yield journal pages from an async fetch_page(limit, before) until exhausted"""
+    before = None
+    while True:
+        entries = await fetch_page(page_size, before)
+        if entries:
+            yield entries
+        if len(entries) < page_size:
+            return
+        last = entries[-1]
+        before = (last['date'], last['created_at'], last['id'])
+
+
+async def export_ndjson(pages):
+    async for entries in pages:
+        yield ''.join(json.dumps(_export_entry(entry)) + '\n' for entry in entries)
+
+
+async def export_csv(pages):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    async for entries in pages:
+        for entry in entries:
+            exported = _export_entry(entry)
+            rows = exported['exercises'] or [None]
+            for ex in rows:
+                writer.writerow([
+                    entry['id'], exported['date'], exported['title'], exported['notes'],
+                    ex['name'] if ex else '',
+                    ex['sets'] if ex and ex['sets'] is not None else '',
+                    ex['reps'] if ex and ex['reps'] is not None else '',
+                    ex['weight'] if ex and ex['weight'] is not None else '',
+                    ex['duration'] if ex and ex['duration'] is not None else '',
+                    ex['notes'] if ex else '',
+                    int(ex['completed']) if ex else '',
+                ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
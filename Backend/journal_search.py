@@ -0,0 +1,121 @@
+import html
+import re
+import sqlite3
+
+from observability import get_logger
+
+# Journal search over the journal_fts index (see migrations.py). Each entry
+# and each exercise is its own document; hits are grouped back into entries,
+# ranked by BM25 (titles and exercise names weigh more than notes) or by date.
+
+MAX_QUERY_TERMS = 8
+MAX_SNIPPETS = 3
+SNIPPET_TOKENS = 12
+
+# Placeholder markers survive html.escape and are swapped for <mark> afterwards
+_MARK_OPEN = '\x02'
+_MARK_CLOSE = '\x03'
+
+logger = get_logger("journal_search")
+
+
+def build_search_query(user_id, text):
+    """FTS5 MATCH expression requiring every word, the last one as a prefix"""
+    terms = []
+    for word in re.findall(r"\w+", text.lower()):
+        if word not in terms:
+            terms.append(word)
+        if len(terms) == MAX_QUERY_TERMS:
+            break
+    if not terms:
+        return None
+    # Quoted terms keep user text from being parsed as FTS5 syntax; the prefix
+    # on the last term lets results narrow while the user is still typing
+    words = ' AND '.join(f'"{term}"' for term in terms) + '*'
+    return f'owner:"u{int(user_id)}" AND {{title notes}}: ({words})'
+
+
+def highlight(snippet):
+    """HTML-escape a snippet and turn the match markers into <mark> tags"""
+    escaped = html.escape(snippet or '')
+    return escaped.replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>')
+
+
+def _snippet_html(hit):
+    """Title (exercise name) plus the notes excerpt when the match is in the notes"""
+    parts = [highlight(hit['title'])] if hit['title'] else []
+    if _MARK_OPEN in (hit['notes'] or ''):
+        parts.append(highlight(hit['notes']))
+    return ' — '.join(parts)
+
+
+def search(conn, user_id, text, start_date=None, end_date=None, limit=20, sort='rank'):
+    """Entries matching text, with highlighted snippets from each matching document
+
+    Entries are picked first without snippets; snippets are then generated
+    only for the returned page, whose entry ids narrow the second MATCH.
+    """
+    query = build_search_query(user_id, text)
+    if not query:
+        return []
+    try:
+        if sort == 'date':
+            # Walk the (user_id, date) index newest first, keeping matching entries
+            entries = conn.execute('''
+                SELECT e.id, e.date, e.title, NULL AS best_score
+                FROM workout_entries e
+                WHERE e.user_id = ?1
+                  AND e.id IN (SELECT entry_id FROM journal_fts WHERE journal_fts MATCH ?2)
+                  AND (?3 IS NULL OR e.date >= ?3) AND (?4 IS NULL OR e.date <= ?4)
+                ORDER BY e.date DESC, e.created_at DESC, e.id DESC
+                LIMIT ?5
+            ''', (user_id, query, start_date, end_date, limit)).fetchall()
+        else:
+            # MATERIALIZED keeps rank inside the FTS query, out of the GROUP BY
+            entries = conn.execute('''
+                WITH hits AS MATERIALIZED (
+                    SELECT entry_id, rank FROM journal_fts
+                    WHERE journal_fts MATCH ?1 AND rank MATCH 'bm25(0.0, 4.0, 1.0, 0.0)'
+                )
+                SELECT e.id, e.date, e.title, MIN(hits.rank) AS best_score
+                FROM hits JOIN workout_entries e ON e.id = hits.entry_id
+                WHERE (?2 IS NULL OR e.date >= ?2) AND (?3 IS NULL OR e.date <= ?3)
+                GROUP BY e.id
+                ORDER BY best_score, e.date DESC
+                LIMIT ?4
+            ''', (query, start_date, end_date, limit)).fetchall()
+        if not entries:
+            return []
+
+        page = ' OR '.join(f'"{row["id"]}"' for row in entries)
+        hits = conn.execute(f'''
+            SELECT entry_id, kind, rank,
+                   snippet(journal_fts, 1, ?1, ?2, '…', {SNIPPET_TOKENS}) AS title,
+                   snippet(journal_fts, 2, ?1, ?2, '…', {SNIPPET_TOKENS}) AS notes
+            FROM journal_fts
+            WHERE journal_fts MATCH ?3 AND rank MATCH 'bm25(0.0, 4.0, 1.0, 0.0)'
+            ORDER BY rank
+        ''', (_MARK_OPEN, _MARK_CLOSE, f'{query} AND entry_id: ({page})')).fetchall()
+    except sqlite3.OperationalError:
+        logger.warning("journal search query failed", exc_info=True)
+        return []
+
+    snippets = {}
+    for hit in hits:
+        snippets.setdefault(int(hit['entry_id']), []).append(hit)
+
+    results = []
+    for row in entries:
+        matched = snippets.get(row['id'], [])
+        results.append({
+            'id': row['id'],
+            'date': row['date'],
+            'title': row['title'],
+            'score': round(-row['best_score'], 3) if row['best_score'] is not None else None,
+            'matches': len(matched),
+            'snippets': [
+                {'kind': hit['kind'], 'html': _snippet_html(hit)}
+                for hit in matched[:MAX_SNIPPETS]
+            ],
+        })
+    return results
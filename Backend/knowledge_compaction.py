@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from observability import get_logger, knowledge_bytes_reclaimed, knowledge_rows_compacted, log_fields
+
+# Tiered retention for user_knowledge. Each user's newest rows, and anything
+# younger than hot_days, stay as they are. Older rows are rolled up per
+# category and month into one 'summary' row: its content is an extractive
+# summary that retrieval still indexes, and `archive` keeps every original
+# note zlib-compressed. Past max_summaries a user's oldest summaries are
+# dropped.
+#
+# Work is done in steps of at most batch_rows rows, each in its own short
+# transaction, so request writes only ever wait for one step.
+
+logger = get_logger("knowledge")
+
+
+def summarize(category, period, items, max_chars):
+    """Newest distinct notes that fit in max_chars, under a one-line header"""
+    header = f"{len(items)} {category or 'knowledge'} notes from {period}: "
+    parts = []
+    seen = set()
+    used = len(header)
+    for _, content in reversed(items):
+        text = ' '.join((content or '').split())
+        if not text or text.lower() in seen:
+            continue
+        if used + len(text) + 3 > max_chars:
+            if not parts:
+                parts.append(text[:max_chars - used].rsplit(' ', 1)[0] + '...')
+            break
+        seen.add(text.lower())
+        parts.append(text)
+        used += len(text) + 3
+    return header + ' | '.join(parts)
+
+
+def pack(items):
+    return zlib.compress(json.dumps(items, separators=(',', ':')).encode('utf-8'), 9)
+
+
+def unpack(archive):
+    """[timestamp, content] pairs stored in a summary row"""
+    return json.loads(zlib.decompress(archive)) if archive else []
+
+
+class KnowledgeCompactor:
+    """Rolls cold user_knowledge rows into per-category monthly summaries"""
+
+    def __init__(self, db, hot_days=30, hot_rows=200, max_summaries=120, batch_rows=200, summary_chars=1000):
+        self.db = db
+        self.hot_days = hot_days
+        self.hot_rows = hot_rows
+        self.max_summaries = max_summaries
+        self.batch_rows = batch_rows
+        self.summary_chars = summary_chars
+        self._next_user = 0  # where the current pass resumes
+        self._pass = self._new_pass()
+        self.passes = 0
+        self.last_pass = None
+
+    @staticmethod
+    def _new_pass():
+        return {'steps': 0, 'users': 0, 'rows_compacted': 0, 'summaries_dropped': 0, 'bytes_reclaimed': 0,
+                'started': time.time()}
+
+    def step(self):
+        """Compact one batch for one user in its own transaction
+
+        Returns the step's counts, or None when a pass over every user has
+        just finished (the next call starts a new pass).
+        """
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT user_id FROM user_knowledge WHERE user_id >= ? ORDER BY user_id LIMIT 1",
+                (self._next_user,)
+            ).fetchone()
+            if row is None:
+                free_bytes = conn.execute("PRAGMA freelist_count").fetchone()[0] * \
+                    conn.execute("PRAGMA page_size").fetchone()[0]
+            else:
+                result = self._compact_user(conn, row[0])
+
+        if row is None:
+            self._finish_pass(free_bytes)
+            return None
+        if result['done']:
+            self._next_user = result['user_id'] + 1
+            self._pass['users'] += 1
+        self._pass['steps'] += 1
+        for key in ('rows_compacted', 'summaries_dropped', 'bytes_reclaimed'):
+            self._pass[key] += result[key]
+        knowledge_rows_compacted.inc(result['rows_compacted'])
+        knowledge_bytes_reclaimed.inc(max(result['bytes_reclaimed'], 0))
+        return result
+
+    def _finish_pass(self, free_bytes):
+        finished = self._pass
+        finished['seconds'] = round(time.time() - finished.pop('started'), 2)
+        finished['free_bytes'] = free_bytes  # freed pages SQLite will reuse before growing the file
+        self.last_pass = finished
+        self.passes += 1
+        self._next_user = 0
+        self._pass = self._new_pass()
+        logger.info("knowledge compaction pass complete", extra=log_fields(**finished))
+
+    def run(self, pause=0.0):
+        """Run one full pass, sleeping `pause` seconds between steps"""
+        while self.step() is not None:
+            if pause:
+                time.sleep(pause)
+        return self.last_pass
+
+    def _compact_user(self, conn, user_id):
+        cutoff = (datetime.utcnow() - timedelta(days=self.hot_days)).strftime('%Y-%m-%d %H:%M:%S')
+        rows = conn.execute('''
+            SELECT id, category, content, timestamp FROM user_knowledge
+            WHERE user_id = ? AND kind = 'raw' AND (timestamp < ? OR id NOT IN (
+                SELECT id FROM user_knowledge WHERE user_id = ? AND kind = 'raw'
+                ORDER BY timestamp DESC, id DESC LIMIT ?
+            ))
+            ORDER BY timestamp, id LIMIT ?
+        ''', (user_id, cutoff, user_id, self.hot_rows, self.batch_rows)).fetchall()
+
+        groups = {}
+        for row in rows:
+            period = (row['timestamp'] or '')[:7] or 'undated'
+            groups.setdefault((row['category'], period), []).append(row)
+        reclaimed = 0
+        for (category, period), group in groups.items():
+            reclaimed += self._roll_up(conn, user_id, category, period, group)
+        conn.executemany("DELETE FROM user_knowledge WHERE id = ?", [(row['id'],) for row in rows])
+
+        # A short batch means nothing cold is left for this user
+        done = len(rows) < self.batch_rows
+        dropped = 0
+        if done:
+            dropped, freed = self._enforce_cap(conn, user_id)
+            reclaimed += freed
+        return {'user_id': user_id, 'rows_compacted': len(rows), 'summaries_dropped': dropped,
+                'bytes_reclaimed': reclaimed, 'done': done}
+
+    def _roll_up(self, conn, user_id, category, period, group):
+        """Merge rows into the (category, period) summary, returning bytes saved"""
+        summary = conn.execute('''
+            SELECT id, content, archive FROM user_knowledge
+            WHERE user_id = ? AND kind = 'summary' AND category IS ? AND period = ?
+        ''', (user_id, category, period)).fetchone()
+        before = sum(len((row['content'] or '').encode('utf-8')) for row in group)
+        items = []
+        if summary is not None:
+            before += len((summary['content'] or '').encode('utf-8')) + len(summary['archive'] or b'')
+            items = unpack(summary['archive'])
+        items.extend([row['timestamp'], row['content']] for row in group)
+        items.sort(key=lambda item: item[0] or '')
+
+        content = summarize(category, period, items, self.summary_chars)
+        archive = pack(items)
+        latest = items[-1][0]
+        if summary is None:
+            conn.execute('''
+                INSERT INTO user_knowledge (user_id, category, content, timestamp, kind, period, rolled_up, archive)
+                VALUES (?, ?, ?, ?, 'summary', ?, ?, ?)
+            ''', (user_id, category, content, latest, period, len(items), archive))
+        else:
+            conn.execute(
+                "UPDATE user_knowledge SET content = ?, timestamp = ?, rolled_up = ?, archive = ? WHERE id = ?",
+                (content, latest, len(items), archive, summary['id'])
+            )
+        return before - len(content.encode('utf-8')) - len(archive)
+
+    def _enforce_cap(self, conn, user_id):
+        """Drop the user's oldest summaries beyond max_summaries"""
+        rows = conn.execute('''
+            SELECT id, length(CAST(content AS BLOB)) + COALESCE(length(archive), 0) AS size
+            FROM user_knowledge WHERE user_id = ? AND kind = 'summary'
+            ORDER BY period DESC, id DESC LIMIT -1 OFFSET ?
+        ''', (user_id, self.max_summaries)).fetchall()
+        conn.executemany("DELETE FROM user_knowledge WHERE id = ?", [(row['id'],) for row in rows])
+        return len(rows), sum(row['size'] or 0 for row in rows)
+
+    def stats(self):
+        return {
+            'hot_days': self.hot_days,
+            'hot_rows': self.hot_rows,
+            'max_summaries': self.max_summaries,
+            'passes': self.passes,
+            'last_pass': self.last_pass,
+        }
+
+
+def create_knowledge_compactor(db):
+    """Build the compactor from KNOWLEDGE_* environment settings"""
+    return KnowledgeCompactor(
+        db,
+        hot_days=int(os.getenv("KNOWLEDGE_HOT_DAYS", "30")),
+        hot_rows=int(os.getenv("KNOWLEDGE_HOT_ROWS", "200")),
+        max_summaries=int(os.getenv("KNOWLEDGE_MAX_SUMMARIES", "120")),
+        batch_rows=int(os.getenv("KNOWLEDGE_COMPACT_BATCH", "200")),
+        summary_chars=int(os.getenv("KNOWLEDGE_SUMMARY_CHARS", "1000")),
+    )
+
+
+def main():
+    """Compact now: python knowledge_compaction.py run [--db PATH]"""
+    parser = argparse.ArgumentParser(description="Roll old user_knowledge rows into summaries")
+    parser.add_argument('command', choices=['run'])
+    parser.add_argument('--db', default="fitness_app.db", help="Path to the SQLite database")
+    parser.add_argument('--pause-ms', type=float, default=0, help="Sleep between steps")
+    args = parser.parse_args()
+
+    from database import FitnessDB
+    compactor = create_knowledge_compactor(FitnessDB(args.db))
+    result = compactor.run(pause=args.pause_ms / 1000)
+    print(f"Compacted {result['rows_compacted']} rows for {result['users']} users, "
+          f"dropped {result['summaries_dropped']} summaries, reclaimed {result['bytes_reclaimed']} bytes "
+          f"({result['free_bytes']} bytes free in the database file)")
+
+
+if __name__ == "__main__":
+    main()
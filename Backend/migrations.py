@@ -0,0 +1,651 @@
+import sqlite3
+
+# Ordered schema steps. Each runs once, in its own transaction, and is
+# recorded in schema_version; steps must also be safe to re-run against a
+# database that predates schema_version.
+
+
+def _baseline_tables(cursor):
+    """Original tables"""
+    # Users table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # User profiles table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_profiles (
+            user_id INTEGER PRIMARY KEY,
+            fitness_level TEXT,
+            primary_goal TEXT,
+            weight REAL,
+            height REAL,
+            age INTEGER,
+            activity_level TEXT,
+            workout_frequency TEXT,
+            workout_duration TEXT,
+            target_weight REAL,
+            timeline TEXT,
+            motivation TEXT,
+            preferred_time TEXT,
+            workout_location TEXT,
+            sleep_hours TEXT,
+            stress_level TEXT,
+            dietary_restrictions TEXT,
+            medical_conditions TEXT,
+            preferences TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # User knowledge base for RAG
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_knowledge (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            category TEXT,
+            content TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # Workout journal entries
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS workout_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            date TEXT,
+            title TEXT,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # Individual exercises within workout entries
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS workout_exercises (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entry_id INTEGER,
+            exercise_name TEXT,
+            sets INTEGER,
+            reps INTEGER,
+            weight REAL,
+            duration_minutes INTEGER,
+            notes TEXT,
+            completed BOOLEAN DEFAULT 0,
+            FOREIGN KEY (entry_id) REFERENCES workout_entries (id)
+        )
+    ''')
+
+
+def _profile_columns(cursor):
+    """Columns added to user_profiles after the first release"""
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(user_profiles)")}
+    for column, column_type in [
+        ('workout_frequency', 'TEXT'),
+        ('workout_duration', 'TEXT'),
+        ('target_weight', 'REAL'),
+        ('timeline', 'TEXT'),
+        ('motivation', 'TEXT'),
+        ('preferred_time', 'TEXT'),
+        ('workout_location', 'TEXT'),
+        ('sleep_hours', 'TEXT'),
+        ('stress_level', 'TEXT'),
+    ]:
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE user_profiles ADD COLUMN {column} {column_type}")
+
+
+def _hot_path_indexes(cursor):
+    """Indexes for journal listing, exercise lookup and knowledge reads"""
+    # Matches the keyset ordering used by get_workout_entries
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_workout_entries_user_date
+        ON workout_entries (user_id, date DESC, created_at DESC, id DESC)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_workout_exercises_entry
+        ON workout_exercises (entry_id, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_knowledge_user_time
+        ON user_knowledge (user_id, timestamp)
+    ''')
+
+
+def _response_cache_table(cursor):
+    """Persistent store for the agent response cache"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_response_cache (
+            prompt_hash TEXT PRIMARY KEY,
+            user_id INTEGER,
+            response TEXT,
+            created_at REAL
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_llm_response_cache_user
+        ON llm_response_cache (user_id)
+    ''')
+
+
+def _progress_tables(cursor):
+    """Precomputed progress aggregates, see progress.py"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS exercise_progress (
+            user_id INTEGER,
+            exercise_key TEXT,
+            exercise_name TEXT,
+            sessions INTEGER DEFAULT 0,
+            total_sets INTEGER DEFAULT 0,
+            total_reps INTEGER DEFAULT 0,
+            total_volume REAL DEFAULT 0,
+            best_weight REAL,
+            best_reps INTEGER,
+            best_e1rm REAL,
+            last_date TEXT,
+            PRIMARY KEY (user_id, exercise_key)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS weekly_activity (
+            user_id INTEGER,
+            week_start TEXT,
+            workouts INTEGER DEFAULT 0,
+            PRIMARY KEY (user_id, week_start)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_progress (
+            user_id INTEGER PRIMARY KEY,
+            total_workouts INTEGER DEFAULT 0,
+            completed_exercises INTEGER DEFAULT 0,
+            total_volume REAL DEFAULT 0,
+            latest_streak_weeks INTEGER DEFAULT 0,
+            latest_streak_week TEXT,
+            longest_streak_weeks INTEGER DEFAULT 0,
+            last_workout_date TEXT
+        )
+    ''')
+    # Backfill users who already have journal history. Frozen here rather
+    # than calling progress.rebuild, so this step does the same thing however
+    # progress.py changes later; `python progress.py rebuild` recomputes with
+    # the current rules.
+    cursor.connection.create_function('migration_exercise_key', 1, _migration_exercise_key, deterministic=True)
+    cursor.execute('''
+        INSERT OR REPLACE INTO exercise_progress
+        (user_id, exercise_key, exercise_name, sessions, total_sets, total_reps, total_volume,
+         best_weight, best_reps, best_e1rm, last_date)
+        WITH done AS (
+            SELECT e.user_id, e.date, ex.exercise_name, ex.reps, ex.weight,
+                   migration_exercise_key(ex.exercise_name) AS exercise_key,
+                   COALESCE(NULLIF(ex.sets, 0), 1) AS sets,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY e.user_id, migration_exercise_key(ex.exercise_name) ORDER BY e.date DESC, e.id DESC, ex.id DESC
+                   ) AS newest
+            FROM workout_entries e JOIN workout_exercises ex ON ex.entry_id = e.id
+            WHERE ex.completed
+        )
+        SELECT user_id, exercise_key, MAX(CASE WHEN newest = 1 THEN exercise_name END), COUNT(*),
+               SUM(sets), SUM(sets * COALESCE(reps, 0)), SUM(sets * COALESCE(reps, 0) * COALESCE(weight, 0)),
+               MAX(weight), MAX(reps),
+               MAX(CASE
+                   WHEN NOT weight OR NOT reps THEN NULL
+                   WHEN reps = 1 THEN CAST(weight AS REAL)
+                   ELSE ROUND(weight * (1 + reps / 30.0), 1)
+               END),
+               MAX(date)
+        FROM done
+        WHERE exercise_key != ''
+        GROUP BY user_id, exercise_key
+    ''')
+    # Weeks start on Monday: 'weekday 0' moves to the next Sunday (or stays on one)
+    cursor.execute('''
+        INSERT OR REPLACE INTO weekly_activity (user_id, week_start, workouts)
+        SELECT user_id, date(substr(date, 1, 10), 'weekday 0', '-6 days') AS week, COUNT(*)
+        FROM workout_entries
+        WHERE week IS NOT NULL
+        GROUP BY user_id, week
+    ''')
+    # Consecutive weeks share a run id: week number minus position
+    cursor.execute('''
+        INSERT OR REPLACE INTO user_progress
+        (user_id, total_workouts, completed_exercises, total_volume,
+         latest_streak_weeks, latest_streak_week, longest_streak_weeks, last_workout_date)
+        WITH runs AS (
+            SELECT user_id, COUNT(*) AS weeks, MAX(week_start) AS last_week
+            FROM (
+                SELECT user_id, week_start,
+                       CAST(julianday(week_start) AS INTEGER) / 7
+                       - ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY week_start) AS run
+                FROM weekly_activity
+                WHERE workouts > 0
+            )
+            GROUP BY user_id, run
+        ),
+        streaks AS (
+            SELECT user_id, MAX(weeks) AS longest, MAX(last_week) AS latest_week,
+                   (SELECT r.weeks FROM runs r WHERE r.user_id = runs.user_id
+                    ORDER BY r.last_week DESC LIMIT 1) AS latest
+            FROM runs
+            GROUP BY user_id
+        ),
+        totals AS (
+            SELECT user_id, SUM(sessions) AS completed, SUM(total_volume) AS volume
+            FROM exercise_progress
+            GROUP BY user_id
+        )
+        SELECT e.user_id, COUNT(*), COALESCE(t.completed, 0), COALESCE(t.volume, 0),
+               COALESCE(s.latest, 0), s.latest_week, COALESCE(s.longest, 0), MAX(e.date)
+        FROM workout_entries e
+        LEFT JOIN totals t ON t.user_id = e.user_id
+        LEFT JOIN streaks s ON s.user_id = e.user_id
+        GROUP BY e.user_id
+    ''')
+
+
+def _migration_exercise_key(name):
+    """progress.exercise_key as it was when migrations 5 and 12 were written"""
+    return ' '.join((name or '').lower().split())
+
+
+def _retrieval_index(cursor):
+    """FTS5 index over user knowledge and workout notes for chat context
+
+    Rowids are derived from the source row so triggers can update and delete
+    documents without scanning: knowledge id*3, entry id*3+1, exercise id*3+2.
+    """
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS retrieval_fts USING fts5(
+            content,
+            user_id UNINDEXED,
+            source UNINDEXED,
+            source_id UNINDEXED,
+            tokenize = 'porter unicode61'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS retrieval_knowledge_ai AFTER INSERT ON user_knowledge BEGIN
+            INSERT INTO retrieval_fts (rowid, content, user_id, source, source_id)
+            VALUES (new.id * 3, COALESCE(new.category, '') || ': ' || COALESCE(new.content, ''),
+                    new.user_id, 'knowledge', new.id);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS retrieval_knowledge_au AFTER UPDATE ON user_knowledge BEGIN
+            DELETE FROM retrieval_fts WHERE rowid = old.id * 3;
+            INSERT INTO retrieval_fts (rowid, content, user_id, source, source_id)
+            VALUES (new.id * 3, COALESCE(new.category, '') || ': ' || COALESCE(new.content, ''),
+                    new.user_id, 'knowledge', new.id);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS retrieval_knowledge_ad AFTER DELETE ON user_knowledge BEGIN
+            DELETE FROM retrieval_fts WHERE rowid = old.id * 3;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS retrieval_entry_ai AFTER INSERT ON workout_entries
+        WHEN COALESCE(new.notes, '') != '' BEGIN
+            INSERT INTO retrieval_fts (rowid, content, user_id, source, source_id)
+            VALUES (new.id * 3 + 1, new.date || ' ' || COALESCE(new.title, '') || ': ' || new.notes,
+                    new.user_id, 'workout', new.id);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS retrieval_entry_au AFTER UPDATE OF date, title, notes ON workout_entries BEGIN
+            DELETE FROM retrieval_fts WHERE rowid = old.id * 3 + 1;
+            INSERT INTO retrieval_fts (rowid, content, user_id, source, source_id)
+            SELECT new.id * 3 + 1, new.date || ' ' || COALESCE(new.title, '') || ': ' || new.notes,
+                   new.user_id, 'workout', new.id
+            WHERE COALESCE(new.notes, '') != '';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS retrieval_entry_ad AFTER DELETE ON workout_entries BEGIN
+            DELETE FROM retrieval_fts WHERE rowid = old.id * 3 + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS retrieval_exercise_ai AFTER INSERT ON workout_exercises
+        WHEN COALESCE(new.notes, '') != '' BEGIN
+            INSERT INTO retrieval_fts (rowid, content, user_id, source, source_id)
+            SELECT new.id * 3 + 2, COALESCE(new.exercise_name, '') || ': ' || new.notes,
+                   user_id, 'exercise', new.id
+            FROM workout_entries WHERE id = new.entry_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS retrieval_exercise_au AFTER UPDATE OF exercise_name, notes ON workout_exercises BEGIN
+            DELETE FROM retrieval_fts WHERE rowid = old.id * 3 + 2;
+            INSERT INTO retrieval_fts (rowid, content, user_id, source, source_id)
+            SELECT new.id * 3 + 2, COALESCE(new.exercise_name, '') || ': ' || new.notes,
+                   user_id, 'exercise', new.id
+            FROM workout_entries WHERE id = new.entry_id AND COALESCE(new.notes, '') != '';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS retrieval_exercise_ad AFTER DELETE ON workout_exercises BEGIN
+            DELETE FROM retrieval_fts WHERE rowid = old.id * 3 + 2;
+        END
+    ''')
+
+    # Index rows written before the triggers existed
+    cursor.execute("DELETE FROM retrieval_fts")
+    cursor.execute('''
+        INSERT INTO retrieval_fts (rowid, content, user_id, source, source_id)
+        SELECT id * 3, COALESCE(category, '') || ': ' || COALESCE(content, ''), user_id, 'knowledge', id
+        FROM user_knowledge
+    ''')
+    cursor.execute('''
+        INSERT INTO retrieval_fts (rowid, content, user_id, source, source_id)
+        SELECT id * 3 + 1, date || ' ' || COALESCE(title, '') || ': ' || notes, user_id, 'workout', id
+        FROM workout_entries WHERE COALESCE(notes, '') != ''
+    ''')
+    cursor.execute('''
+        INSERT INTO retrieval_fts (rowid, content, user_id, source, source_id)
+        SELECT ex.id * 3 + 2, COALESCE(ex.exercise_name, '') || ': ' || ex.notes, e.user_id, 'exercise', ex.id
+        FROM workout_exercises ex JOIN workout_entries e ON e.id = ex.entry_id
+        WHERE COALESCE(ex.notes, '') != ''
+    ''')
+
+
+def _journal_search_index(cursor):
+    """FTS5 index behind /journal/search
+
+    One document per entry (title, notes) at rowid id*2 and one per exercise
+    (name, notes) at rowid id*2+1. The owner ('u<id>') and entry_id columns
+    are indexed so a user's documents, or a page of entries, are selected
+    inside the MATCH itself; dates are joined from workout_entries at query
+    time so entry edits never rewrite exercise rows.
+    """
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS journal_fts USING fts5(
+            owner,
+            title,
+            notes,
+            entry_id,
+            kind UNINDEXED,
+            tokenize = 'porter unicode61'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS journal_fts_entry_ai AFTER INSERT ON workout_entries BEGIN
+            INSERT INTO journal_fts (rowid, owner, title, notes, entry_id, kind)
+            VALUES (new.id * 2, 'u' || new.user_id, COALESCE(new.title, ''), COALESCE(new.notes, ''), new.id, 'entry');
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS journal_fts_entry_au AFTER UPDATE OF title, notes ON workout_entries BEGIN
+            UPDATE journal_fts SET title = COALESCE(new.title, ''), notes = COALESCE(new.notes, '')
+            WHERE rowid = new.id * 2;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS journal_fts_entry_ad AFTER DELETE ON workout_entries BEGIN
+            DELETE FROM journal_fts WHERE rowid = old.id * 2;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS journal_fts_exercise_ai AFTER INSERT ON workout_exercises BEGIN
+            INSERT INTO journal_fts (rowid, owner, title, notes, entry_id, kind)
+            SELECT new.id * 2 + 1, 'u' || e.user_id, COALESCE(new.exercise_name, ''), COALESCE(new.notes, ''),
+                   new.entry_id, 'exercise'
+            FROM workout_entries e WHERE e.id = new.entry_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS journal_fts_exercise_au AFTER UPDATE OF exercise_name, notes ON workout_exercises BEGIN
+            UPDATE journal_fts SET title = COALESCE(new.exercise_name, ''), notes = COALESCE(new.notes, '')
+            WHERE rowid = new.id * 2 + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS journal_fts_exercise_ad AFTER DELETE ON workout_exercises BEGIN
+            DELETE FROM journal_fts WHERE rowid = old.id * 2 + 1;
+        END
+    ''')
+
+    cursor.execute("DELETE FROM journal_fts")
+    cursor.execute('''
+        INSERT INTO journal_fts (rowid, owner, title, notes, entry_id, kind)
+        SELECT id * 2, 'u' || user_id, COALESCE(title, ''), COALESCE(notes, ''), id, 'entry'
+        FROM workout_entries
+    ''')
+    cursor.execute('''
+        INSERT INTO journal_fts (rowid, owner, title, notes, entry_id, kind)
+        SELECT ex.id * 2 + 1, 'u' || e.user_id, COALESCE(ex.exercise_name, ''), COALESCE(ex.notes, ''),
+               ex.entry_id, 'exercise'
+        FROM workout_exercises ex JOIN workout_entries e ON e.id = ex.entry_id
+    ''')
+
+
+def _profile_generations(cursor):
+    """Per-user profile generation, bumped on every save so each worker's
+    profile cache can tell its copy is stale"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS profile_generations (
+            user_id INTEGER PRIMARY KEY,
+            generation INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+
+def _entry_versions(cursor):
+    """Optimistic-concurrency version on journal entries, bumped on every edit"""
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(workout_entries)")}
+    if 'version' not in existing:
+        cursor.execute("ALTER TABLE workout_entries ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+
+
+def _revision_tables(cursor):
+    """Per-user journal revisions and profile save times, for conditional GETs"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS journal_revisions (
+            user_id INTEGER PRIMARY KEY,
+            revision INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL
+        )
+    ''')
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(profile_generations)")}
+    if 'updated_at' not in existing:
+        cursor.execute("ALTER TABLE profile_generations ADD COLUMN updated_at REAL")
+
+
+def _knowledge_summaries(cursor):
+    """Summary rows that knowledge compaction rolls old user_knowledge rows into"""
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(user_knowledge)")}
+    for column, definition in (
+        ('kind', "TEXT NOT NULL DEFAULT 'raw'"),
+        ('period', 'TEXT'),
+        ('rolled_up', 'INTEGER'),
+        ('archive', 'BLOB'),
+    ):
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE user_knowledge ADD COLUMN {column} {definition}")
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_user_knowledge_summary
+        ON user_knowledge (user_id, category, period) WHERE kind = 'summary'
+    ''')
+
+
+def _exercise_keys(cursor):
+    """Normalized exercise name stored on each row, so progress can aggregate one exercise by index"""
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(workout_exercises)")}
+    if 'exercise_key' not in existing:
+        cursor.execute("ALTER TABLE workout_exercises ADD COLUMN exercise_key TEXT")
+    cursor.connection.create_function('migration_exercise_key', 1, _migration_exercise_key, deterministic=True)
+    cursor.execute("UPDATE workout_exercises SET exercise_key = migration_exercise_key(exercise_name)")
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_workout_exercises_key
+        ON workout_exercises (exercise_key, entry_id) WHERE completed
+    ''')
+
+
+def _retrieval_owner(cursor):
+    """Rebuild retrieval_fts with an indexed owner token
+
+    Migration 6 kept user_id UNINDEXED, so every query ranked all users'
+    matches before filtering. The owner column ('u<id>') goes inside the MATCH
+    instead, as in journal_fts, so a query only visits that user's documents.
+    Rowids keep migration 6's scheme: knowledge id*3, entry id*3+1, exercise
+    id*3+2.
+    """
+    for trigger in ('knowledge_ai', 'knowledge_au', 'knowledge_ad', 'entry_ai', 'entry_au', 'entry_ad',
+                    'exercise_ai', 'exercise_au', 'exercise_ad'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS retrieval_{trigger}")
+    cursor.execute("DROP TABLE IF EXISTS retrieval_fts")
+    cursor.execute('''
+        CREATE VIRTUAL TABLE retrieval_fts USING fts5(
+            owner,
+            content,
+            source UNINDEXED,
+            source_id UNINDEXED,
+            tokenize = 'porter unicode61'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER retrieval_knowledge_ai AFTER INSERT ON user_knowledge BEGIN
+            INSERT INTO retrieval_fts (rowid, owner, content, source, source_id)
+            VALUES (new.id * 3, 'u' || new.user_id, COALESCE(new.category, '') || ': ' || COALESCE(new.content, ''),
+                    'knowledge', new.id);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER retrieval_knowledge_au AFTER UPDATE OF user_id, category, content ON user_knowledge BEGIN
+            DELETE FROM retrieval_fts WHERE rowid = old.id * 3;
+            INSERT INTO retrieval_fts (rowid, owner, content, source, source_id)
+            VALUES (new.id * 3, 'u' || new.user_id, COALESCE(new.category, '') || ': ' || COALESCE(new.content, ''),
+                    'knowledge', new.id);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER retrieval_knowledge_ad AFTER DELETE ON user_knowledge BEGIN
+            DELETE FROM retrieval_fts WHERE rowid = old.id * 3;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER retrieval_entry_ai AFTER INSERT ON workout_entries
+        WHEN COALESCE(new.notes, '') != '' BEGIN
+            INSERT INTO retrieval_fts (rowid, owner, content, source, source_id)
+            VALUES (new.id * 3 + 1, 'u' || new.user_id, new.date || ' ' || COALESCE(new.title, '') || ': ' || new.notes,
+                    'workout', new.id);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER retrieval_entry_au AFTER UPDATE OF date, title, notes ON workout_entries BEGIN
+            DELETE FROM retrieval_fts WHERE rowid = old.id * 3 + 1;
+            INSERT INTO retrieval_fts (rowid, owner, content, source, source_id)
+            SELECT new.id * 3 + 1, 'u' || new.user_id, new.date || ' ' || COALESCE(new.title, '') || ': ' || new.notes,
+                   'workout', new.id
+            WHERE COALESCE(new.notes, '') != '';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER retrieval_entry_ad AFTER DELETE ON workout_entries BEGIN
+            DELETE FROM retrieval_fts WHERE rowid = old.id * 3 + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER retrieval_exercise_ai AFTER INSERT ON workout_exercises
+        WHEN COALESCE(new.notes, '') != '' BEGIN
+            INSERT INTO retrieval_fts (rowid, owner, content, source, source_id)
+            SELECT new.id * 3 + 2, 'u' || user_id, COALESCE(new.exercise_name, '') || ': ' || new.notes,
+                   'exercise', new.id
+            FROM workout_entries WHERE id = new.entry_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER retrieval_exercise_au AFTER UPDATE OF exercise_name, notes ON workout_exercises BEGIN
+            DELETE FROM retrieval_fts WHERE rowid = old.id * 3 + 2;
+            INSERT INTO retrieval_fts (rowid, owner, content, source, source_id)
+            SELECT new.id * 3 + 2, 'u' || user_id, COALESCE(new.exercise_name, '') || ': ' || new.notes,
+                   'exercise', new.id
+            FROM workout_entries WHERE id = new.entry_id AND COALESCE(new.notes, '') != '';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER retrieval_exercise_ad AFTER DELETE ON workout_exercises BEGIN
+            DELETE FROM retrieval_fts WHERE rowid = old.id * 3 + 2;
+        END
+    ''')
+
+    cursor.execute('''
+        INSERT INTO retrieval_fts (rowid, owner, content, source, source_id)
+        SELECT id * 3, 'u' || user_id, COALESCE(category, '') || ': ' || COALESCE(content, ''), 'knowledge', id
+        FROM user_knowledge
+    ''')
+    cursor.execute('''
+        INSERT INTO retrieval_fts (rowid, owner, content, source, source_id)
+        SELECT id * 3 + 1, 'u' || user_id, date || ' ' || COALESCE(title, '') || ': ' || notes, 'workout', id
+        FROM workout_entries WHERE COALESCE(notes, '') != ''
+    ''')
+    cursor.execute('''
+        INSERT INTO retrieval_fts (rowid, owner, content, source, source_id)
+        SELECT ex.id * 3 + 2, 'u' || e.user_id, COALESCE(ex.exercise_name, '') || ': ' || ex.notes, 'exercise', ex.id
+        FROM workout_exercises ex JOIN workout_entries e ON e.id = ex.entry_id
+        WHERE COALESCE(ex.notes, '') != ''
+    ''')
+
+
+MIGRATIONS = [
+    (1, "baseline tables", _baseline_tables),
+    (2, "user_profiles onboarding columns", _profile_columns),
+    (3, "hot-path indexes", _hot_path_indexes),
+    (4, "llm_response_cache table", _response_cache_table),
+    (5, "progress aggregate tables", _progress_tables),
+    (6, "retrieval_fts index and triggers", _retrieval_index),
+    (7, "journal_fts search index and triggers", _journal_search_index),
+    (8, "profile generation counters", _profile_generations),
+    (9, "workout_entries.version", _entry_versions),
+    (10, "journal revisions and profile save times", _revision_tables),
+    (11, "user_knowledge summary rows", _knowledge_summaries),
+    (12, "workout_exercises.exercise_key", _exercise_keys),
+    (13, "retrieval_fts owner column", _retrieval_owner),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    """Highest applied migration, 0 for a database without schema_version"""
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def migrate(db):
+    """Apply pending migrations through a FitnessDB or ConnectionPool, returning the versions applied"""
+    with db.connection() as conn:
+        if current_version(conn) >= LATEST_VERSION:
+            return []
+
+    applied = []
+    for version, description, step in MIGRATIONS:
+        with db.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            # Re-checked under the write lock so concurrent workers apply each step once
+            if current_version(conn) >= version:
+                continue
+            step(conn.cursor())
+            conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+            applied.append(version)
+    return applied
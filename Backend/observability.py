@@ -0,0 +1,357 @@
+import bisect
+import contextlib
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+from starlette.routing import Match
+
+# Metrics in the Prometheus text format and leveled, sampled JSON logging.
+# Metrics are kept per process; with several uvicorn workers each worker
+# serves its own /metrics.
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+SLOW_REQUEST_MS = float(os.getenv("LOG_SLOW_REQUEST_MS", "1000"))
+SLOW_QUERY_MS = float(os.getenv("LOG_SLOW_QUERY_MS", "100"))
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+AGENT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key)) + list(extra or [])
+    if not pairs:
+        return ''
+    escaped = (f'{name}="{_escape(value)}"' for name, value in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, [('le', repr(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key, [('le', '+Inf')])
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {round(series[-2], 6)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callback at scrape time"""
+
+    def __init__(self, name, documentation, read):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def render(self):
+        try:
+            value = self.read()
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+http_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency, including streamed bodies", ("method", "route")))
+db_duration = registry.register(Histogram(
+    "db_operation_duration_seconds", "FitnessDB call latency, including pool checkout", ("operation",)))
+db_errors = registry.register(Counter(
+    "db_operation_errors_total", "FitnessDB calls that raised", ("operation",)))
+db_write_batch_size = registry.register(Histogram(
+    "db_write_batch_size", "Queued writes committed together in one writer transaction", (), BATCH_BUCKETS))
+db_write_commit = registry.register(Histogram(
+    "db_write_commit_seconds", "Writer transaction latency, from BEGIN to COMMIT"))
+knowledge_rows_compacted = registry.register(Counter(
+    "knowledge_rows_compacted_total", "user_knowledge rows rolled into summaries"))
+knowledge_bytes_reclaimed = registry.register(Counter(
+    "knowledge_bytes_reclaimed_total", "Content bytes saved by knowledge compaction"))
+agent_duration = registry.register(Histogram(
+    "agent_call_duration_seconds", "Agent invocation latency", ("mode",), AGENT_BUCKETS))
+agent_first_token = registry.register(Histogram(
+    "agent_time_to_first_token_seconds", "Streaming agent time to first token", (), AGENT_BUCKETS))
+agent_calls = registry.register(Counter(
+    "agent_calls_total", "Agent invocations", ("mode", "outcome")))
+agent_tokens = registry.register(Counter(
+    "agent_tokens_total", "Model tokens, from reported usage or estimated at ~4 characters per token",
+    ("direction",)))
+agent_admission = registry.register(Counter(
+    "agent_admission_total", "Agent calls admitted, rejected with 429, or coalesced into an in-flight call",
+    ("outcome",)))
+agent_http_tool_calls = registry.register(Counter(
+    "agent_http_tool_calls_total", "Agent http_request tool calls by cache outcome", ("outcome",)))
+agent_http_tool_duration = registry.register(Histogram(
+    "agent_http_tool_duration_seconds", "Agent http_request tool latency by cache outcome", ("outcome",)))
+chat_routes = registry.register(Counter(
+    "chat_routes_total", "Agent requests answered locally or routed to the agent, by detected intent",
+    ("path", "intent")))
+
+
+# -- Logging --------------------------------------------------------------
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with any `fields` passed through `extra`"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _configure_root():
+    logger = logging.getLogger("sportacus")
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter())
+        logger.addHandler(handler)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+    return logger
+
+
+_configure_root()
+
+
+def get_logger(name):
+    """Module logger under the app's JSON handler"""
+    return logging.getLogger(f"sportacus.{name}")
+
+
+def log_fields(**fields):
+    """`extra` for a structured log call"""
+    return {'fields': fields}
+
+
+def log_sampled(logger, level, msg, rate=None, **fields):
+    """Log only a fraction of calls, deciding before any record is built"""
+    if random.random() < (LOG_SAMPLE_RATE if rate is None else rate) and logger.isEnabledFor(level):
+        logger.log(level, msg, extra=log_fields(sample_rate=LOG_SAMPLE_RATE if rate is None else rate, **fields))
+
+
+logger = get_logger("http")
+db_logger = get_logger("db")
+
+
+# -- Instrumentation --------------------------------------------------------
+
+def _route_label(scope):
+    route = scope.get('route')
+    if route is not None:
+        return getattr(route, 'path', 'unmatched')
+    # Older Starlette doesn't record the matched route in the scope
+    app = scope.get('app')
+    for candidate in getattr(getattr(app, 'router', None), 'routes', []):
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return candidate.path
+    return 'unmatched'
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request until its body finishes sending"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            method = scope['method']
+            route = _route_label(scope)
+            http_requests.inc(method=method, route=route, status=status[0])
+            http_duration.observe(elapsed, method=method, route=route)
+
+            elapsed_ms = round(elapsed * 1000, 2)
+            fields = dict(method=method, route=route, status=status[0], duration_ms=elapsed_ms)
+            if status[0] >= 500 or elapsed_ms >= SLOW_REQUEST_MS:
+                logger.warning("request", extra=log_fields(**fields))
+            else:
+                log_sampled(logger, logging.INFO, "request", **fields)
+
+
+_db_timing = threading.local()
+
+
+def timed_db_methods(cls):
+    """Class decorator timing every public method of a database class
+
+    Only the outermost call on a thread is recorded: a method that calls
+    another public method (or opens connection()) counts as one operation.
+    Context-manager methods are timed across their whole `with` block.
+    """
+    for name, method in list(vars(cls).items()):
+        if name.startswith('_') or not inspect.isfunction(method):
+            continue
+        setattr(cls, name, _timed(name, method))
+    return cls
+
+
+@contextlib.contextmanager
+def _db_operation(operation):
+    depth = getattr(_db_timing, 'depth', 0)
+    _db_timing.depth = depth + 1
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if not depth:
+            db_errors.inc(operation=operation)
+        raise
+    finally:
+        _db_timing.depth = depth
+        if not depth:
+            elapsed = time.perf_counter() - started
+            db_duration.observe(elapsed, operation=operation)
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                db_logger.warning("slow db operation", extra=log_fields(
+                    operation=operation, duration_ms=round(elapsed * 1000, 2)))
+
+
+def _timed(operation, method):
+    if inspect.isgeneratorfunction(getattr(method, '__wrapped__', None)):
+        # A @contextmanager: time from entering the block to leaving it
+        @functools.wraps(method)
+        @contextlib.contextmanager
+        def scoped(*args, **kwargs):
+            with _db_operation(operation), method(*args, **kwargs) as value:
+                yield value
+        return scoped
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with _db_operation(operation):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token), shared by metrics, retrieval and history trimming"""
+    return len(text or '') // 4
+
+
+def record_agent_call(mode, prompt, result, elapsed, outcome='ok', first_token=None):
+    """Latency, token and outcome metrics for one agent invocation"""
+    agent_calls.inc(mode=mode, outcome=outcome)
+    agent_duration.observe(elapsed, mode=mode)
+    if first_token is not None:
+        agent_first_token.observe(first_token)
+    if outcome != 'ok':
+        return
+
+    usage = getattr(getattr(result, 'metrics', None), 'accumulated_usage', None) or {}
+    input_tokens = usage.get('inputTokens')
+    output_tokens = usage.get('outputTokens')
+    if input_tokens is None:
+        input_tokens = estimate_tokens(prompt)
+    if output_tokens is None:
+        output_tokens = estimate_tokens(str(result) if result is not None else '')
+    agent_tokens.inc(input_tokens, direction='input')
+    agent_tokens.inc(output_tokens, direction='output')
+
+
+def render_metrics():
+    return registry.render()
@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Read-through cache of user profiles and their rendered prompt context.
+# Every save bumps the user's row in profile_generations in the same
+# transaction, and each lookup compares that single integer against the
+# cached copy, so a save in one uvicorn worker invalidates every other
+# worker's cache on its next read.
+
+
+def render_context(profile):
+    """Profile block that opens every agent prompt"""
+    context = f"""User Profile:
+- Fitness Level: {profile.get('fitness_level', 'beginner')}
+- Goal: {profile.get('primary_goal', 'general_fitness')}
+- Age: {profile.get('age', 25)}, Weight: {profile.get('weight', 150)} lbs, Height: {profile.get('height', 70)} inches
+- Activity Level: {profile.get('activity_level', 'moderately_active')}
+- Use imperial measurements (pounds, inches, feet) in all responses"""
+
+    if profile.get('dietary_restrictions'):
+        context += f"\n- Dietary Restrictions: {profile['dietary_restrictions']}"
+    if profile.get('medical_conditions'):
+        context += f"\n- Medical Conditions: {profile['medical_conditions']}"
+    return context
+
+
+def current_generation(conn, user_id):
+    """Generation of a user's profile, 0 before the first save"""
+    row = conn.execute(
+        "SELECT generation FROM profile_generations WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def bump_generation(conn, user_id):
+    """Mark a user's profile as changed; call inside the saving transaction"""
+    conn.execute('''
+        INSERT INTO profile_generations (user_id, generation, updated_at) VALUES (?, 1, ?)
+        ON CONFLICT (user_id) DO UPDATE SET generation = generation + 1, updated_at = excluded.updated_at
+    ''', (user_id, time.time()))
+
+
+class ProfileCache:
+    """Size-bounded LRU of user_id -> (generation, profile, context)"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def get(self, conn, user_id, load):
+        """Return (profile, context), calling load(conn, user_id) -> (generation, profile) on a miss"""
+        generation = current_generation(conn, user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] == generation:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1], entry[2]
+            if entry is not None:
+                self.stale += 1
+            self.misses += 1
+
+        generation, profile = load(conn, user_id)
+        context = render_context(profile or {})
+        with self._lock:
+            self._entries[user_id] = (generation, profile, context)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return profile, context
+
+    def invalidate(self, user_id):
+        """Drop this worker's copy of a user's profile"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+def create_profile_cache():
+    """Build the cache from the PROFILE_CACHE_SIZE environment setting"""
+    return ProfileCache(max_entries=int(os.getenv("PROFILE_CACHE_SIZE", "1024")))
@@ -0,0 +1,339 @@
+import argparse
+from datetime import date as date_cls, timedelta
+
+# Per-user progress aggregates maintained inside the same transactions that
+# write the journal, so dashboards read precomputed rows instead of
+# rescanning history.
+#
+# - exercise_progress: one row per user and exercise, counting completed
+#   exercises only (volume, best weight/reps, estimated 1RM, last date)
+# - weekly_activity: workouts logged per user per ISO week (Monday start)
+# - user_progress: per-user totals and week streaks
+#
+# Additions are applied as deltas. Removing a completed exercise recomputes
+# just that user's rows for the affected exercises, since maxima can't be
+# decremented.
+
+
+def exercise_key(name):
+    """Normalized name used to group the same exercise across entries"""
+    return ' '.join((name or '').lower().split())
+
+
+def week_start(date_str):
+    """Monday of the week containing an ISO date, or None if unparseable"""
+    try:
+        day = date_cls.fromisoformat((date_str or '')[:10])
+    except ValueError:
+        return None
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def estimated_1rm(weight, reps):
+    """Epley estimate of the one-rep max"""
+    if not weight or not reps:
+        return None
+    if reps == 1:
+        return float(weight)
+    return round(weight * (1 + reps / 30), 1)
+
+
+def _exercise_stats(exercise):
+    """Aggregate contribution of one completed exercise row"""
+    sets = exercise.get('sets') or 1
+    reps = exercise.get('reps') or 0
+    weight = exercise.get('weight') or 0
+    return {
+        'sets': sets,
+        'reps': sets * reps,
+        'volume': sets * reps * weight,
+        'weight': exercise.get('weight'),
+        'best_reps': exercise.get('reps'),
+        'e1rm': estimated_1rm(exercise.get('weight'), exercise.get('reps')),
+    }
+
+
+def _row_value(row, *names):
+    """Read the first present column/key from a sqlite3.Row or dict"""
+    keys = row.keys()
+    for name in names:
+        if name in keys:
+            return row[name]
+    return None
+
+
+def normalize_exercise(row):
+    """Accept either API-shaped exercises or workout_exercises rows"""
+    return {
+        'name': _row_value(row, 'name', 'exercise_name'),
+        'sets': _row_value(row, 'sets'),
+        'reps': _row_value(row, 'reps'),
+        'weight': _row_value(row, 'weight'),
+        'completed': bool(_row_value(row, 'completed')),
+    }
+
+
+def add_exercise(conn, user_id, entry_date, exercise):
+    """Fold one newly completed exercise into exercise_progress"""
+    exercise = normalize_exercise(exercise)
+    if not exercise['completed'] or not exercise_key(exercise['name']):
+        return
+    _ensure_user_row(conn, user_id)
+    stats = _exercise_stats(exercise)
+    conn.execute('''
+        INSERT INTO exercise_progress
+        (user_id, exercise_key, exercise_name, sessions, total_sets, total_reps, total_volume,
+         best_weight, best_reps, best_e1rm, last_date)
+        VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, exercise_key) DO UPDATE SET
+            exercise_name = excluded.exercise_name,
+            sessions = sessions + 1,
+            total_sets = total_sets + excluded.total_sets,
+            total_reps = total_reps + excluded.total_reps,
+            total_volume = total_volume + excluded.total_volume,
+            best_weight = MAX(COALESCE(best_weight, excluded.best_weight), COALESCE(excluded.best_weight, best_weight)),
+            best_reps = MAX(COALESCE(best_reps, excluded.best_reps), COALESCE(excluded.best_reps, best_reps)),
+            best_e1rm = MAX(COALESCE(best_e1rm, excluded.best_e1rm), COALESCE(excluded.best_e1rm, best_e1rm)),
+            last_date = MAX(COALESCE(last_date, excluded.last_date), COALESCE(excluded.last_date, last_date))
+    ''', (user_id, exercise_key(exercise['name']), exercise['name'], stats['sets'], stats['reps'],
+          stats['volume'], stats['weight'], stats['best_reps'], stats['e1rm'], entry_date))
+    conn.execute('''
+        UPDATE user_progress
+        SET completed_exercises = completed_exercises + 1, total_volume = total_volume + ?
+        WHERE user_id = ?
+    ''', (stats['volume'], user_id))
+
+
+def recompute_exercises(conn, user_id, keys):
+    """Rebuild the user's exercise_progress rows for some exercise keys after removals, in one grouped query"""
+    keys = sorted({key for key in keys if key})
+    if not keys:
+        return
+    _ensure_user_row(conn, user_id)
+    placeholders = ','.join('?' * len(keys))
+    totals = f"SELECT COALESCE(SUM(sessions), 0), COALESCE(SUM(total_volume), 0) FROM exercise_progress " \
+             f"WHERE user_id = ? AND exercise_key IN ({placeholders})"
+    old_sessions, old_volume = conn.execute(totals, [user_id] + keys).fetchone()
+    # Same arithmetic as _exercise_stats and estimated_1rm, over just these
+    # exercises' completed rows. CROSS JOIN keeps the user's entries as the
+    # outer loop, probing idx_workout_exercises_key per entry, so the cost
+    # follows this user's history rather than everyone's rows for the
+    # exercise. Existing rows keep their display name (the spelling most
+    # recently logged, as add_exercise maintains it).
+    remaining = {row[0] for row in conn.execute(f'''
+        INSERT INTO exercise_progress
+        (user_id, exercise_key, exercise_name, sessions, total_sets, total_reps, total_volume,
+         best_weight, best_reps, best_e1rm, last_date)
+        SELECT e.user_id, ex.exercise_key, MAX(ex.exercise_name), COUNT(*),
+               SUM(COALESCE(NULLIF(ex.sets, 0), 1)),
+               SUM(COALESCE(NULLIF(ex.sets, 0), 1) * COALESCE(ex.reps, 0)),
+               SUM(COALESCE(NULLIF(ex.sets, 0), 1) * COALESCE(ex.reps, 0) * COALESCE(ex.weight, 0)),
+               MAX(ex.weight), MAX(ex.reps),
+               MAX(CASE
+                   WHEN NOT ex.weight OR NOT ex.reps THEN NULL
+                   WHEN ex.reps = 1 THEN CAST(ex.weight AS REAL)
+                   ELSE ROUND(ex.weight * (1 + ex.reps / 30.0), 1)
+               END),
+               MAX(e.date)
+        FROM workout_entries e CROSS JOIN workout_exercises ex ON ex.entry_id = e.id
+        WHERE e.user_id = ? AND ex.exercise_key IN ({placeholders}) AND ex.completed
+        GROUP BY e.user_id, ex.exercise_key
+        ON CONFLICT (user_id, exercise_key) DO UPDATE SET
+            sessions = excluded.sessions,
+            total_sets = excluded.total_sets,
+            total_reps = excluded.total_reps,
+            total_volume = excluded.total_volume,
+            best_weight = excluded.best_weight,
+            best_reps = excluded.best_reps,
+            best_e1rm = excluded.best_e1rm,
+            last_date = excluded.last_date
+        RETURNING exercise_key
+    ''', [user_id] + keys).fetchall()}
+    gone = [key for key in keys if key not in remaining]
+    if gone:
+        conn.execute(
+            f"DELETE FROM exercise_progress WHERE user_id = ? AND exercise_key IN ({','.join('?' * len(gone))})",
+            [user_id] + gone
+        )
+    new_sessions, new_volume = conn.execute(totals, [user_id] + keys).fetchone()
+    conn.execute('''
+        UPDATE user_progress
+        SET completed_exercises = completed_exercises + ?, total_volume = total_volume + ?
+        WHERE user_id = ?
+    ''', (new_sessions - old_sessions, new_volume - old_volume, user_id))
+
+
+def add_entry(conn, user_id, entry_date, exercises, refresh=True):
+    """Record a newly saved journal entry"""
+    _ensure_user_row(conn, user_id)
+    week = week_start(entry_date)
+    if week:
+        conn.execute('''
+            INSERT INTO weekly_activity (user_id, week_start, workouts) VALUES (?, ?, 1)
+            ON CONFLICT (user_id, week_start) DO UPDATE SET workouts = workouts + 1
+        ''', (user_id, week))
+    conn.execute(
+        "UPDATE user_progress SET total_workouts = total_workouts + 1 WHERE user_id = ?",
+        (user_id,)
+    )
+    for exercise in exercises:
+        add_exercise(conn, user_id, entry_date, exercise)
+    if refresh:
+        refresh_summary(conn, user_id)
+
+
+def remove_entry(conn, user_id, entry_date, exercises, refresh=True):
+    """Undo add_entry for an entry whose rows are already gone or replaced"""
+    _ensure_user_row(conn, user_id)
+    week = week_start(entry_date)
+    if week:
+        conn.execute(
+            "UPDATE weekly_activity SET workouts = workouts - 1 WHERE user_id = ? AND week_start = ?",
+            (user_id, week)
+        )
+        conn.execute(
+            "DELETE FROM weekly_activity WHERE user_id = ? AND week_start = ? AND workouts <= 0",
+            (user_id, week)
+        )
+    conn.execute(
+        "UPDATE user_progress SET total_workouts = total_workouts - 1 WHERE user_id = ?",
+        (user_id,)
+    )
+    recompute_exercises(conn, user_id, [
+        exercise_key(normalize_exercise(ex)['name']) for ex in exercises if normalize_exercise(ex)['completed']
+    ])
+    if refresh:
+        refresh_summary(conn, user_id)
+
+
+def _ensure_user_row(conn, user_id):
+    conn.execute("INSERT OR IGNORE INTO user_progress (user_id) VALUES (?)", (user_id,))
+
+
+def refresh_summary(conn, user_id):
+    """Recompute week streaks and last workout date for a user"""
+    weeks = [row[0] for row in conn.execute(
+        "SELECT week_start FROM weekly_activity WHERE user_id = ? AND workouts > 0 ORDER BY week_start",
+        (user_id,)
+    )]
+    longest = current = 0
+    previous = None
+    for week in weeks:
+        day = date_cls.fromisoformat(week)
+        current = current + 1 if previous and day - previous == timedelta(days=7) else 1
+        longest = max(longest, current)
+        previous = day
+    last_date = conn.execute(
+        "SELECT MAX(date) FROM workout_entries WHERE user_id = ?", (user_id,)
+    ).fetchone()[0]
+    conn.execute('''
+        UPDATE user_progress
+        SET latest_streak_weeks = ?, latest_streak_week = ?, longest_streak_weeks = ?, last_workout_date = ?
+        WHERE user_id = ?
+    ''', (current, weeks[-1] if weeks else None, longest, last_date, user_id))
+
+
+def get_summary(conn, user_id, today=None):
+    """Totals and streaks for the dashboard"""
+    row = conn.execute("SELECT * FROM user_progress WHERE user_id = ?", (user_id,)).fetchone()
+    if not row:
+        return {
+            'total_workouts': 0, 'completed_exercises': 0, 'total_volume': 0,
+            'current_streak_weeks': 0, 'longest_streak_weeks': 0, 'last_workout_date': None,
+        }
+    # The latest streak is still current if it reaches this week or last week
+    this_week = date_cls.fromisoformat(week_start((today or date_cls.today()).isoformat()))
+    latest = row['latest_streak_week']
+    is_current = latest and this_week - date_cls.fromisoformat(latest) <= timedelta(days=7)
+    return {
+        'total_workouts': row['total_workouts'],
+        'completed_exercises': row['completed_exercises'],
+        'total_volume': row['total_volume'],
+        'current_streak_weeks': row['latest_streak_weeks'] if is_current else 0,
+        'longest_streak_weeks': row['longest_streak_weeks'],
+        'last_workout_date': row['last_workout_date'],
+    }
+
+
+def get_exercises(conn, user_id, name=None):
+    """Per-exercise aggregates, most recently trained first"""
+    if name is not None:
+        rows = conn.execute(
+            "SELECT * FROM exercise_progress WHERE user_id = ? AND exercise_key = ?",
+            (user_id, exercise_key(name))
+        ).fetchall()
+    else:
+        rows = conn.execute(
+            "SELECT * FROM exercise_progress WHERE user_id = ? ORDER BY last_date DESC, exercise_name",
+            (user_id,)
+        ).fetchall()
+    return [{
+        'exercise': row['exercise_name'],
+        'sessions': row['sessions'],
+        'total_sets': row['total_sets'],
+        'total_reps': row['total_reps'],
+        'total_volume': row['total_volume'],
+        'best_weight': row['best_weight'],
+        'best_reps': row['best_reps'],
+        'estimated_1rm': row['best_e1rm'],
+        'last_date': row['last_date'],
+    } for row in rows]
+
+
+def get_weekly(conn, user_id, weeks=12):
+    """Workout counts for the most recent weeks with activity"""
+    rows = conn.execute(
+        "SELECT week_start, workouts FROM weekly_activity WHERE user_id = ? ORDER BY week_start DESC LIMIT ?",
+        (user_id, weeks)
+    ).fetchall()
+    return [{'week_start': row['week_start'], 'workouts': row['workouts']} for row in reversed(rows)]
+
+
+def rebuild(conn, user_id):
+    """Recompute every aggregate for one user from the journal"""
+    for table in ('exercise_progress', 'weekly_activity', 'user_progress'):
+        conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+    _ensure_user_row(conn, user_id)
+
+    entries = conn.execute(
+        "SELECT id, date FROM workout_entries WHERE user_id = ?", (user_id,)
+    ).fetchall()
+    exercises_by_entry = {}
+    for row in conn.execute('''
+        SELECT ex.* FROM workout_entries e JOIN workout_exercises ex ON ex.entry_id = e.id
+        WHERE e.user_id = ?
+    ''', (user_id,)):
+        exercises_by_entry.setdefault(row['entry_id'], []).append(row)
+
+    for entry in entries:
+        add_entry(conn, user_id, entry['date'], exercises_by_entry.get(entry['id'], []), refresh=False)
+    refresh_summary(conn, user_id)
+    return len(entries)
+
+
+def main():
+    """Backfill aggregates: python progress.py rebuild [--user ID]"""
+    parser = argparse.ArgumentParser(description="Maintain progress aggregate tables")
+    parser.add_argument('command', choices=['rebuild'])
+    parser.add_argument('--user', type=int, help="Only rebuild this user id")
+    parser.add_argument('--db', default="fitness_app.db", help="Path to the SQLite database")
+    args = parser.parse_args()
+
+    from database import FitnessDB
+    fitness_db = FitnessDB(args.db)
+    if args.user is not None:
+        user_ids = [args.user]
+    else:
+        with fitness_db.connection() as conn:
+            user_ids = [row[0] for row in conn.execute(
+                "SELECT id FROM users UNION SELECT DISTINCT user_id FROM workout_entries"
+            )]
+    for user_id in user_ids:
+        # One transaction per user keeps the write lock short
+        with fitness_db.transaction() as conn:
+            count = rebuild(conn, user_id)
+        print(f"Rebuilt progress for user {user_id} ({count} workouts)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """LRU + TTL cache of agent responses keyed on the user and a hash of the rendered prompt
+
+    Entries are never shared between users: the reply came from that user's
+    agent session, whose chat history shapes the answer as much as the prompt.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=24 * 3600, db=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db = db  # FitnessDB for optional persistence, None keeps it in memory
+        self._entries = OrderedDict()  # key -> (response, created_at, user_id)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._user_lookups = {}  # user_id -> [hits, misses]
+
+    @staticmethod
+    def key(user_id, prompt):
+        return hashlib.sha256(f"{user_id}\n{prompt}".encode()).hexdigest()
+
+    def _expired(self, created_at):
+        return time.time() - created_at > self.ttl_seconds
+
+    def _remember(self, key, entry):
+        """Insert into the in-memory LRU, evicting the oldest entries"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _count(self, user_id, hit):
+        """Record a lookup; caller holds the lock"""
+        lookups = self._user_lookups.setdefault(user_id, [0, 0])
+        if hit:
+            self.hits += 1
+            lookups[0] += 1
+        else:
+            self.misses += 1
+            lookups[1] += 1
+
+    def get(self, user_id, prompt):
+        """Return the user's cached response for a prompt, or None"""
+        key = self.key(user_id, prompt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[1]):
+                    self._entries.move_to_end(key)
+                    self._count(user_id, hit=True)
+                    return entry[0]
+                del self._entries[key]
+
+        if self.db is not None:
+            with self.db.connection() as conn:
+                row = conn.execute(
+                    "SELECT response, created_at, user_id FROM llm_response_cache WHERE prompt_hash = ?",
+                    (key,)
+                ).fetchone()
+            if row and not self._expired(row['created_at']):
+                with self._lock:
+                    self._remember(key, (row['response'], row['created_at'], row['user_id']))
+                    self._count(user_id, hit=True)
+                return row['response']
+
+        with self._lock:
+            self._count(user_id, hit=False)
+        return None
+
+    def put(self, user_id, prompt, response):
+        """Cache a response for a prompt rendered for user_id"""
+        key = self.key(user_id, prompt)
+        entry = (response, time.time(), user_id)
+        with self._lock:
+            self._remember(key, entry)
+
+        if self.db is not None:
+            with self.db.transaction() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_response_cache (prompt_hash, user_id, response, created_at) VALUES (?, ?, ?, ?)",
+                    (key, user_id, response, entry[1])
+                )
+                conn.execute(
+                    "DELETE FROM llm_response_cache WHERE created_at < ?",
+                    (entry[1] - self.ttl_seconds,)
+                )
+
+    def preload(self, limit=None):
+        """Fill memory from the persisted table, newest responses first"""
+        if self.db is None:
+            return 0
+        with self.db.connection() as conn:
+            rows = conn.execute(
+                "SELECT prompt_hash, response, created_at, user_id FROM llm_response_cache "
+                "WHERE created_at >= ? ORDER BY created_at DESC LIMIT ?",
+                (time.time() - self.ttl_seconds, limit or self.max_entries)
+            ).fetchall()
+        with self._lock:
+            # Oldest first so the newest end up most recently used
+            for row in reversed(rows):
+                if row['prompt_hash'] not in self._entries:
+                    self._remember(row['prompt_hash'], (row['response'], row['created_at'], row['user_id']))
+        return len(rows)
+
+    def invalidate_user(self, user_id):
+        """Drop every cached response generated for a user"""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry[2] == user_id]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+        if self.db is not None:
+            with self.db.transaction() as conn:
+                conn.execute("DELETE FROM llm_response_cache WHERE user_id = ?", (user_id,))
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'persistent': self.db is not None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+    def user_stats(self, user_id):
+        """The same figures, counting only one user's entries and lookups"""
+        with self._lock:
+            hits, misses = self._user_lookups.get(user_id, (0, 0))
+            return {
+                'entries': sum(1 for entry in self._entries.values() if entry[2] == user_id),
+                'ttl_seconds': self.ttl_seconds,
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            }
+
+
+def create_response_cache(db):
+    """Build the cache from RESPONSE_CACHE_* environment settings"""
+    persist = os.getenv("RESPONSE_CACHE_PERSIST", "0").lower() in ("1", "true", "yes")
+    return ResponseCache(
+        max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "256")),
+        ttl_seconds=int(os.getenv("RESPONSE_CACHE_TTL", str(24 * 3600))),
+        db=db if persist else None,
+    )
@@ -0,0 +1,93 @@
+import os
+import re
+import sqlite3
+
+from observability import estimate_tokens, get_logger
+
+# Local retrieval over the retrieval_fts index (see migrations.py): picks the
+# passages from a user's knowledge and workout notes that best match the
+# current chat message, ranked by BM25 and capped by a token budget.
+
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "300"))
+MAX_QUERY_TERMS = 12
+MAX_PASSAGE_CHARS = 400
+
+STOPWORDS = {
+    'the', 'and', 'for', 'are', 'but', 'not', 'you', 'your', 'with', 'this', 'that', 'have',
+    'has', 'had', 'was', 'were', 'what', 'when', 'where', 'which', 'who', 'how', 'why', 'can',
+    'could', 'should', 'would', 'will', 'did', 'does', 'doing', 'about', 'into', 'from', 'them',
+    'they', 'their', 'there', 'then', 'than', 'some', 'any', 'all', 'just', 'also', 'very',
+    'get', 'got', 'give', 'tell', 'want', 'need', 'like', 'make', 'more', 'most', 'much', 'many',
+    'its', 'our', 'out', 'over', 'too', 'use', 'using', 'been', 'being', 'today', 'please',
+}
+
+logger = get_logger("retrieval")
+
+
+def build_match_query(user_id, message):
+    """FTS5 MATCH expression OR-ing the meaningful words of a message, within one user's documents"""
+    terms = []
+    for word in re.findall(r"\w+", message.lower()):
+        if len(word) < 3 or word in STOPWORDS or word.isdigit() or word in terms:
+            continue
+        terms.append(word)
+        if len(terms) == MAX_QUERY_TERMS:
+            break
+    if not terms:
+        return None
+    # Quoting each term keeps user text from being parsed as FTS5 syntax; the
+    # owner token restricts the match to this user inside the index itself
+    words = ' OR '.join(f'"{term}"' for term in terms)
+    return f'owner:"u{int(user_id)}" AND content: ({words})'
+
+
+def retrieve(conn, user_id, message, k=RETRIEVAL_TOP_K, token_budget=RETRIEVAL_TOKEN_BUDGET):
+    """Top-k passages for a message that fit in token_budget"""
+    query = build_match_query(user_id, message)
+    if not query:
+        return []
+    try:
+        # The owner column is weighted 0 so only the message terms score
+        rows = conn.execute('''
+            SELECT content, source, source_id, rank AS score
+            FROM retrieval_fts
+            WHERE retrieval_fts MATCH ? AND rank MATCH 'bm25(0.0, 1.0)'
+            ORDER BY rank
+            LIMIT ?
+        ''', (query, k * 3)).fetchall()
+    except sqlite3.OperationalError:
+        logger.warning("retrieval query failed", exc_info=True)
+        return []
+
+    passages = []
+    used_tokens = 0
+    seen = set()
+    for row in rows:
+        content = row['content'].strip()
+        if len(content) > MAX_PASSAGE_CHARS:
+            content = content[:MAX_PASSAGE_CHARS].rsplit(' ', 1)[0] + '...'
+        if content in seen:
+            continue
+        cost = estimate_tokens(content)
+        if used_tokens + cost > token_budget:
+            continue
+        seen.add(content)
+        used_tokens += cost
+        passages.append({
+            'content': content,
+            'source': row['source'],
+            'source_id': row['source_id'],
+            'score': round(-row['score'], 3),
+        })
+        if len(passages) == k:
+            break
+    return passages
+
+
+def format_context(passages):
+    """Prompt block for retrieved passages, empty when nothing matched"""
+    if not passages:
+        return ""
+    lines = '\n'.join(f"- {passage['content']}" for passage in passages)
+    return f"Relevant notes from this user's history:\n{lines}"
@@ -0,0 +1,30 @@
+import time
+
+# Per-user change counters behind the API's ETags and Last-Modified headers.
+# Every journal write bumps journal_revisions in its own transaction, the same
+# way profile saves bump profile_generations (see profile_cache.py), so a
+# conditional GET is answered from one primary-key lookup.
+
+
+def journal_revision(conn, user_id):
+    """(revision, updated_at) of a user's journal, (0, None) before the first write"""
+    row = conn.execute(
+        "SELECT revision, updated_at FROM journal_revisions WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    return (row[0], row[1]) if row else (0, None)
+
+
+def bump_journal(conn, user_id):
+    """Mark a user's journal as changed; call inside the writing transaction"""
+    conn.execute('''
+        INSERT INTO journal_revisions (user_id, revision, updated_at) VALUES (?, 1, ?)
+        ON CONFLICT (user_id) DO UPDATE SET revision = revision + 1, updated_at = excluded.updated_at
+    ''', (user_id, time.time()))
+
+
+def profile_revision(conn, user_id):
+    """(generation, updated_at) of a user's profile, (0, None) before the first save"""
+    row = conn.execute(
+        "SELECT generation, updated_at FROM profile_generations WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    return (row[0], row[1]) if row else (0, None)
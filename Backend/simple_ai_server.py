@@ -1,22 +1,73 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+import time
+IMPORT_STARTED = time.perf_counter()  # reported in the startup log
+
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+from typing import Optional
 import jwt
 import os
+import json
+import asyncio
+from contextlib import aclosing, asynccontextmanager
 from datetime import datetime, timedelta
-from database import db
-from strands_fitness_agent import fitness_agent
-import traceback
+from database import db, encode_entry_cursor, decode_entry_cursor, EntryVersionConflict
+from knowledge_compaction import create_knowledge_compactor
+from strands_fitness_agent import agent_sessions
+from executors import run_db, run_agent, run_agent_setup, stream_agent, shutdown_executors
+from agent_scheduler import AgentBusy, INTERACTIVE, BACKGROUND, create_agent_scheduler
+from response_cache import create_response_cache
+import journal_io
+import retrieval
+import workout_parser
+import intent_router
+import write_queue
+from static_assets import StaticAssets, resolve_frontend_dir
+from api_responses import FastJSONResponse, json_response, not_modified, not_modified_response, weak_etag
+from observability import MetricsMiddleware, get_logger, log_fields, render_metrics, registry, Gauge, chat_routes
+
+logger = get_logger("api")
+
+# Nothing expensive happens at import: the schema is checked when the app
+# starts and the agent SDK loads with the first agent. WARMUP_ON_STARTUP does
+# the rest in the background so the first real requests don't pay for it.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "0").lower() in ("1", "true", "yes")
+WARMUP_PROFILES = int(os.getenv("WARMUP_PROFILES", "100"))
+# Seconds between user_knowledge compaction passes (0 disables them) and the
+# pause between their steps, which is when queued request writes get the lock
+KNOWLEDGE_COMPACT_INTERVAL = float(os.getenv("KNOWLEDGE_COMPACT_INTERVAL", "3600"))
+KNOWLEDGE_COMPACT_PAUSE_MS = float(os.getenv("KNOWLEDGE_COMPACT_PAUSE_MS", "50"))
+
+@asynccontextmanager
+async def lifespan(app):
+    started = time.perf_counter()
+    await run_db(db.init_db)
+    logger.info("startup complete", extra=log_fields(
+        import_ms=round(IMPORT_SECONDS * 1000, 1),
+        db_init_ms=round((time.perf_counter() - started) * 1000, 1),
+        warmup=WARMUP_ON_STARTUP,
+    ))
+    background = []
+    if WARMUP_ON_STARTUP:
+        background.append(asyncio.ensure_future(run_warmup()))
+    if KNOWLEDGE_COMPACT_INTERVAL > 0:
+        background.append(asyncio.ensure_future(compact_knowledge_periodically()))
+    try:
+        yield
+    finally:
+        for task in background:
+            task.cancel()
+        # Fire-and-forget writes are only in memory until the writer commits them
+        await run_db(db.writer.barrier)
+        shutdown_executors(wait=False)
 
-app = FastAPI(title="Agent Sportacus API")
+app = FastAPI(title="Agent Sportacus API", lifespan=lifespan, default_response_class=FastJSONResponse)
 security = HTTPBearer()
 
-# Mount static files for frontend
-frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
-if os.path.exists(frontend_path):
-    app.mount("/static", StaticFiles(directory=frontend_path), name="static")
+# Frontend pages and assets, precompressed in memory
+static_assets = StaticAssets(resolve_frontend_dir())
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,11 +75,45 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified"],
 )
+app.add_middleware(MetricsMiddleware)
+
+registry.register(Gauge("db_pool_connections_in_use", "Pooled SQLite connections checked out",
+                        lambda: db.pool_stats()['in_use']))
+registry.register(Gauge("db_pool_connections_open", "SQLite connections opened by the pool",
+                        lambda: db.pool_stats()['open_connections']))
+registry.register(Gauge("db_pool_checkout_wait_ms_max", "Longest wait for a pooled connection",
+                        lambda: db.pool_stats()['max_checkout_ms']))
+registry.register(Gauge("db_write_queue_pending", "Writes queued for, or in, the current writer batch",
+                        lambda: db.writer_stats()['pending']))
+registry.register(Gauge("profile_cache_entries", "User profiles held in the profile cache",
+                        lambda: db.profile_cache_stats()['entries']))
+registry.register(Gauge("profile_cache_hit_ratio", "Share of profile cache lookups that hit",
+                        lambda: db.profile_cache_stats()['hit_rate']))
+registry.register(Gauge("agent_sessions_active", "Per-user agent sessions held in memory",
+                        lambda: agent_sessions.stats()['active_sessions']))
+registry.register(Gauge("agent_calls_running", "Agent calls holding a scheduler slot",
+                        lambda: agent_scheduler.stats()['running']))
+registry.register(Gauge("agent_queue_depth", "Agent calls waiting for a scheduler slot",
+                        lambda: agent_scheduler.queue_depth()))
 
 SECRET_KEY = "fitness_app_secret_key_2024"
 ALGORITHM = "HS256"
 
+# Plan/advice prompts depend only on the profile, so their responses are reusable
+CACHEABLE_REQUEST_TYPES = ('workout_plan', 'nutrition_advice')
+response_cache = create_response_cache(db)
+agent_scheduler = create_agent_scheduler()
+knowledge_compactor = create_knowledge_compactor(db)
+
+registry.register(Gauge("response_cache_entries", "Agent responses held in the in-memory cache",
+                        lambda: response_cache.stats()['entries']))
+registry.register(Gauge("response_cache_hit_ratio", "Share of response cache lookups that hit",
+                        lambda: response_cache.stats()['hit_rate']))
+registry.register(Gauge("knowledge_compaction_passes", "Knowledge compaction passes since startup",
+                        lambda: knowledge_compactor.stats()['passes']))
+
 class UserCreate(BaseModel):
     username: str
     password: str
@@ -60,21 +145,34 @@ class UserProfile(BaseModel):
 class AgentRequest(BaseModel):
     type: str
     message: str = ""
+    regenerate: bool = False
 
 class WorkoutExercise(BaseModel):
+    id: Optional[int] = None  # existing row to update in place on PUT
     name: str
-    sets: int = None
-    reps: int = None
-    weight: float = None
-    duration: int = None
+    sets: Optional[int] = None
+    reps: Optional[int] = None
+    weight: Optional[float] = None
+    duration: Optional[int] = None
     notes: str = ""
     completed: bool = False
 
+class ExerciseUpdate(BaseModel):
+    id: int
+    completed: Optional[bool] = None
+    sets: Optional[int] = None
+    reps: Optional[int] = None
+    weight: Optional[float] = None
+
+class ExerciseBatchUpdate(BaseModel):
+    updates: list[ExerciseUpdate] = Field(..., min_length=1, max_length=500)
+
 class WorkoutEntry(BaseModel):
     date: str
     title: str
     notes: str = ""
     exercises: list[WorkoutExercise] = []
+    version: Optional[int] = None  # version the client loaded, checked on PUT
 
 def create_access_token(user_id: int):
     expire = datetime.utcnow() + timedelta(hours=24)
@@ -93,7 +191,7 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
 
 @app.post("/auth/register")
 async def register(user: UserCreate):
-    user_id = db.create_user(user.username, user.password)
+    user_id = await run_db(db.create_user, user.username, user.password)
     if user_id is None:
         raise HTTPException(status_code=400, detail="Username already exists")
     
@@ -102,7 +200,7 @@ async def register(user: UserCreate):
 
 @app.post("/auth/login")
 async def login(user: UserLogin):
-    user_id = db.authenticate_user(user.username, user.password)
+    user_id = await run_db(db.authenticate_user, user.username, user.password)
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
@@ -112,166 +210,521 @@ async def login(user: UserLogin):
 @app.post("/profile/save")
 async def save_profile(profile: UserProfile, user_id: int = Depends(verify_token)):
     try:
-        db.save_user_profile(user_id, profile.dict())
+        await run_db(db.save_user_profile, user_id, profile.dict())
+        await run_db(response_cache.invalidate_user, user_id)
         return {"message": "Profile saved successfully"}
     except Exception as e:
-        print(f"Profile save error: {e}")
-        traceback.print_exc()
+        logger.exception("profile save failed", extra=log_fields(user_id=user_id))
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/profile/get")
-async def get_profile(user_id: int = Depends(verify_token)):
+async def get_profile(request: Request, user_id: int = Depends(verify_token)):
     try:
-        profile = db.get_user_profile(user_id)
-        if profile is None:
-            raise HTTPException(status_code=404, detail="Profile not found")
-        return profile
+        # Read before the profile, so a save in between only makes the tag stale
+        generation, updated_at = await run_db(db.get_profile_revision, user_id)
+        etag = weak_etag(user_id, 'p', generation)
+        if generation and not_modified(request, etag, updated_at):
+            return not_modified_response(etag, updated_at)
+        profile = await run_db(db.get_user_profile, user_id)
     except Exception as e:
-        print(f"Profile get error: {e}")
-        traceback.print_exc()
+        logger.exception("profile get failed", extra=log_fields(user_id=user_id))
         raise HTTPException(status_code=500, detail=str(e))
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return json_response(request, profile, etag, updated_at)
+
+def build_agent_prompt(request: AgentRequest, profile_context: str, retrieved_context: str = ""):
+    """Render the agent prompt and detect journal-save requests"""
+    context = profile_context
+    
+    # Check if user wants to save workout to journal
+    save_to_journal = workout_parser.is_journal_save(request.message)
+    
+    # Create prompt based on request type
+    if request.type == 'workout_plan':
+        prompt = f"{context}\n\nCreate a personalized workout plan for this user."
+    elif request.type == 'nutrition_advice':
+        prompt = f"{context}\n\nProvide personalized nutrition advice for this user."
+    elif request.type == 'chat':
+        if save_to_journal:
+            prompt = f"{context}\n\nUser wants to save a workout to their journal. Parse their message and create a structured workout entry. Format your response as: WORKOUT_ENTRY followed by JSON with date (YYYY-MM-DD, today is {datetime.now().date().isoformat()}), title, and an exercises array of objects with name, sets, reps, weight, duration (minutes), notes and completed. Then provide a friendly confirmation message.\n\nUser message: {request.message}"
+        else:
+            if retrieved_context:
+                context += f"\n\n{retrieved_context}"
+            prompt = f"{context}\n\nUser question: {request.message}\n\nProvide helpful fitness advice."
+    else:
+        prompt = f"{context}\n\nProvide general fitness guidance."
+    
+    return prompt, save_to_journal
+
+def agent_priority(request: AgentRequest):
+    """Interactive chat is scheduled ahead of plan and advice generation"""
+    return INTERACTIVE if request.type == 'chat' else BACKGROUND
+
+def coalescing_key(user_id: int, prompt: str, save_to_journal: bool):
+    """Key under which one user's identical in-flight prompts share one model call"""
+    if save_to_journal:
+        # Each request saves its own journal entry
+        return None
+    # Never shared across users: the call runs on the first caller's agent
+    # session, whose chat history is private to them
+    return (user_id, response_cache.key(user_id, prompt))
+
+def agent_busy(error: AgentBusy):
+    return HTTPException(status_code=429, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+
+async def queue_write(submit, *args, wait=False):
+    """Queue a write on the DB writer thread
+
+    Returns its result once committed, or None straight away when
+    DB_WRITE_DURABILITY=queued and the caller doesn't need the result (`wait`).
+    """
+    future = await run_db(submit, *args)
+    if wait or db.writer.durability == write_queue.COMMIT:
+        return await asyncio.wrap_future(future)
+    future.add_done_callback(log_write_failure)
+    return None
+
+def log_write_failure(future):
+    if future.exception() is not None:
+        logger.error("queued write failed", exc_info=future.exception())
+
+async def retrieve_chat_context(request: AgentRequest, user_id: int):
+    """Retrieve relevant history for a chat message, then remember the message"""
+    if request.type != 'chat' or not request.message.strip():
+        return ""
+    passages = await run_db(db.search_user_context, user_id, request.message)
+    # Stored after searching so a message never retrieves itself
+    await queue_write(db.queue_user_knowledge, user_id, 'chat', request.message)
+    return retrieval.format_context(passages)
+
+async def save_parsed_workout(user_id: int, message: str):
+    """Save a journal-save message the local parser understands, skipping the agent
+
+    Returns the reply to show, or None when the message needs the agent.
+    """
+    entry, confidence = workout_parser.parse_workout(message)
+    if entry is None or confidence < workout_parser.MIN_CONFIDENCE:
+        return None
+    entry = WorkoutEntry(**entry).dict(exclude={'version'})
+    await queue_write(db.queue_workout_entry, user_id, entry)
+    return (f"✅ Workout saved to your journal! You can view and track it in your Workout Journal.\n\n"
+            f"**{entry['title']}** ({entry['date']})\n{workout_parser.describe_entry(entry)}")
+
+async def save_extracted_workout(user_id: int, extractor: workout_parser.WorkoutEntryExtractor):
+    """Save the WORKOUT_ENTRY block an agent reply contained, returning the reply to show"""
+    data = extractor.value()
+    if data is None:
+        return None
+    try:
+        entry = WorkoutEntry(**data).dict(exclude={'version'})
+        await queue_write(db.queue_workout_entry, user_id, entry)
+    except Exception:
+        logger.warning("saving workout from chat failed", exc_info=True, extra=log_fields(user_id=user_id))
+        return None
+    reply = ' '.join(part for part in (extractor.before(), extractor.after()) if part)
+    return f"✅ Workout saved to your journal! You can view and track it in your Workout Journal. {reply}"
+
+async def save_workout_from_response(user_id: int, response_str: str):
+    """Save a WORKOUT_ENTRY block from a complete agent response"""
+    extractor = workout_parser.WorkoutEntryExtractor()
+    extractor.feed(response_str)
+    return await save_extracted_workout(user_id, extractor)
+
+async def route_request(user_id: int, request: AgentRequest):
+    """Answer a request locally when a parser or intent rule covers it
+
+    Returns (reply or None, routing decision, profile context for the agent prompt).
+    """
+    profile, profile_context = await run_db(db.get_profile_context, user_id)
+    if request.type != 'chat':
+        reply, decision = None, {'path': 'agent', 'intent': None, 'reason': 'request_type'}
+    elif workout_parser.is_journal_save(request.message):
+        reply = await save_parsed_workout(user_id, request.message)
+        decision = {
+            'path': 'local' if reply else 'agent',
+            'intent': 'journal_save',
+            'reason': 'parsed' if reply else 'low_confidence',
+        }
+    else:
+        reply, decision = intent_router.route(request.message, profile)
+    chat_routes.inc(path=decision['path'], intent=decision['intent'] or 'none')
+    return reply, decision, profile_context
 
 @app.post("/agent/chat")
 async def chat_with_agent(request: AgentRequest, user_id: int = Depends(verify_token)):
     try:
-        print(f"Agent request: {request.type}, message: {request.message}")
+        local_reply, route, profile_context = await route_request(user_id, request)
+        if local_reply:
+            return {"response": local_reply, "route": route}
         
-        # Get user profile for context
-        profile = db.get_user_profile(user_id)
-        print(f"User profile: {profile}")
+        retrieved_context = await retrieve_chat_context(request, user_id)
+        prompt, save_to_journal = build_agent_prompt(request, profile_context, retrieved_context)
         
-        # Build simple context
-        context = f"""User Profile:
-- Fitness Level: {profile.get('fitness_level', 'beginner')}
-- Goal: {profile.get('primary_goal', 'general_fitness')}
-- Age: {profile.get('age', 25)}, Weight: {profile.get('weight', 150)} lbs, Height: {profile.get('height', 70)} inches
-- Activity Level: {profile.get('activity_level', 'moderately_active')}
-- Use imperial measurements (pounds, inches, feet) in all responses"""
-        
-        if profile.get('dietary_restrictions'):
-            context += f"\n- Dietary Restrictions: {profile['dietary_restrictions']}"
-        if profile.get('medical_conditions'):
-            context += f"\n- Medical Conditions: {profile['medical_conditions']}"
-        
-        # Check if user wants to save workout to journal
-        save_to_journal = any(phrase in request.message.lower() for phrase in [
-            'save to journal', 'add to journal', 'transfer to journal', 
-            'log this workout', 'save this workout', 'add this to my journal'
-        ])
-        
-        # Create prompt based on request type
-        if request.type == 'workout_plan':
-            prompt = f"{context}\n\nCreate a personalized workout plan for this user."
-        elif request.type == 'nutrition_advice':
-            prompt = f"{context}\n\nProvide personalized nutrition advice for this user."
-        elif request.type == 'chat':
-            if save_to_journal:
-                prompt = f"{context}\n\nUser wants to save a workout to their journal. Parse their message and create a structured workout entry. Format your response as: WORKOUT_ENTRY followed by JSON with date, title, exercises array. Then provide a friendly confirmation message.\n\nUser message: {request.message}"
-            else:
-                prompt = f"{context}\n\nUser question: {request.message}\n\nProvide helpful fitness advice."
-        else:
-            prompt = f"{context}\n\nProvide general fitness guidance."
-        
-        print(f"Sending prompt to agent: {prompt[:200]}...")
+        cacheable = request.type in CACHEABLE_REQUEST_TYPES
+        if cacheable and not request.regenerate:
+            cached = await run_db(response_cache.get, user_id, prompt)
+            if cached is not None:
+                return {"response": cached, "cached": True, "route": route}
         
         # Call Strands agent
-        response = fitness_agent(prompt)
-        print(f"Agent response: {str(response)[:200]}...")
+        response = await agent_scheduler.run(
+            user_id, agent_priority(request),
+            lambda: run_agent(agent_sessions.get(user_id), prompt),
+            key=coalescing_key(user_id, prompt, save_to_journal),
+        )
+        logger.debug("agent reply", extra=log_fields(
+            user_id=user_id, type=request.type, prompt_chars=len(prompt), response_chars=len(str(response))))
+        
+        if cacheable:
+            await run_db(response_cache.put, user_id, prompt, str(response))
         
         # Check if response contains workout entry to save
         response_str = str(response)
-        if save_to_journal and 'WORKOUT_ENTRY' in response_str:
-            try:
-                # Extract JSON from response
-                import re
-                json_match = re.search(r'WORKOUT_ENTRY\s*({.*?})(?=\n|$)', response_str, re.DOTALL)
-                if json_match:
-                    import json as json_lib
-                    workout_data = json_lib.loads(json_match.group(1))
-                    
-                    # Save to journal
-                    entry_id = db.save_workout_entry(user_id, workout_data)
-                    
-                    # Return success message
-                    return {"response": f"✅ Workout saved to your journal! You can view and track it in your Workout Journal. {response_str.split('WORKOUT_ENTRY')[0] if 'WORKOUT_ENTRY' in response_str else ''}"}
-            except Exception as e:
-                print(f"Error saving workout from chat: {e}")
+        if save_to_journal:
+            saved_reply = await save_workout_from_response(user_id, response_str)
+            if saved_reply:
+                return {"response": saved_reply, "route": route}
         
-        return {"response": response_str}
+        return {"response": response_str, "route": route}
         
+    except AgentBusy as e:
+        raise agent_busy(e)
     except Exception as e:
-        print(f"Agent chat error: {e}")
-        traceback.print_exc()
+        logger.exception("agent chat failed", extra=log_fields(user_id=user_id))
         raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
 
+def sse_event(event: str, data: dict):
+    """Format one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def reply_events(text: str, started: float, **extra):
+    """A reply that needed no agent call, as a single token and done event"""
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    yield sse_event("token", {"text": text})
+    yield sse_event("done", {
+        "response": text,
+        **extra,
+        "time_to_first_token_ms": elapsed_ms,
+        "total_ms": elapsed_ms,
+    })
+
+@app.post("/agent/chat/stream")
+async def stream_chat_with_agent(request: AgentRequest, user_id: int = Depends(verify_token)):
+    """Same as /agent/chat but forwards agent tokens as Server-Sent Events"""
+    started = time.perf_counter()
+    local_reply, route, profile_context = await route_request(user_id, request)
+    if local_reply:
+        return StreamingResponse(
+            reply_events(local_reply, started, route=route),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    
+    retrieved_context = await retrieve_chat_context(request, user_id)
+    prompt, save_to_journal = build_agent_prompt(request, profile_context, retrieved_context)
+    
+    cacheable = request.type in CACHEABLE_REQUEST_TYPES
+    cached = None
+    if cacheable and not request.regenerate:
+        cached = await run_db(response_cache.get, user_id, prompt)
+    if cached is None:
+        try:
+            # Answer 429 now, a streamed response can't change its status later
+            agent_scheduler.ensure_capacity(user_id)
+        except AgentBusy as e:
+            raise agent_busy(e)
+    
+    async def events():
+        chunks = []
+        first_token_ms = None
+        extractor = workout_parser.WorkoutEntryExtractor() if save_to_journal else None
+        try:
+            # The slot is freed when the model thread finishes, not when this
+            # generator does: a client that disconnects mid-stream mustn't free
+            # capacity while its model call is still winding down
+            release = await agent_scheduler.claim(user_id, agent_priority(request))
+            try:
+                agent = agent_sessions.get(user_id)
+            except BaseException:
+                release()
+                raise
+            async with aclosing(stream_agent(agent, prompt, on_done=release)) as stream:
+                async for text in stream:
+                    if first_token_ms is None:
+                        first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+                    chunks.append(text)
+                    if extractor is not None:
+                        extractor.feed(text)
+                        if extractor.found:
+                            # Don't show the raw WORKOUT_ENTRY JSON while it streams in
+                            continue
+                    yield sse_event("token", {"text": text})
+            
+            response_str = ''.join(chunks)
+            final = None
+            if extractor is not None:
+                final = await save_extracted_workout(user_id, extractor)
+            if cacheable:
+                await run_db(response_cache.put, user_id, prompt, response_str)
+            yield sse_event("done", {
+                "response": final or response_str,
+                "route": route,
+                "time_to_first_token_ms": first_token_ms,
+                "total_ms": round((time.perf_counter() - started) * 1000, 1),
+            })
+        except AgentBusy as e:
+            # The queue filled up between the capacity check and this stream starting
+            yield sse_event("error", {"detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            logger.exception("agent stream failed", extra=log_fields(user_id=user_id))
+            yield sse_event("error", {"detail": f"Agent error: {str(e)}"})
+    
+    return StreamingResponse(
+        reply_events(cached, started, cached=True, route=route) if cached is not None else events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/agent/cache/stats")
+async def agent_cache_stats(user_id: int = Depends(verify_token)):
+    # Only the caller's own figures; cache-wide numbers are in /metrics
+    return response_cache.user_stats(user_id)
+
 @app.post("/journal/save")
 async def save_workout_entry(entry: WorkoutEntry, user_id: int = Depends(verify_token)):
     try:
-        entry_id = db.save_workout_entry(user_id, entry.dict())
+        # entry_id is null when DB_WRITE_DURABILITY=queued
+        entry_id = await queue_write(db.queue_workout_entry, user_id, entry.dict())
         return {"message": "Workout saved successfully", "entry_id": entry_id}
     except Exception as e:
-        print(f"Journal save error: {e}")
-        traceback.print_exc()
+        logger.exception("journal save failed", extra=log_fields(user_id=user_id))
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/journal/entries")
-async def get_workout_entries(user_id: int = Depends(verify_token)):
+async def get_workout_entries(
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str = None,
+    user_id: int = Depends(verify_token),
+):
+    try:
+        before = decode_entry_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
-        entries = db.get_workout_entries(user_id)
-        return entries
+        # A page only changes when the journal does, whatever limit/cursor it was
+        # asked with, and the revision is one row: no entry or exercise reads
+        revision, updated_at = await run_db(db.get_journal_revision, user_id)
+        etag = weak_etag(user_id, 'j', revision)
+        if not_modified(request, etag, updated_at):
+            return not_modified_response(etag, updated_at)
+        # Fetch one extra row to learn whether another page exists
+        entries = await run_db(db.get_workout_entries, user_id, limit + 1, before)
+        next_cursor = encode_entry_cursor(entries[limit - 1]) if len(entries) > limit else None
+        return json_response(request, {"entries": entries[:limit], "next_cursor": next_cursor}, etag, updated_at)
     except Exception as e:
-        print(f"Journal get error: {e}")
-        traceback.print_exc()
+        logger.exception("journal get failed", extra=log_fields(user_id=user_id))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/journal/search")
+async def search_workout_entries(
+    q: str = Query(..., min_length=1, max_length=200),
+    start_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    end_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    sort: str = Query("rank", pattern="^(rank|date)$"),
+    limit: int = Query(20, ge=1, le=100),
+    user_id: int = Depends(verify_token),
+):
+    """Full-text search over journal titles, notes and exercise names"""
+    try:
+        results = await run_db(db.search_journal, user_id, q, start_date, end_date, limit, sort)
+        return {"query": q, "results": results}
+    except Exception as e:
+        logger.exception("journal search failed", extra=log_fields(user_id=user_id))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/journal/import")
+async def import_workout_entries(request: Request, format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+                                 user_id: int = Depends(verify_token)):
+    """Bulk import journal entries from an NDJSON or CSV request body"""
+    lines = journal_io.iter_lines(request.stream())
+    if format == "csv":
+        records = journal_io.iter_csv_records(lines)
+    else:
+        records = journal_io.iter_ndjson_records(lines)
+    
+    async def save_batch(entries):
+        return await run_db(db.import_workout_entries, user_id, entries)
+    
+    try:
+        return await journal_io.import_entries(records, lambda record: WorkoutEntry(**record).dict(), save_batch)
+    except Exception as e:
+        logger.exception("journal import failed", extra=log_fields(user_id=user_id))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/journal/export")
+async def export_workout_entries(format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+                                 user_id: int = Depends(verify_token)):
+    """Stream the user's whole journal as NDJSON or CSV"""
+    async def fetch_page(limit, before):
+        return await run_db(db.get_workout_entries, user_id, limit, before)
+    
+    pages = journal_io.iter_entry_pages(fetch_page)
+    if format == "csv":
+        body, media_type = journal_io.export_csv(pages), "text/csv"
+    else:
+        body, media_type = journal_io.export_ndjson(pages), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="workout_journal.{format}"'},
+    )
+
 @app.post("/journal/exercise/{exercise_id}/complete")
 async def toggle_exercise_completion(exercise_id: int, completed: bool, user_id: int = Depends(verify_token)):
     try:
-        db.update_exercise_completion(exercise_id, completed)
-        return {"message": "Exercise updated successfully"}
+        # Waits even when writes are queued: the 404 depends on the ownership check
+        updates = [{'id': exercise_id, 'completed': completed}]
+        updated = await queue_write(db.queue_exercise_updates, user_id, updates, wait=True)
+    except Exception as e:
+        logger.exception("exercise update failed", extra=log_fields(user_id=user_id))
+        raise HTTPException(status_code=500, detail=str(e))
+    if not updated:
+        raise HTTPException(status_code=404, detail="Exercise not found")
+    return {"message": "Exercise updated successfully"}
+
+@app.patch("/journal/exercises")
+async def update_exercises(batch: ExerciseBatchUpdate, user_id: int = Depends(verify_token)):
+    """Apply many exercise changes in one transaction"""
+    # exclude_unset keeps omitted fields unchanged while an explicit null clears them
+    updates = [update.dict(exclude_unset=True) for update in batch.updates]
+    try:
+        updated = await queue_write(db.queue_exercise_updates, user_id, updates, wait=True)
     except Exception as e:
-        print(f"Exercise update error: {e}")
-        traceback.print_exc()
+        logger.exception("exercise batch update failed", extra=log_fields(user_id=user_id))
         raise HTTPException(status_code=500, detail=str(e))
+    if updated is None:
+        raise HTTPException(status_code=404, detail="One or more exercises not found")
+    return {"message": "Exercises updated successfully", "updated": updated}
 
 @app.get("/journal/entry/{entry_id}")
 async def get_workout_entry(entry_id: int, user_id: int = Depends(verify_token)):
     try:
-        entry = db.get_workout_entry(entry_id, user_id)
+        entry = await run_db(db.get_workout_entry, entry_id, user_id)
         if not entry:
             raise HTTPException(status_code=404, detail="Workout entry not found")
         return entry
     except Exception as e:
-        print(f"Journal get entry error: {e}")
-        traceback.print_exc()
+        logger.exception("journal get entry failed", extra=log_fields(user_id=user_id))
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/journal/entry/{entry_id}")
 async def update_workout_entry(entry_id: int, entry: WorkoutEntry, user_id: int = Depends(verify_token)):
     try:
-        db.update_workout_entry(entry_id, user_id, entry.dict())
-        return {"message": "Workout updated successfully"}
+        version = await run_db(db.update_workout_entry, entry_id, user_id, entry.dict(), entry.version)
+    except EntryVersionConflict as e:
+        raise HTTPException(status_code=409, detail={
+            "message": "This workout was changed on another device. Reload it before saving.",
+            "current_version": e.current_version,
+        })
     except Exception as e:
-        print(f"Journal update error: {e}")
-        traceback.print_exc()
+        logger.exception("journal update failed", extra=log_fields(user_id=user_id))
         raise HTTPException(status_code=500, detail=str(e))
+    if not version:
+        raise HTTPException(status_code=404, detail="Workout entry not found")
+    return {"message": "Workout updated successfully", "version": version}
+
+@app.get("/progress/summary")
+async def get_progress_summary(user_id: int = Depends(verify_token)):
+    return await run_db(db.get_progress_summary, user_id)
+
+@app.get("/progress/exercises")
+async def get_exercise_progress(name: str = None, user_id: int = Depends(verify_token)):
+    return await run_db(db.get_exercise_progress, user_id, name)
+
+@app.get("/progress/weekly")
+async def get_weekly_activity(weeks: int = Query(12, ge=1, le=520), user_id: int = Depends(verify_token)):
+    return await run_db(db.get_weekly_activity, user_id, weeks)
+
+@app.post("/progress/rebuild")
+async def rebuild_progress(user_id: int = Depends(verify_token)):
+    workouts = await run_db(db.rebuild_progress, user_id)
+    return {"message": "Progress rebuilt", "workouts": workouts}
+
+async def warm_up():
+    """Open the DB pool, prime the caches and build a spare agent
+
+    Stages run independently, so e.g. missing model credentials don't stop
+    the database from warming.
+    """
+    stages = {
+        'database': lambda: run_db(db.prefill_pool),
+        'profile_cache': lambda: run_db(db.prime_profile_cache, WARMUP_PROFILES),
+        'response_cache': lambda: run_db(response_cache.preload),
+        'agent': lambda: run_agent_setup(agent_sessions.warm),
+    }
+    timings = {}
+    errors = {}
+    for name, stage in stages.items():
+        started = time.perf_counter()
+        try:
+            await stage()
+        except Exception as e:
+            errors[name] = str(e)
+            logger.warning("warmup stage failed", extra=log_fields(stage=name, error=str(e)))
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info("warmup complete", extra=log_fields(timings_ms=timings, failed=sorted(errors)))
+    return {"timings_ms": timings, "errors": errors}
+
+async def compact_knowledge_periodically():
+    """Run a user_knowledge compaction pass every KNOWLEDGE_COMPACT_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(KNOWLEDGE_COMPACT_INTERVAL)
+        try:
+            while await run_db(knowledge_compactor.step) is not None:
+                await asyncio.sleep(KNOWLEDGE_COMPACT_PAUSE_MS / 1000)
+        except Exception:
+            logger.exception("knowledge compaction failed")
+
+warmup_state = {'task': None}
+
+async def run_warmup():
+    """Run warm_up(), sharing the run already in progress if there is one"""
+    task = warmup_state['task']
+    if task is None or task.done():
+        task = warmup_state['task'] = asyncio.ensure_future(warm_up())
+    return await asyncio.shield(task)
+
+@app.post("/warmup")
+async def warmup():
+    """Pre-initialize the database, caches and agent; safe to call repeatedly"""
+    result = await run_warmup()
+    return {"status": "degraded" if result["errors"] else "ready", **result}
 
 @app.get("/health")
 async def health_check():
+    # Liveness only; pool, queue, cache and session figures are in /metrics
     return {"status": "healthy", "mode": "simple_ai"}
 
-# Serve frontend files
-@app.get("/")
-async def serve_auth():
-    from fastapi.responses import FileResponse
-    frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend", "auth.html")
-    return FileResponse(frontend_path)
-
-@app.get("/auth.html")
-async def serve_auth_html():
-    from fastapi.responses import FileResponse
-    frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend", "auth.html")
-    return FileResponse(frontend_path)
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Serve frontend files; pages sit at the root so their relative links resolve
+@app.api_route("/", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_auth(request: Request):
+    return static_assets.response(request, "auth.html")
+
+@app.api_route("/{page}.html", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_page(page: str, request: Request):
+    return static_assets.response(request, f"{page}.html")
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_static(path: str, request: Request):
+    return static_assets.response(request, path)
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,179 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from api_responses import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+# Frontend files are read once at startup, compressed, and served from memory
+# with strong ETags. Scripts and stylesheets are also served under a
+# content-hashed name that pages are rewritten to reference, so those URLs can
+# be cached forever while the pages themselves are revalidated on every load.
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+FINGERPRINTED_EXTENSIONS = ('.js', '.css')
+MIN_COMPRESS_BYTES = 256
+STATIC_PREFIX = '/static/'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+_REFERENCE = re.compile(r'(\b(?:src|href)=")([^"]+)(")')
+
+
+def resolve_frontend_dir():
+    """FRONTEND_DIR, else the repo's Frontend directory whatever its case"""
+    configured = os.getenv("FRONTEND_DIR")
+    if configured:
+        return configured
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for name in ("Frontend", "frontend"):
+        path = os.path.join(root, name)
+        if os.path.isdir(path):
+            return path
+    return None
+
+
+def _media_type(name):
+    media_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    if media_type == 'text/javascript':
+        media_type = 'application/javascript'
+    if media_type.startswith('text/') or media_type == 'application/javascript':
+        media_type += '; charset=utf-8'
+    return media_type
+
+
+def _encodings(body, media_type):
+    """Precompressed variants that are actually smaller than the original"""
+    variants = {}
+    if len(body) < MIN_COMPRESS_BYTES or not media_type.startswith(COMPRESSIBLE_TYPES):
+        return variants
+    compressed = gzip.compress(body, compresslevel=9, mtime=0)
+    if len(compressed) < len(body):
+        variants['gzip'] = compressed
+    if brotli is not None:
+        compressed = brotli.compress(body, quality=11)
+        if len(compressed) < len(body):
+            variants['br'] = compressed
+    return variants
+
+
+def _asset(body, name, cache_control):
+    media_type = _media_type(name)
+    digest = hashlib.sha256(body).hexdigest()[:16]
+    return {
+        'body': body,
+        'encodings': _encodings(body, media_type),
+        'digest': digest,
+        'media_type': media_type,
+        'cache_control': cache_control,
+    }
+
+
+def _etag(asset, encoding):
+    # Each encoding is a different byte sequence, so it gets its own strong tag
+    return f'"{asset["digest"]}-{encoding}"' if encoding else f'"{asset["digest"]}"'
+
+
+def _matches(if_none_match, asset):
+    if if_none_match.strip() == '*':
+        return True
+    tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    known = {_etag(asset, None)} | {_etag(asset, encoding) for encoding in asset['encodings']}
+    return not tags.isdisjoint(known)
+
+
+class StaticAssets:
+    """In-memory, precompressed copy of the frontend directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._assets = {}  # path relative to the directory -> asset
+        self.fingerprints = {}  # relative path -> content-hashed path
+        if directory:
+            self.build()
+
+    def build(self):
+        sources = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                full = os.path.join(root, name)
+                path = os.path.relpath(full, self.directory).replace(os.sep, '/')
+                with open(full, 'rb') as f:
+                    sources[path] = f.read()
+
+        assets = {}
+        fingerprints = {}
+        for path, body in sources.items():
+            if path.endswith('.html'):
+                continue
+            asset = _asset(body, path, REVALIDATE)
+            assets[path] = asset
+            stem, ext = os.path.splitext(path)
+            if ext in FINGERPRINTED_EXTENSIONS:
+                hashed = f"{stem}.{asset['digest'][:10]}{ext}"
+                fingerprints[path] = hashed
+                assets[hashed] = dict(asset, cache_control=IMMUTABLE)
+
+        for path, body in sources.items():
+            if path.endswith('.html'):
+                page = self._rewrite(body.decode('utf-8'), fingerprints).encode('utf-8')
+                assets[path] = _asset(page, path, REVALIDATE)
+
+        self._assets = assets
+        self.fingerprints = fingerprints
+
+    @staticmethod
+    def _rewrite(page, fingerprints):
+        """Point src/href references at the fingerprinted copies"""
+        def replace(match):
+            hashed = fingerprints.get(match.group(2))
+            if hashed is None:
+                return match.group(0)
+            return f"{match.group(1)}{STATIC_PREFIX}{hashed}{match.group(3)}"
+        return _REFERENCE.sub(replace, page)
+
+    def response(self, request, path):
+        """Serve `path`, honouring If-None-Match and Accept-Encoding"""
+        asset = self._assets.get(path)
+        if asset is None:
+            raise HTTPException(status_code=404, detail="Not found")
+
+        encoding = None
+        accepted = accepted_encodings(request.headers.get('accept-encoding', ''))
+        for candidate in ('br', 'gzip'):
+            if candidate in asset['encodings'] and candidate in accepted:
+                encoding = candidate
+                break
+
+        headers = {
+            'ETag': _etag(asset, encoding),
+            'Cache-Control': asset['cache_control'],
+            'Vary': 'Accept-Encoding',
+        }
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match and _matches(if_none_match, asset):
+            return Response(status_code=304, headers=headers)
+
+        if encoding:
+            headers['Content-Encoding'] = encoding
+            body = asset['encodings'][encoding]
+        else:
+            body = asset['body']
+        return Response(content=body, media_type=asset['media_type'], headers=headers)
+
+    def stats(self):
+        return {
+            'directory': self.directory,
+            'files': len(self._assets) - len(self.fingerprints),
+            'fingerprinted': len(self.fingerprints),
+            'brotli': brotli is not None,
+        }
@@ -1,6 +1,7 @@
-from strands import Agent
-from strands_tools import http_request
-import json
+from collections import OrderedDict
+import os
+import threading
+import time
 
 SYSTEM_PROMPT = """You are FitBot, an expert personal trainer and nutritionist. You provide:
 
@@ -22,13 +23,108 @@ For nutrition, factor in:
 
 Keep responses concise, actionable, and encouraging. Always prioritize safety."""
 
-fitness_agent = Agent(
-    system_prompt=SYSTEM_PROMPT,
-    tools=[http_request]
-)
+def create_fitness_agent(callback_handler=None):
+    """Build a FitBot agent with bounded conversation memory"""
+    # Imported here rather than at module level: the SDK takes most of the
+    # server's import time, and many processes never build an agent
+    from strands import Agent
+    from http_tool_cache import create_http_request_tool
+    from conversation_manager import TokenBudgetConversationManager
+    
+    return Agent(
+        system_prompt=SYSTEM_PROMPT,
+        tools=[create_http_request_tool()],
+        conversation_manager=TokenBudgetConversationManager(),
+        callback_handler=callback_handler,
+    )
+
+class AgentSessionPool:
+    """Per-user agents with LRU eviction of idle sessions"""
+    
+    def __init__(self, max_sessions=None, idle_ttl_seconds=None, agent_factory=create_fitness_agent):
+        self.max_sessions = max_sessions or int(os.getenv("AGENT_MAX_SESSIONS", "200"))
+        self.idle_ttl_seconds = idle_ttl_seconds or int(os.getenv("AGENT_SESSION_IDLE_SECONDS", "1800"))
+        self.agent_factory = agent_factory
+        self._sessions = OrderedDict()  # user_id -> (agent, last_used)
+        self._spare = None  # prebuilt agent handed to the next new session
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evicted = 0
+    
+    def get(self, user_id):
+        """Return the user's agent, creating one if needed"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            session = self._sessions.get(user_id)
+            if session is not None:
+                agent = session[0]
+                self._sessions[user_id] = (agent, now)
+                self._sessions.move_to_end(user_id)
+                return agent
+        
+        # Build outside the lock, agent construction is not free
+        agent = self._take_spare() or self.agent_factory()
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is not None:
+                # Another request for this user won the race
+                agent = session[0]
+            else:
+                self.created += 1
+            self._sessions[user_id] = (agent, now)
+            self._sessions.move_to_end(user_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+        return agent
+    
+    def _take_spare(self):
+        with self._lock:
+            agent, self._spare = self._spare, None
+            return agent
+    
+    def warm(self):
+        """Build a spare agent ahead of the first session, loading the SDK on the way"""
+        with self._lock:
+            if self._spare is not None:
+                return False
+        agent = self.agent_factory()
+        with self._lock:
+            if self._spare is None:
+                self._spare = agent
+        return True
+    
+    def _evict_idle(self, now):
+        # Sessions are ordered by last use, so idle ones sit at the front
+        while self._sessions:
+            user_id, (_, last_used) = next(iter(self._sessions.items()))
+            if now - last_used <= self.idle_ttl_seconds:
+                break
+            del self._sessions[user_id]
+            self.evicted += 1
+    
+    def drop(self, user_id):
+        """Forget a user's conversation"""
+        with self._lock:
+            self._sessions.pop(user_id, None)
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'active_sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'idle_ttl_seconds': self.idle_ttl_seconds,
+                'created': self.created,
+                'evicted': self.evicted,
+                'spare_ready': self._spare is not None,
+            }
+
+agent_sessions = AgentSessionPool()
 
 def interactive_trainer():
     """Interactive terminal testing for FitBot agent"""
+    fitness_agent = create_fitness_agent()
     print("🏋️ FitBot Agent - Strands SDK Mode")
     print("Type your fitness questions or 'quit' to exit")
     print("-" * 50)
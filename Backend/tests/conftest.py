@@ -0,0 +1,42 @@
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The backend is a flat set of modules run from Backend/, so tests import them the same way
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the app away from the tracked fitness_app.db and the real HTTP cache
+_scratch = tempfile.mkdtemp(prefix="sportacus-tests-")
+os.environ.setdefault("FITNESS_DB_PATH", os.path.join(_scratch, "fitness_app.db"))
+os.environ.setdefault("HTTP_CACHE_DIR", os.path.join(_scratch, "http_cache"))
+os.environ.setdefault("KNOWLEDGE_COMPACT_INTERVAL", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+_usernames = itertools.count()
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.fixture
+async def client():
+    """httpx client for the app, inside its lifespan"""
+    import httpx
+    import simple_ai_server
+
+    app = simple_ai_server.app
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as http:
+            yield http
+
+
+async def register(client):
+    """Register a new user; returns (user_id, auth headers)"""
+    response = await client.post('/auth/register', json={'username': f"user{next(_usernames)}", 'password': 'pw'})
+    body = response.json()
+    return body['user_id'], {'Authorization': f"Bearer {body['access_token']}"}
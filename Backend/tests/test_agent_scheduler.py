@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+from agent_scheduler import AgentBusy, AgentScheduler, BACKGROUND, INTERACTIVE
+from conftest import register
+
+pytestmark = pytest.mark.anyio
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_global_and_per_user_limits():
+    scheduler = AgentScheduler(max_concurrent=2, max_per_user=1, max_queue=8)
+    await scheduler.acquire(1)
+    second_call_same_user = asyncio.ensure_future(scheduler.acquire(1))
+    await scheduler.acquire(2)
+    third_user = asyncio.ensure_future(scheduler.acquire(3))
+    await settle()
+    assert scheduler.stats()['running'] == 2 and scheduler.queue_depth() == 2
+
+    # User 1's slot frees up, but user 1 is still at its limit until this one ends
+    scheduler.release(2)
+    await settle()
+    assert third_user.done() and not second_call_same_user.done()
+
+    scheduler.release(1)
+    await settle()
+    assert second_call_same_user.done()
+    assert scheduler.stats()['running'] == 2 and scheduler.queue_depth() == 0
+
+
+async def test_interactive_calls_go_first():
+    scheduler = AgentScheduler(max_concurrent=1, max_per_user=1, max_queue=8)
+    await scheduler.acquire(1)
+    order = []
+
+    async def wait(user_id, priority):
+        await scheduler.acquire(user_id, priority)
+        order.append(user_id)
+
+    waiters = [asyncio.ensure_future(wait(2, BACKGROUND)), asyncio.ensure_future(wait(3, INTERACTIVE))]
+    await settle()
+    scheduler.release(1)
+    await settle()
+    scheduler.release(order[0])
+    await asyncio.gather(*waiters)
+    assert order == [3, 2]
+
+
+async def test_full_queue_is_rejected_with_retry_after():
+    scheduler = AgentScheduler(max_concurrent=1, max_per_user=1, max_queue=1)
+    await scheduler.acquire(1)
+    waiting = asyncio.ensure_future(scheduler.acquire(2))
+    await settle()
+    with pytest.raises(AgentBusy) as busy:
+        await scheduler.acquire(3)
+    assert busy.value.retry_after >= 1
+    with pytest.raises(AgentBusy):
+        scheduler.ensure_capacity(4)
+    assert scheduler.stats()['rejected'] == 2
+
+    waiting.cancel()
+    await settle()
+    assert scheduler.queue_depth() == 0
+    scheduler.ensure_capacity(4)
+
+
+async def test_claim_releases_once():
+    scheduler = AgentScheduler(max_concurrent=1, max_per_user=1, max_queue=1)
+    release = await scheduler.claim(1)
+    release()
+    release()
+    assert scheduler.stats()['running'] == 0
+    await scheduler.acquire(2)
+    assert scheduler.stats()['running'] == 1
+
+
+async def test_same_key_shares_one_call_and_other_keys_do_not():
+    scheduler = AgentScheduler(max_concurrent=4, max_per_user=1, max_queue=8)
+    gate = asyncio.Event()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await gate.wait()
+        return len(calls)
+
+    results = [asyncio.ensure_future(scheduler.run(user, BACKGROUND, call, key=key))
+               for user, key in [(1, (1, 'p')), (1, (1, 'p')), (2, (2, 'p'))]]
+    await settle()
+    gate.set()
+    first, shared, other = await asyncio.gather(*results)
+    assert len(calls) == 2 and first == shared
+    assert scheduler.stats()['coalesced'] == 1
+
+
+@pytest.fixture
+def fake_agent(monkeypatch):
+    """Counts model calls made through /agent/chat, holding each until released"""
+    import simple_ai_server
+
+    state = {'calls': [], 'gate': asyncio.Event()}
+
+    async def run_agent(agent, prompt):
+        state['calls'].append(agent)
+        await state['gate'].wait()
+        return f"plan from {agent}"
+
+    class Sessions:
+        def get(self, user_id):
+            return f"agent-{user_id}"
+
+    monkeypatch.setattr(simple_ai_server, 'run_agent', run_agent)
+    monkeypatch.setattr(simple_ai_server, 'agent_sessions', Sessions())
+    monkeypatch.setattr(simple_ai_server, 'agent_scheduler', AgentScheduler(max_concurrent=4, max_per_user=1))
+    return state
+
+
+async def test_chat_coalesces_per_user_only(client, fake_agent):
+    first_user, first_auth = await register(client)
+    second_user, second_auth = await register(client)
+    plan = {'type': 'workout_plan', 'regenerate': True}
+    requests = [asyncio.ensure_future(client.post('/agent/chat', json=plan, headers=auth))
+                for auth in (first_auth, first_auth, second_auth)]
+    await asyncio.sleep(0.2)
+    fake_agent['gate'].set()
+    replies = [response.json()['response'] for response in await asyncio.gather(*requests)]
+
+    assert sorted(fake_agent['calls']) == [f"agent-{first_user}", f"agent-{second_user}"]
+    assert replies == [f"plan from agent-{first_user}"] * 2 + [f"plan from agent-{second_user}"]
+
+
+async def test_chat_answers_429_when_the_queue_is_full(client, fake_agent, monkeypatch):
+    import simple_ai_server
+
+    scheduler = AgentScheduler(max_concurrent=1, max_per_user=1, max_queue=0)
+    monkeypatch.setattr(simple_ai_server, 'agent_scheduler', scheduler)
+    user_id, auth = await register(client)
+    await scheduler.acquire(user_id)
+
+    response = await client.post('/agent/chat', json={'type': 'workout_plan'}, headers=auth)
+    stream = await client.post('/agent/chat/stream', json={'type': 'workout_plan'}, headers=auth)
+    assert response.status_code == 429 and stream.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert fake_agent['calls'] == []
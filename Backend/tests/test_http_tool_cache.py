@@ -0,0 +1,131 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import http_tool_cache
+from http_tool_cache import HttpCache, cached_http_request
+
+
+class Origin(BaseHTTPRequestHandler):
+    """Serves /page (cacheable), /strict (must-revalidate), /etag (always revalidated) and /moved (302)"""
+
+    requests_seen = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        Origin.requests_seen.append(self.path)
+        if self.path == '/moved':
+            self._send(302, b'', {'Location': '/page'})
+        elif self.path == '/strict':
+            self._send(200, b'strict', {'Cache-Control': 'max-age=0, must-revalidate'})
+        elif self.path == '/etag':
+            if self.headers.get('If-None-Match') == '"v1"':
+                self._send(304, b'', {'ETag': '"v1"'})
+            else:
+                self._send(200, b'tagged', {'Cache-Control': 'no-cache', 'ETag': '"v1"'})
+        else:
+            self._send(200, b'hello', {'Cache-Control': 'max-age=60', 'Content-Type': 'text/plain'})
+
+    def _send(self, status, body, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def origin(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_tool_cache, 'cache', HttpCache(str(tmp_path), 1024 * 1024))
+    monkeypatch.setattr(http_tool_cache, 'HTTP_CACHE_MODE', 'normal')
+    Origin.requests_seen = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Origin)
+    threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def call(url, **tool_input):
+    result = cached_http_request({'toolUseId': 't', 'input': {'method': 'GET', 'url': url, 'metrics': True,
+                                                              **tool_input}})
+    return result, [block['text'] for block in result['content']]
+
+
+def outcome(lines):
+    return lines[-1].split("'cache': ")[1].strip("'}")
+
+
+def unreachable(monkeypatch):
+    class Down:
+        def get(self, *args, **kwargs):
+            raise requests.ConnectionError('origin down')
+    monkeypatch.setattr(http_tool_cache, '_get_session', lambda max_redirects: Down())
+
+
+def test_fresh_response_is_served_without_the_network(origin):
+    _, first = call(f'{origin}/page')
+    _, second = call(f'{origin}/page')
+    assert outcome(first) == 'miss' and outcome(second) == 'hit'
+    assert second[0] == 'Status Code: 200' and 'Body: hello' in second
+    assert Origin.requests_seen == ['/page']
+
+
+def test_redirect_options_are_honored_and_keyed(origin):
+    _, followed = call(f'{origin}/moved')
+    _, not_followed = call(f'{origin}/moved', allow_redirects=False)
+    assert followed[:2] == ['Status Code: 200', 'Redirects: 1 redirects followed (302 -> 200)']
+    assert not_followed[0] == 'Status Code: 302'
+    result, _ = call(f'{origin}/moved', max_redirects=0)
+    assert result['status'] == 'error'
+
+
+def test_no_cache_response_is_revalidated(origin):
+    call(f'{origin}/etag')
+    _, lines = call(f'{origin}/etag')
+    assert outcome(lines) == 'revalidated'
+    assert 'Body: tagged' in lines
+    assert Origin.requests_seen == ['/etag', '/etag']
+
+
+def test_stale_copy_stands_in_when_the_origin_is_down(origin, monkeypatch):
+    call(f'{origin}/page')
+    http_tool_cache.cache._db().execute("UPDATE entries SET fresh_until = 0")
+    unreachable(monkeypatch)
+    result, lines = call(f'{origin}/page')
+    assert result['status'] == 'success' and outcome(lines) == 'stale'
+
+
+@pytest.mark.parametrize('path', ['/strict', '/etag'])
+def test_must_revalidate_and_no_cache_are_never_served_stale(origin, monkeypatch, path):
+    call(f'{origin}{path}')
+    unreachable(monkeypatch)
+    result, lines = call(f'{origin}{path}')
+    assert result['status'] == 'error'
+    assert 'origin down' in lines[0]
+
+
+def test_replay_mode_never_touches_the_network(origin, monkeypatch):
+    call(f'{origin}/page')
+    monkeypatch.setattr(http_tool_cache, 'HTTP_CACHE_MODE', 'replay')
+    unreachable(monkeypatch)
+    _, hit = call(f'{origin}/page')
+    missing, _ = call(f'{origin}/other')
+    assert outcome(hit) == 'hit'
+    assert missing['status'] == 'error'
+
+
+def test_call_without_url_gets_the_original_tool_error(origin):
+    result = cached_http_request({'toolUseId': 't', 'input': {'method': 'GET'}})
+    assert result['status'] == 'error'
+
+
+def test_uncacheable_requests_bypass_the_cache(origin):
+    assert not http_tool_cache._cacheable({'method': 'GET', 'url': origin, 'headers': {'Authorization': 'x'}})
+    assert not http_tool_cache._cacheable({'method': 'POST', 'url': origin})
+    assert http_tool_cache._cacheable({'method': 'get', 'url': origin})
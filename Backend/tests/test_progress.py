@@ -0,0 +1,162 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import migrations
+import progress
+from connection_pool import ConnectionPool
+from database import FitnessDB
+
+NAMES = ['Bench Press', 'bench', 'Squat', 'squats', 'Deadlift', 'Plank', 'Running', 'Zercher Squat']
+AGGREGATES = {
+    # exercise_name is left out: incremental updates keep the first spelling seen,
+    # a rebuild keeps whichever it meets first
+    'exercise_progress': "SELECT exercise_key, sessions, total_sets, total_reps, ROUND(total_volume, 3), best_weight, "
+                         "best_reps, ROUND(best_e1rm, 3), last_date FROM exercise_progress WHERE user_id = ? "
+                         "ORDER BY exercise_key",
+    'weekly_activity': "SELECT week_start, workouts FROM weekly_activity WHERE user_id = ? ORDER BY week_start",
+    'user_progress': "SELECT total_workouts, completed_exercises, ROUND(total_volume, 3), latest_streak_weeks, "
+                     "latest_streak_week, longest_streak_weeks, last_workout_date FROM user_progress WHERE user_id = ?",
+}
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = FitnessDB(str(tmp_path / 'fitness.db'))
+    yield db
+    db.writer.barrier()
+    db.pool.close()
+
+
+def snapshot(db, user_id):
+    with db.connection() as conn:
+        return {table: [tuple(row) for row in conn.execute(sql, (user_id,))] for table, sql in AGGREGATES.items()}
+
+
+def random_exercise(rng):
+    return {
+        'name': rng.choice(NAMES),
+        'sets': rng.randint(1, 5),
+        'reps': rng.choice([None, 5, 8, 10]),
+        'weight': rng.choice([None, 95.0, 135.0, 185.0, 225.0]),
+        'duration': rng.choice([None, 10, 30]),
+        'notes': '',
+        'completed': rng.random() < 0.6,
+    }
+
+
+def random_entry(rng):
+    day = date(2026, 1, 5) + timedelta(days=rng.randint(0, 90))
+    return {'date': day.isoformat(), 'title': 'Workout', 'notes': '',
+            'exercises': [random_exercise(rng) for _ in range(rng.randint(1, 4))]}
+
+
+def as_input(exercise):
+    """An API exercise row in the shape update_workout_entry accepts"""
+    return {'id': exercise['id'], 'name': exercise['exercise_name'], 'sets': exercise['sets'],
+            'reps': exercise['reps'], 'weight': exercise['weight'], 'duration': exercise['duration_minutes'],
+            'notes': exercise['notes'], 'completed': bool(exercise['completed'])}
+
+
+def random_change(db, rng, user_id, entry_ids):
+    entry = db.get_workout_entry(rng.choice(entry_ids), user_id)
+    exercises = entry['exercises']
+    action = rng.choice(['toggle', 'batch', 'stats', 'edit'])
+    if action == 'toggle' and exercises:
+        exercise = rng.choice(exercises)
+        db.update_exercise_completion(exercise['id'], not exercise['completed'], user_id)
+    elif action in ('batch', 'stats') and exercises:
+        updates = [{'id': exercise['id'], 'completed': rng.random() < 0.5} for exercise in exercises]
+        if action == 'stats':
+            updates = [{**update, 'sets': rng.randint(1, 6), 'weight': rng.choice([None, 155.0, 245.0])}
+                       for update in updates]
+        assert db.update_exercises(user_id, updates) == len(exercises)
+    else:
+        kept = [as_input(exercise) for exercise in exercises if rng.random() < 0.7]
+        for exercise in kept:
+            if rng.random() < 0.3:
+                exercise.update(name=rng.choice(NAMES), reps=rng.choice([3, 12]))
+        kept += [random_exercise(rng) for _ in range(rng.randint(0, 2))]
+        day = entry['date'] if rng.random() < 0.5 else random_entry(rng)['date']
+        db.update_workout_entry(entry['id'], user_id, {'date': day, 'title': entry['title'], 'notes': '',
+                                                       'exercises': kept})
+
+
+def test_incremental_aggregates_match_a_full_rebuild(db):
+    rng = random.Random(7)
+    user_id = db.create_user('lifter', 'pw')
+    other_id = db.create_user('bystander', 'pw')
+    entry_ids = [db.save_workout_entry(user_id, random_entry(rng)) for _ in range(15)]
+    db.import_workout_entries(other_id, [random_entry(rng) for _ in range(5)])
+    other_before = snapshot(db, other_id)
+
+    for step in range(60):
+        random_change(db, rng, user_id, entry_ids)
+        if step % 10 == 9:
+            incremental = snapshot(db, user_id)
+            db.rebuild_progress(user_id)
+            assert snapshot(db, user_id) == incremental, f"diverged after step {step}"
+
+    assert snapshot(db, other_id) == other_before
+    db.rebuild_progress(other_id)
+    assert snapshot(db, other_id) == other_before
+
+
+def test_exercise_aliases_share_one_aggregate(db):
+    user_id = db.create_user('aliases', 'pw')
+    for name in ('Bench Press', 'bench press', 'Bench  Press '):
+        db.save_workout_entry(user_id, {'date': '2026-03-02', 'title': 'Push', 'exercises': [
+            {'name': name, 'sets': 3, 'reps': 5, 'weight': 200.0, 'completed': True}]})
+    [bench] = db.get_exercise_progress(user_id)
+    assert bench['sessions'] == 3 and bench['total_reps'] == 45
+
+
+def legacy_database(path, monkeypatch):
+    """A database at schema version 4, filled the way the app wrote it before aggregates existed"""
+    pool = ConnectionPool(path)
+    monkeypatch.setattr(migrations, 'MIGRATIONS', migrations.MIGRATIONS[:4])
+    migrations.migrate(pool)
+    monkeypatch.undo()
+
+    rng = random.Random(11)
+    with pool.transaction() as conn:
+        for user_id, username in ((1, 'old'), (2, 'older')):
+            conn.execute("INSERT INTO users (id, username, password_hash) VALUES (?, ?, 'x')", (user_id, username))
+            conn.execute("INSERT INTO user_knowledge (user_id, category, content) VALUES (?, 'goal', ?)",
+                         (user_id, f"{username} wants a stronger deadlift"))
+            for _ in range(12):
+                entry = random_entry(rng)
+                entry_id = conn.execute(
+                    "INSERT INTO workout_entries (user_id, date, title, notes) VALUES (?, ?, ?, '')",
+                    (user_id, entry['date'], entry['title'])
+                ).lastrowid
+                conn.executemany(
+                    "INSERT INTO workout_exercises (entry_id, exercise_name, sets, reps, weight, duration_minutes, "
+                    "notes, completed) VALUES (?, ?, ?, ?, ?, ?, '', ?)",
+                    [(entry_id, e['name'], e['sets'], e['reps'], e['weight'], e['duration'], e['completed'])
+                     for e in entry['exercises']]
+                )
+    pool.close()
+
+
+def test_migrations_backfill_existing_journals(tmp_path, monkeypatch):
+    path = str(tmp_path / 'legacy.db')
+    legacy_database(path, monkeypatch)
+    db = FitnessDB(path)
+    try:
+        assert db.init_db() == list(range(5, migrations.LATEST_VERSION + 1))
+        with db.connection() as conn:
+            keys = conn.execute("SELECT exercise_name, exercise_key FROM workout_exercises").fetchall()
+        assert all(row['exercise_key'] == progress.exercise_key(row['exercise_name']) for row in keys)
+
+        for user_id in (1, 2):
+            backfilled = snapshot(db, user_id)
+            assert backfilled['user_progress'][0][0] > 0
+            db.rebuild_progress(user_id)
+            assert snapshot(db, user_id) == backfilled
+
+        passages = db.search_user_context(1, "how do I get a stronger deadlift")
+        assert [p['content'] for p in passages] == ["goal: old wants a stronger deadlift"]
+    finally:
+        db.pool.close()
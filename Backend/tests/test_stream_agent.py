@@ -0,0 +1,83 @@
+import asyncio
+import threading
+from contextlib import aclosing
+
+import pytest
+
+from agent_scheduler import AgentScheduler
+from executors import stream_agent
+
+pytestmark = pytest.mark.anyio
+
+
+class SlowAgent:
+    """Streams `chunks`, pausing before each one after the first until `gate` opens"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.gate = threading.Event()
+        self.sent = 0
+        self.closed = threading.Event()
+
+    async def stream_async(self, prompt):
+        try:
+            for i, chunk in enumerate(self.chunks):
+                while i and not self.gate.is_set():
+                    await asyncio.sleep(0.005)
+                self.sent += 1
+                yield {'data': chunk}
+            yield {'result': ''.join(self.chunks)}
+        finally:
+            self.closed.set()
+
+
+async def wait_for(condition, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met")
+
+
+async def test_stream_yields_every_chunk_then_calls_on_done():
+    agent = SlowAgent(['a', 'b', 'c'])
+    agent.gate.set()
+    done = []
+    async with aclosing(stream_agent(agent, 'p', on_done=lambda: done.append(True))) as stream:
+        chunks = [chunk async for chunk in stream]
+    assert chunks == ['a', 'b', 'c']
+    await wait_for(lambda: done)
+
+
+async def test_slot_is_held_until_an_abandoned_stream_really_stops():
+    scheduler = AgentScheduler(max_concurrent=1, max_per_user=1)
+    release = await scheduler.claim(1)
+    agent = SlowAgent(['a', 'b', 'c', 'd'])
+
+    async with aclosing(stream_agent(agent, 'p', on_done=release)) as stream:
+        async for chunk in stream:
+            assert chunk == 'a'
+            break
+
+    # The client is gone but the model thread is still inside its call
+    await asyncio.sleep(0.05)
+    assert scheduler.stats()['running'] == 1
+
+    agent.gate.set()
+    await wait_for(lambda: scheduler.stats()['running'] == 0)
+    assert agent.closed.is_set() and agent.sent < len(agent.chunks)
+
+
+async def test_agent_error_reaches_the_caller_and_frees_the_slot():
+    class Broken:
+        async def stream_async(self, prompt):
+            yield {'data': 'a'}
+            raise RuntimeError('model failed')
+
+    scheduler = AgentScheduler(max_concurrent=1, max_per_user=1)
+    release = await scheduler.claim(1)
+    with pytest.raises(RuntimeError, match='model failed'):
+        async with aclosing(stream_agent(Broken(), 'p', on_done=release)) as stream:
+            async for _ in stream:
+                pass
+    await wait_for(lambda: scheduler.stats()['running'] == 0)
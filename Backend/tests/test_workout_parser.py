@@ -0,0 +1,92 @@
+from datetime import date
+
+import pytest
+
+import workout_parser
+from workout_parser import MIN_CONFIDENCE, parse_workout
+
+TODAY = date(2026, 10, 15)  # a Thursday
+
+
+def exercises(entry):
+    return [(e['name'], e['sets'], e['reps'], e['weight'], e['duration']) for e in entry['exercises']]
+
+
+def test_known_exercises_parse_with_full_confidence():
+    entry, confidence = parse_workout("save to journal: bench 3x8 @ 185, plank 3x30s, ran 20 min", TODAY)
+    assert confidence == 1.0
+    assert entry['date'] == '2026-10-15'
+    assert exercises(entry) == [
+        ('Bench Press', 3, 8, 185.0, None),
+        ('Plank', 3, None, None, 2),
+        ('Running', None, None, None, 20),
+    ]
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("squat 5 x 5 225lbs", ('Squat', 5, 5, 225.0, None)),
+    ("3x10 reps of squats", ('Squat', 3, 10, None, None)),
+    ("bench 3 sets of 8 reps at 185", ('Bench Press', 3, 8, 185.0, None)),
+    ("3 sets of 8 bench at 185", ('Bench Press', 3, 8, 185.0, None)),
+    ("deadlift 5x3 @ 100kg", ('Deadlift', 5, 3, 220.5, None)),
+    ("50 pushups", ('Push-ups', 1, 50, None, None)),
+    ("cycled for 1 hour", ('Cycling', None, None, None, 60)),
+])
+def test_grammar_forms(message, expected):
+    entry, confidence = parse_workout(message, TODAY)
+    assert confidence >= MIN_CONFIDENCE
+    assert exercises(entry) == [expected]
+
+
+@pytest.mark.parametrize("message", [
+    "45 minutes of cardio",
+    "20 minutes",
+    "3 rounds",
+    "I did 2 hours",
+    "2 sessions",
+    "4 laps",
+    "20 min run",
+])
+def test_unit_words_are_never_exercise_names(message):
+    entry, confidence = parse_workout(f"save to journal: {message}", TODAY)
+    assert entry is None
+    assert confidence < MIN_CONFIDENCE
+
+
+def test_unknown_name_alone_goes_to_the_agent():
+    entry, confidence = parse_workout("zercher squat 3x5", TODAY)
+    assert entry is not None
+    assert workout_parser.UNKNOWN_NAME_SCORE < MIN_CONFIDENCE
+    assert confidence < MIN_CONFIDENCE
+
+
+def test_unknown_name_next_to_known_ones_is_saved():
+    entry, confidence = parse_workout("bench 3x5, zercher squat 3x5", TODAY)
+    assert confidence >= MIN_CONFIDENCE
+    assert [e['name'] for e in entry['exercises']] == ['Bench Press', 'Zercher Squat']
+
+
+def test_unparsed_segment_lowers_confidence():
+    entry, confidence = parse_workout("bench 3x8, felt great about my form overall", TODAY)
+    assert exercises(entry) == [('Bench Press', 3, 8, None, None)]
+    assert confidence < MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("message, day", [
+    ("yesterday bench 3x8", '2026-10-14'),
+    ("monday bench 3x8", '2026-10-12'),
+    ("2026-09-01 bench 3x8", '2026-09-01'),
+])
+def test_entry_date(message, day):
+    entry, _ = parse_workout(message, TODAY)
+    assert entry['date'] == day
+
+
+def test_extractor_handles_braces_split_across_chunks():
+    extractor = workout_parser.WorkoutEntryExtractor()
+    chunks = ['Nice work!\n```json\nWORKOUT_', 'ENTRY {"title": "Legs", "notes": "felt {strong}", ',
+              '"exercises": [{"name": "Squat"}]}\n```\nKeep it up.']
+    assert [extractor.feed(chunk) for chunk in chunks] == [False, False, True]
+    assert extractor.value() == {'title': 'Legs', 'notes': 'felt {strong}', 'exercises': [{'name': 'Squat'}]}
+    assert extractor.before() == 'Nice work!'
+    assert extractor.after() == 'Keep it up.'
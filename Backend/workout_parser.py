@@ -0,0 +1,332 @@
+import json
+import math
+import re
+from datetime import date, timedelta
+
+# Turns chat messages like "save to journal: bench 3x8 @ 185, plank 3x30s,
+# ran 20 min" into a journal entry without a model round-trip. Messages the
+# grammar can't account for get a low confidence so the caller can fall back
+# to the agent, whose WORKOUT_ENTRY block is read by WorkoutEntryExtractor.
+
+JOURNAL_SAVE_PHRASES = [
+    'save to journal', 'add to journal', 'transfer to journal',
+    'log this workout', 'save this workout', 'add this to my journal',
+]
+
+# Below this the message is handed to the agent instead
+MIN_CONFIDENCE = 0.75
+# Score for a well-formed segment whose exercise name isn't in ALIASES; below
+# MIN_CONFIDENCE, so an unknown name is only saved next to known exercises
+UNKNOWN_NAME_SCORE = 0.6
+
+ALIASES = {
+    'bench': 'Bench Press', 'bench press': 'Bench Press', 'bp': 'Bench Press',
+    'incline bench': 'Incline Bench Press', 'incline bench press': 'Incline Bench Press',
+    'squat': 'Squat', 'back squat': 'Squat', 'front squat': 'Front Squat', 'goblet squat': 'Goblet Squat',
+    'deadlift': 'Deadlift', 'dl': 'Deadlift', 'deads': 'Deadlift',
+    'rdl': 'Romanian Deadlift', 'romanian deadlift': 'Romanian Deadlift',
+    'ohp': 'Overhead Press', 'overhead press': 'Overhead Press', 'shoulder press': 'Overhead Press',
+    'military press': 'Overhead Press',
+    'row': 'Barbell Row', 'barbell row': 'Barbell Row', 'bent over row': 'Barbell Row',
+    'dumbbell row': 'Dumbbell Row', 'db row': 'Dumbbell Row',
+    'pullup': 'Pull-ups', 'pull up': 'Pull-ups', 'pull-up': 'Pull-ups',
+    'chinup': 'Chin-ups', 'chin up': 'Chin-ups', 'chin-up': 'Chin-ups',
+    'pushup': 'Push-ups', 'push up': 'Push-ups', 'push-up': 'Push-ups',
+    'dip': 'Dips', 'lunge': 'Lunges', 'walking lunge': 'Lunges',
+    'leg press': 'Leg Press', 'leg curl': 'Leg Curl', 'leg extension': 'Leg Extension',
+    'curl': 'Bicep Curl', 'bicep curl': 'Bicep Curl', 'biceps curl': 'Bicep Curl', 'hammer curl': 'Hammer Curl',
+    'tricep pushdown': 'Tricep Pushdown', 'pushdown': 'Tricep Pushdown', 'skullcrusher': 'Skull Crushers',
+    'lat pulldown': 'Lat Pulldown', 'pulldown': 'Lat Pulldown',
+    'hip thrust': 'Hip Thrust', 'calf raise': 'Calf Raises', 'lateral raise': 'Lateral Raises',
+    'face pull': 'Face Pulls', 'plank': 'Plank', 'side plank': 'Side Plank', 'crunch': 'Crunches',
+    'situp': 'Sit-ups', 'sit up': 'Sit-ups', 'sit-up': 'Sit-ups', 'burpee': 'Burpees',
+    'kettlebell swing': 'Kettlebell Swings', 'kb swing': 'Kettlebell Swings', 'wall sit': 'Wall Sit',
+    'ran': 'Running', 'run': 'Running', 'running': 'Running', 'jog': 'Running', 'jogged': 'Running',
+    'jogging': 'Running', 'walked': 'Walking', 'walk': 'Walking', 'walking': 'Walking',
+    'cycled': 'Cycling', 'cycling': 'Cycling', 'bike': 'Cycling', 'biked': 'Cycling', 'biking': 'Cycling',
+    'rowed': 'Rowing', 'rowing': 'Rowing', 'swam': 'Swimming', 'swim': 'Swimming', 'swimming': 'Swimming',
+    'elliptical': 'Elliptical', 'stairmaster': 'Stair Climber', 'jump rope': 'Jump Rope', 'yoga': 'Yoga',
+    'stretching': 'Stretching', 'stretched': 'Stretching', 'hiit': 'HIIT', 'hiked': 'Hiking', 'hike': 'Hiking',
+}
+CARDIO = {'Running', 'Walking', 'Cycling', 'Rowing', 'Swimming', 'Elliptical', 'Stair Climber',
+          'Jump Rope', 'HIIT', 'Hiking'}
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+FILLER = re.compile(
+    r"\b(?:please|can you|could you|for me|i did|i've done|i have done|i just did|did|just|"
+    r"my workout|workout|this morning|this evening|tonight|today|it|this)\b"
+)
+SEGMENT_SPLIT = re.compile(r"[\n;,+]|\band\b|\bthen\b|\bplus\b")
+
+_NUM = r"\d+(?:\.\d+)?"
+# Counts and durations, never part of an exercise name ("45 minutes of cardio", "3 rounds")
+_UNIT_WORDS = (r"(?:mins?|minutes?|hrs?|hours?|secs?|seconds?|rounds?|sets?|reps?|sessions?|laps?|times)")
+_NAME = rf"(?P<name>(?![a-z'\- ]*\b{_UNIT_WORDS}\b)[a-z][a-z'\- ]*?)"
+_WEIGHT = (rf"(?:\s*(?:@|at|with|w/)\s*(?P<weight>{_NUM})\s*(?P<wunit>lbs?|pounds?|kgs?|kilos?)?"
+           rf"|\s+(?P<weight2>{_NUM})\s*(?P<wunit2>lbs?|pounds?|kgs?|kilos?)?)?")
+_SECONDS = r"(?P<tunit>s|secs?|seconds?|m|mins?|minutes?)"
+_DURATION_UNIT = r"(?P<unit>m|mins?|minutes?|h|hrs?|hours?)"
+
+PATTERNS = [
+    # bench 3x8 @ 185 / squat 5 x 5 225lbs / plank 3x30s
+    re.compile(rf"^{_NAME}\s+(?P<sets>\d+)\s*x\s*(?P<reps>\d+)(?:\s*{_SECONDS})?(?:\s*reps?)?{_WEIGHT}$"),
+    # 3x8 bench @ 185
+    re.compile(rf"^(?P<sets>\d+)\s*x\s*(?P<reps>\d+)(?:\s*{_SECONDS})?(?:\s*reps?)?\s+(?:of\s+)?{_NAME}{_WEIGHT}$"),
+    # bench 3 sets of 8 (reps) at 185
+    re.compile(rf"^{_NAME}\s+(?P<sets>\d+)\s+sets?\s+(?:of\s+)?(?P<reps>\d+)(?:\s*{_SECONDS})?(?:\s*reps?)?{_WEIGHT}$"),
+    # 3 sets of 8 bench at 185
+    re.compile(rf"^(?P<sets>\d+)\s+sets?\s+of\s+(?P<reps>\d+)(?:\s*{_SECONDS})?(?:\s*reps?)?\s+(?:of\s+)?{_NAME}{_WEIGHT}$"),
+    # ran 5k in 25 min / ran 20 min / cycled for 1 hour
+    re.compile(rf"^{_NAME}\s+(?:(?P<distance>{_NUM}\s*(?:k|km|mi|miles?))\s+in\s+|for\s+)?"
+               rf"(?P<amount>{_NUM})\s*{_DURATION_UNIT}$"),
+    # 50 pushups
+    re.compile(rf"^(?P<count>\d+)\s+{_NAME}$"),
+]
+
+
+def is_journal_save(message):
+    """Whether a chat message asks for a workout to be saved to the journal"""
+    text = message.lower()
+    return any(phrase in text for phrase in JOURNAL_SAVE_PHRASES)
+
+
+def _entry_date(text, today):
+    """The date a message refers to, and the message with the date words removed"""
+    match = re.search(r"\b(\d{4}-\d{2}-\d{2})\b", text)
+    if match:
+        try:
+            day = date.fromisoformat(match.group(1))
+            return day, text.replace(match.group(0), ' ')
+        except ValueError:
+            pass
+    if re.search(r"\byesterday\b", text):
+        return today - timedelta(days=1), re.sub(r"\byesterday\b", ' ', text)
+    match = re.search(rf"\b(?:on\s+|last\s+)?({'|'.join(WEEKDAYS)})\b", text)
+    if match:
+        days_back = (today.weekday() - WEEKDAYS.index(match.group(1))) % 7
+        return today - timedelta(days=days_back), text.replace(match.group(0), ' ')
+    return today, text
+
+
+def _canonical_name(raw):
+    """Known exercise name for `raw`, or None"""
+    name = ' '.join(raw.split())
+    for candidate in (name, name[:-1] if name.endswith('s') else None, name[:-2] if name.endswith('es') else None):
+        if candidate and candidate in ALIASES:
+            return ALIASES[candidate]
+    return None
+
+
+def _pounds(value, unit):
+    weight = float(value)
+    if unit and unit.startswith('k'):
+        weight = round(weight * 2.20462 * 2) / 2
+    return weight
+
+
+def _minutes(amount, unit):
+    value = float(amount)
+    if unit.startswith('h'):
+        value *= 60
+    elif unit.startswith('s'):
+        value /= 60
+    return max(1, math.ceil(value))
+
+
+def _exercise(match):
+    """Exercise dict from a pattern match, with the match's confidence"""
+    groups = match.groupdict()
+    raw_name = groups['name'].strip(" -'")
+    if not raw_name or len(raw_name.split()) > 4:
+        return None, 0.0
+    canonical = _canonical_name(raw_name)
+    exercise = {
+        'name': canonical or raw_name.title(),
+        'sets': None,
+        'reps': None,
+        'weight': None,
+        'duration': None,
+        'notes': '',
+        'completed': True,
+    }
+
+    if groups.get('sets'):
+        exercise['sets'] = int(groups['sets'])
+        if groups.get('tunit'):
+            # Timed sets: 3x30s is three 30 second holds
+            per_set = groups['reps'] + groups['tunit'][0]
+            exercise['duration'] = _minutes(int(groups['reps']) * exercise['sets'], groups['tunit'])
+            exercise['notes'] = f"{exercise['sets']} x {per_set}"
+        else:
+            exercise['reps'] = int(groups['reps'])
+    elif groups.get('count'):
+        exercise['sets'] = 1
+        exercise['reps'] = int(groups['count'])
+    elif groups.get('amount'):
+        exercise['duration'] = _minutes(groups['amount'], groups['unit'])
+        if groups.get('distance'):
+            exercise['notes'] = groups['distance'].replace(' ', '')
+
+    weight = groups.get('weight') or groups.get('weight2')
+    if weight:
+        unit = groups.get('wunit') or groups.get('wunit2')
+        exercise['weight'] = _pounds(weight, unit)
+        if unit and unit.startswith('k'):
+            exercise['notes'] = ' '.join(filter(None, [exercise['notes'], f"{weight} kg"]))
+
+    return exercise, 1.0 if canonical else UNKNOWN_NAME_SCORE
+
+
+def _title(exercises):
+    names = [exercise['name'] for exercise in exercises]
+    if all(name in CARDIO for name in names):
+        return 'Cardio' if len(names) > 1 else names[0]
+    if len(names) > 3:
+        return f"{', '.join(names[:3])} +{len(names) - 3}"
+    return ', '.join(names)
+
+
+def parse_workout(message, today=None):
+    """Parse a journal-save chat message into (entry dict or None, confidence 0-1)"""
+    today = today or date.today()
+    text = message.lower().replace('×', 'x')
+    for phrase in JOURNAL_SAVE_PHRASES:
+        text = text.replace(phrase, ' ')
+    day, text = _entry_date(text, today)
+    text = FILLER.sub(' ', text)
+
+    exercises = []
+    scores = []
+    for segment in SEGMENT_SPLIT.split(text):
+        segment = ' '.join(segment.split()).strip(" .:!-")
+        if not segment:
+            continue
+        for pattern in PATTERNS:
+            match = pattern.match(segment)
+            if match:
+                exercise, score = _exercise(match)
+                if exercise is not None:
+                    exercises.append(exercise)
+                    scores.append(score)
+                    break
+        else:
+            scores.append(0.0)
+
+    if not exercises:
+        return None, 0.0
+    entry = {
+        'date': day.isoformat(),
+        'title': _title(exercises),
+        'notes': '',
+        'exercises': exercises,
+    }
+    return entry, sum(scores) / len(scores)
+
+
+def describe_entry(entry):
+    """One line per exercise, for the chat confirmation"""
+    lines = []
+    for exercise in entry['exercises']:
+        parts = []
+        if exercise['sets'] and exercise['reps']:
+            parts.append(f"{exercise['sets']}x{exercise['reps']}")
+        if exercise['weight']:
+            parts.append(f"@ {exercise['weight']:g} lbs")
+        if exercise['duration']:
+            parts.append(f"{exercise['duration']} min")
+        if exercise['notes']:
+            parts.append(f"({exercise['notes']})")
+        lines.append(f"- {exercise['name']} {' '.join(parts)}".rstrip())
+    return '\n'.join(lines)
+
+
+class WorkoutEntryExtractor:
+    """Finds the JSON object after WORKOUT_ENTRY in an agent reply, chunk by chunk
+
+    Braces are matched with string and escape awareness, so nested objects and
+    braces inside notes don't end the block early.
+    """
+
+    MARKER = 'WORKOUT_ENTRY'
+
+    def __init__(self):
+        self.text = ''
+        self.marker_at = None  # index of the marker
+        self.start = None  # index of the opening brace
+        self.end = None  # index just past the closing brace
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def found(self):
+        return self.marker_at is not None
+
+    @property
+    def done(self):
+        return self.end is not None
+
+    def feed(self, chunk):
+        """Add streamed text; returns True once the whole object has arrived"""
+        self.text += chunk
+        if self.end is None:
+            self._scan()
+        return self.done
+
+    def _scan(self):
+        if self.marker_at is None:
+            self.marker_at = self.text.find(self.MARKER)
+            if self.marker_at < 0:
+                self.marker_at = None
+                return
+            self._pos = self.marker_at + len(self.MARKER)
+        if self.start is None:
+            self.start = self.text.find('{', self._pos)
+            if self.start < 0:
+                self.start = None
+                return
+            self._pos = self.start
+
+        text = self.text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self.end = i + 1
+                    return
+        self._pos = len(text)
+
+    def value(self):
+        """The parsed object, or None if it hasn't fully arrived or isn't valid JSON"""
+        if self.end is None:
+            return None
+        try:
+            data = json.loads(self.text[self.start:self.end])
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def before(self):
+        """Reply text ahead of the marker"""
+        if not self.found:
+            return self.text
+        return re.sub(r"```\w*\s*$", '', self.text[:self.marker_at]).strip()
+
+    def after(self):
+        """Reply text following the object, without a closing code fence"""
+        if self.end is None:
+            return ''
+        return re.sub(r"^\s*```", '', self.text[self.end:]).strip()
@@ -0,0 +1,145 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from observability import db_write_batch_size, db_write_commit, get_logger, log_fields
+
+# Journal and knowledge inserts go through one writer thread per process.
+# It takes whatever has queued up within a few milliseconds and commits it as
+# a single transaction, so under load the write lock is taken and the WAL
+# synced once per batch rather than once per request. Each write runs in its
+# own savepoint, so one failing write doesn't undo the rest of its batch.
+
+COMMIT = 'commit'  # callers wait until their write is committed
+QUEUED = 'queued'  # callers return once the write is queued (fire-and-forget)
+
+logger = get_logger("db.writer")
+
+
+class WriteQueueFull(Exception):
+    """The writer is too far behind to accept more work"""
+
+
+class WriteQueue:
+    """Bounded queue of `fn(conn, *args)` writes, group-committed by a single thread"""
+
+    def __init__(self, pool, durability=COMMIT, batch_ms=2.0, max_batch=64, max_pending=1024,
+                 submit_timeout=5.0):
+        if durability not in (COMMIT, QUEUED):
+            raise ValueError(f"Unknown write durability {durability!r}")
+        self.pool = pool
+        self.durability = durability
+        self.batch_seconds = batch_ms / 1000
+        self.max_batch = max_batch
+        self.submit_timeout = submit_timeout
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self.batches = 0
+        self.writes = 0
+        self.failed = 0
+        self.max_batch_seen = 0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, fn, *args):
+        """Queue `fn(conn, *args)`, returning a Future for its result
+
+        Blocks while the queue is full, raising WriteQueueFull after
+        submit_timeout seconds.
+        """
+        self._ensure_started()
+        future = Future()
+        with self._pending_lock:
+            self._pending += 1
+        try:
+            self._queue.put((fn, args, future), timeout=self.submit_timeout)
+        except queue.Full:
+            with self._pending_lock:
+                self._pending -= 1
+            raise WriteQueueFull(f"{self._queue.maxsize} writes already queued")
+        return future
+
+    def barrier(self):
+        """Wait until every write queued before this call has been committed"""
+        if self._pending:
+            self.submit(lambda conn: None).result()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_seconds
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            results = []
+            started = time.perf_counter()
+            try:
+                with self.pool.transaction() as conn:
+                    for fn, args, future in batch:
+                        conn.execute("SAVEPOINT queued_write")
+                        try:
+                            result = fn(conn, *args)
+                        except Exception as e:
+                            conn.execute("ROLLBACK TO queued_write")
+                            results.append((future, None, e))
+                        else:
+                            results.append((future, result, None))
+                        conn.execute("RELEASE queued_write")
+            except Exception as e:
+                # BEGIN or COMMIT failed, so nothing in the batch was written
+                logger.exception("write batch failed", extra=log_fields(writes=len(batch)))
+                results = [(future, None, e) for _, _, future in batch]
+            else:
+                db_write_commit.observe(time.perf_counter() - started)
+            db_write_batch_size.observe(len(batch))
+
+            with self._pending_lock:
+                self._pending -= len(batch)
+            self.batches += 1
+            self.writes += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            for future, result, error in results:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    self.failed += 1
+                    future.set_exception(error)
+
+    def stats(self):
+        return {
+            'durability': self.durability,
+            'pending': self._pending,
+            'batches': self.batches,
+            'writes': self.writes,
+            'failed': self.failed,
+            'avg_batch': round(self.writes / self.batches, 2) if self.batches else 0.0,
+            'max_batch': self.max_batch_seen,
+        }
+
+
+def create_write_queue(pool):
+    """Build the writer from DB_WRITE_* environment settings"""
+    return WriteQueue(
+        pool,
+        durability=os.getenv("DB_WRITE_DURABILITY", COMMIT).lower(),
+        batch_ms=float(os.getenv("DB_WRITE_BATCH_MS", "2")),
+        max_batch=int(os.getenv("DB_WRITE_BATCH_SIZE", "64")),
+        max_pending=int(os.getenv("DB_WRITE_QUEUE_SIZE", "1024")),
+    )
@@ -0,0 +1,41 @@
+// Shared by every page: API location, auth headers and status messages
+const API_BASE = 'http://localhost:8000';
+
+function getAuthHeaders() {
+    const token = localStorage.getItem('fitbot_token');
+    return {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${token}`
+    };
+}
+
+function showMessage(text, isError = false) {
+    const messageDiv = document.getElementById('message');
+    messageDiv.innerHTML = `<div class="${isError ? 'error' : 'success'}">${text}</div>`;
+}
+
+// GET with the last response's ETag, so unchanged journal/profile reads come
+// back as a bodiless 304 and are answered from the copy kept in sessionStorage
+const VALIDATOR_PREFIX = 'fitbot_cached:';
+
+async function fetchWithValidators(url, options = {}) {
+    const key = VALIDATOR_PREFIX + url;
+    const cached = JSON.parse(sessionStorage.getItem(key) || 'null');
+    const headers = { ...getAuthHeaders(), ...(options.headers || {}) };
+    if (cached) headers['If-None-Match'] = cached.etag;
+
+    // no-store: the validators are ours, the browser cache shouldn't add its own
+    const response = await fetch(url, { ...options, headers, cache: 'no-store' });
+    if (response.status === 304 && cached) {
+        return new Response(cached.body, { status: 200, headers: { 'Content-Type': 'application/json' } });
+    }
+    const etag = response.headers.get('ETag');
+    if (response.ok && etag) {
+        try {
+            sessionStorage.setItem(key, JSON.stringify({ etag, body: await response.clone().text() }));
+        } catch (e) {
+            // Storage full or disabled: the next read just isn't conditional
+        }
+    }
+    return response;
+}
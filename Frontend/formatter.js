@@ -33,4 +33,41 @@ function formatLLMOutput(text) {
     }
     
     return formatted;
-}
\ No newline at end of file
+}
+function formatStreamingOutput(text) {
+    if (!text) return text;
+    
+    // A partial response may end mid-markup; close an open bold marker
+    // so the rest of the text doesn't flicker between styles
+    const boldMarkers = (text.match(/\*\*/g) || []).length;
+    if (boldMarkers % 2 === 1) {
+        text += '**';
+    }
+    
+    return formatLLMOutput(text);
+}
+
+function createStreamRenderer(element) {
+    // Re-render at most once per animation frame while tokens arrive
+    let text = '';
+    let scheduled = false;
+    let finished = false;
+    
+    return {
+        append(chunk) {
+            text += chunk;
+            if (scheduled || finished) return;
+            scheduled = true;
+            requestAnimationFrame(() => {
+                scheduled = false;
+                if (!finished) {
+                    element.innerHTML = formatStreamingOutput(text);
+                }
+            });
+        },
+        finish(finalText) {
+            finished = true;
+            element.innerHTML = formatLLMOutput(finalText !== undefined ? finalText : text);
+        }
+    };
+}